@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "LittleLemonAPI.instrumentation.InstrumentationMiddleware",
+    "LittleLemonAPI.routers.DatabaseRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,13 +81,107 @@ WSGI_APPLICATION = "LittleLemon.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL lets readers run alongside the writer; IMMEDIATE transactions take the write lock up front instead of
+# failing with "database is locked" when a read transaction upgrades to a write
+SQLITE_OPTIONS = {
+    "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": SQLITE_OPTIONS,
+    },
+    # Local stand-in for a read replica, refreshed from the primary with "manage.py sync_replica". Only read from
+    # when REPLICA_READS is on (below); until the first sync it is an empty file without even the schema
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db-replica.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {**SQLITE_OPTIONS, "init_command": "PRAGMA journal_mode=WAL; PRAGMA query_only=ON"},
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+# With REPLICA_READS (LITTLELEMON_REPLICA_READS=1, after a first "manage.py sync_replica"), safe reads of the
+# menu and order endpoints go to the replica (see LittleLemonAPI.routers); a user who wrote is served from the
+# primary for REPLICA_PIN_TIMEOUT seconds
+DATABASE_ROUTERS = ["LittleLemonAPI.routers.PrimaryReplicaRouter"]
+REPLICA_DATABASE = "replica"
+REPLICA_READS = os.environ.get("LITTLELEMON_REPLICA_READS") == "1"
+REPLICA_PIN_TIMEOUT = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# The menu version, the read-your-writes pins and the role/token snapshots must be seen by every server process,
+# so anything beyond a single-process runserver needs a shared cache: set LITTLELEMON_REDIS_URL (needs the redis
+# package). The per-process LocMemCache fallback is only right for development and tests.
+if os.environ.get("LITTLELEMON_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["LITTLELEMON_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a user's resolved group names and a cached menu response are kept
+ROLE_CACHE_TIMEOUT = 300
+MENU_CACHE_TIMEOUT = 600
+
+# Seconds a token's user/role snapshot is kept in the shared cache and in each process' LRU
+AUTH_CACHE_TIMEOUT = 300
+AUTH_LOCAL_CACHE_TIMEOUT = 10
+AUTH_LOCAL_CACHE_SIZE = 1024
+
+# Automatic delivery crew assignment (LittleLemonAPI.dispatcher): orders per cycle, seconds between cycles,
+# and whether web processes run a dispatcher thread themselves instead of the dispatch_orders command
+DISPATCH_BATCH_SIZE = 100
+DISPATCH_INTERVAL = 5
+DISPATCHER_IN_PROCESS = False
+
+# Order archiving (LittleLemonAPI.archiving): delivered orders older than this many days move to the archive
+# tables, this many orders per transaction
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+
+# Order change events (LittleLemonAPI.events): seconds between polls of the event log for the changes of other
+# worker processes (0 disables polling), queued events per SSE connection, seconds events are kept in the log
+# for reconnecting clients (see the prune_order_events command) and seconds between SSE keep-alive comments
+ORDER_EVENTS_POLL_INTERVAL = 1
+ORDER_EVENTS_QUEUE_SIZE = 100
+ORDER_EVENTS_RETENTION = 24 * 3600
+ORDER_EVENTS_HEARTBEAT = 15
+
+# Outbox workers (LittleLemonAPI.outbox, run_outbox command): messages claimed per batch, seconds a claimed
+# message is hidden from other workers, attempts before a message is marked dead, first retry delay (doubled on
+# every failure up to the maximum) and seconds between polls of an empty outbox
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_LEASE = 60
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF = 5
+OUTBOX_MAX_BACKOFF = 3600
+OUTBOX_POLL_INTERVAL = 1
+
+# Order receipts (sent by the outbox workers) are printed to the console in development
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Requests running more SQL queries than this are logged as a warning (see LittleLemonAPI.instrumentation)
+QUERY_BUDGET = 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,7 +226,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
 
 application = get_wsgi_application()
+
+# Opt-in background order dispatcher (settings.DISPATCHER_IN_PROCESS), see LittleLemonAPI.dispatcher
+from LittleLemonAPI.dispatcher import start_in_process_dispatcher  # noqa: E402
+
+start_in_process_dispatcher()
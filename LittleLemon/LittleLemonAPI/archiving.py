@@ -0,0 +1,82 @@
+"""
+Hot/cold order archiving.
+
+Delivered orders older than ARCHIVE_AFTER_DAYS move, with their items, from Order/OrderItem to
+ArchivedOrder/ArchivedOrderItem and keep their ids, so the live tables (and every OrderView listing and its
+COUNT(*)) only hold recent and pending orders. Each batch of orders is its own transaction:
+1. SELECT the ids of the oldest delivered orders before the cutoff
+2. INSERT ... SELECT the orders, then their items, into the archive tables
+3. DELETE the items, then the orders
+
+The CombinedOrder/CombinedOrderItem views read both sides; OrderView serves them with ?include_archived=true,
+and the reports are computed from them. Archiving leaves the reporting aggregates unchanged: an archived
+order was delivered, and stays delivered.
+"""
+
+import time
+from collections.abc import Iterator
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVE_AFTER_DAYS = getattr(settings, "ARCHIVE_AFTER_DAYS", 90)
+ARCHIVE_BATCH_SIZE = getattr(settings, "ARCHIVE_BATCH_SIZE", 1000)
+
+ORDER_COLUMNS = '"id", "user_id", "delivery_crew_id", "status", "total", "date"'
+ORDER_ITEM_COLUMNS = '"id", "order_id", "menu_item_id", "quantity", "unit_price", "price"'
+
+
+def archive_cutoff(days: int = ARCHIVE_AFTER_DAYS) -> date:
+    """Delivered orders dated before this day are archived"""
+    return timezone.now().date() - timedelta(days=days)
+
+
+def archive_batch(cutoff: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archives the oldest delivered orders dated before cutoff and returns how many were moved"""
+    with transaction.atomic():
+        ids = list(
+            Order.objects.filter(status=True, date__lt=cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("date", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{ArchivedOrder._meta.db_table}" ({ORDER_COLUMNS}) '
+                f'SELECT {ORDER_COLUMNS} FROM "{Order._meta.db_table}" WHERE "id" IN ({placeholders})',
+                ids,
+            )
+            cursor.execute(
+                f'INSERT INTO "{ArchivedOrderItem._meta.db_table}" ({ORDER_ITEM_COLUMNS}) '
+                f'SELECT {ORDER_ITEM_COLUMNS} FROM "{OrderItem._meta.db_table}" '
+                f'WHERE "order_id" IN ({placeholders})',
+                ids,
+            )
+        # No signals are connected to orders, so both are single DELETE statements
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(
+    cutoff: date, batch_size: int = ARCHIVE_BATCH_SIZE, pause: float = 0, max_orders: int | None = None
+) -> Iterator[int]:
+    """
+    Archives batch after batch until no delivered order before cutoff is left (or max_orders were moved),
+    sleeping pause seconds between batches so that the writes of the API are not starved; yields batch sizes
+    """
+    archived = 0
+    while max_orders is None or archived < max_orders:
+        limit = batch_size if max_orders is None else min(batch_size, max_orders - archived)
+        count = archive_batch(cutoff, limit)
+        if not count:
+            return
+        archived += count
+        yield count
+        if count == limit and pause:
+            time.sleep(pause)
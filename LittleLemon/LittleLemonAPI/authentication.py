@@ -0,0 +1,175 @@
+"""
+Token authentication backed by a snapshot cache.
+
+TokenAuthentication costs a Token + User query on every request, and the permission classes then need the
+user's groups. CachedTokenAuthentication maps the token key to a snapshot of the user row and group names,
+kept at two levels:
+- a bounded LRU in process memory, whose entries live AUTH_LOCAL_CACHE_TIMEOUT seconds
+- Django's cache framework, shared by the worker processes, for AUTH_CACHE_TIMEOUT seconds
+
+Snapshots are invalidated when a token is deleted (logout), when its user is saved (e.g. deactivated) or
+deleted, and when the user's group membership changes (see signals.py). Other processes drop their own LRU
+entries only when they expire, so AUTH_LOCAL_CACHE_TIMEOUT bounds how long they may accept a revoked token.
+
+The password hash is not part of the snapshot: it is a deferred field, loaded on access.
+"""
+
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from .roles import get_group_names, aget_group_names, remember_group_names
+
+AUTH_CACHE_TIMEOUT = getattr(settings, "AUTH_CACHE_TIMEOUT", 300)
+AUTH_LOCAL_CACHE_TIMEOUT = getattr(settings, "AUTH_LOCAL_CACHE_TIMEOUT", 10)
+AUTH_LOCAL_CACHE_SIZE = getattr(settings, "AUTH_LOCAL_CACHE_SIZE", 1024)
+
+USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != "password")
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, timeout: float):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._lock = Lock()
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_users(self, *user_ids: int):
+        with self._lock:
+            stale = [key for key, (_, snapshot) in self._entries.items() if snapshot["user"]["id"] in user_ids]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LRUCache(AUTH_LOCAL_CACHE_SIZE, AUTH_LOCAL_CACHE_TIMEOUT)
+
+
+def _cache_key(token_key: str) -> str:
+    # The raw token is a credential, keep it out of the shared cache
+    return "auth:token:" + sha256(token_key.encode()).hexdigest()
+
+
+def make_snapshot(token: Token, group_names: frozenset[str]) -> dict:
+    return {
+        "created": token.created,
+        "user": {field: getattr(token.user, field) for field in USER_FIELDS},
+        "group_names": group_names,
+    }
+
+
+def restore_snapshot(key: str, snapshot: dict) -> tuple[User, Token]:
+    user = User.from_db("default", USER_FIELDS, [snapshot["user"][field] for field in USER_FIELDS])
+    remember_group_names(user, snapshot["group_names"])
+    token = Token.from_db("default", ["key", "user_id", "created"], [key, user.id, snapshot["created"]])
+    token.user = user
+    return user, token
+
+
+def invalidate_tokens(*keys: str):
+    local_token_cache.delete(*keys)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(*user_ids: int):
+    local_token_cache.delete_users(*user_ids)
+    keys = Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+def check_active(user: User):
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed("User inactive or deleted.")
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def get_key(self, request) -> str | None:
+        """The token key of the Authorization header, None when the header is not for this scheme"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed("Invalid token header. No credentials provided.")
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed("Invalid token header. Token string should not contain spaces.")
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                "Invalid token header. Token string should not contain invalid characters."
+            )
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate, for the native async views"""
+        key = self.get_key(request)
+        return None if key is None else await aauthenticate_credentials(key)
+
+    def authenticate_credentials(self, key: str):
+        snapshot = local_token_cache.get(key)
+        if snapshot is None:
+            snapshot = cache.get(_cache_key(key))
+            if snapshot is None:
+                try:
+                    token = Token.objects.select_related("user").get(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed("Invalid token.")
+                snapshot = make_snapshot(token, get_group_names(token.user))
+                cache.set(_cache_key(key), snapshot, AUTH_CACHE_TIMEOUT)
+            local_token_cache.set(key, snapshot)
+        user, token = restore_snapshot(key, snapshot)
+        check_active(user)
+        return user, token
+
+
+async def aauthenticate_credentials(key: str) -> tuple[User, Token]:
+    """Async counterpart of CachedTokenAuthentication.authenticate_credentials"""
+    snapshot = local_token_cache.get(key)
+    if snapshot is None:
+        snapshot = await cache.aget(_cache_key(key))
+        if snapshot is None:
+            try:
+                token = await Token.objects.select_related("user").aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            snapshot = make_snapshot(token, await aget_group_names(token.user))
+            await cache.aset(_cache_key(key), snapshot, AUTH_CACHE_TIMEOUT)
+        local_token_cache.set(key, snapshot)
+    user, token = restore_snapshot(key, snapshot)
+    check_active(user)
+    return user, token
@@ -0,0 +1,147 @@
+"""
+Versioned response cache for the menu endpoints.
+
+Cached responses are keyed on the menu version plus the normalized query parameters. The version is a
+counter in Django's cache that is bumped once a save or delete of a MenuItem or Category commits (see
+signals.py and catalog.menu_changed()), so stale entries are never read again and simply expire. Misses are computed from the primary: a lagging
+replica would otherwise store its old menu under the new version until the entry expires. The same
+key doubles as the ETag, which lets a matching If-None-Match be answered with 304 before anything is queried
+or serialized.
+
+The version is only as shared as the cache it lives in: with several server processes, settings.CACHES must
+point at a shared backend (LITTLELEMON_REDIS_URL). With the per-process LocMemCache a bump is only seen by
+the process that made the write, the others keep serving their cached menu for up to MENU_CACHE_TIMEOUT.
+
+Writes that bypass model signals (QuerySet.update(), bulk_create()) must call catalog.menu_changed().
+"""
+
+import time
+from hashlib import md5
+from threading import Lock
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from .routers import use_primary
+from .utils import DrfRequest
+
+MENU_CACHE_TIMEOUT = getattr(settings, "MENU_CACHE_TIMEOUT", 600)
+MENU_VERSION_KEY = "menu:version"
+
+
+def get_menu_version() -> int:
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so an evicted counter never restarts at a version that was already used
+        cache.add(MENU_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+async def aget_menu_version() -> int:
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        cache.add(MENU_VERSION_KEY, time.time_ns(), None)
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+menu_cache_stats = CacheStats()
+
+
+CACHE_QUERY_PARAMS = (
+    "category", "title", "featured", "search", "ordering", "page", "limit", "paginate", "cursor", "fields"
+)
+CASE_INSENSITIVE_PARAMS = ("category", "title", "featured", "search")
+
+
+def menu_cache_key(version: int, host: str, basename: str, action: str, lookup, query_params) -> str:
+    """
+    Only the parameters in CACHE_QUERY_PARAMS affect the key; values of case-insensitive filters are lowercased.
+    The host is part of the key because paginated responses embed absolute next/previous links.
+    """
+    normalized = []
+    for param in CACHE_QUERY_PARAMS:
+        value = query_params.get(param, "").strip()
+        if not value:
+            continue
+        if param in CASE_INSENSITIVE_PARAMS:
+            value = value.lower()
+        normalized.append((param, value))
+    return f"menu:{version}:{host}:{basename}:{action}:{lookup or ''}:{urlencode(normalized)}"
+
+
+def menu_etag(key: str) -> str:
+    return '"%s"' % md5(key.encode()).hexdigest()
+
+
+def etag_matches(request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+class MenuCacheMixin:
+    """Caches list/retrieve responses of a menu viewset"""
+
+    def get_response_cache_key(self) -> str:
+        return menu_cache_key(
+            get_menu_version(),
+            self.request.get_host(),
+            self.basename,
+            self.action,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            self.request.query_params,
+        )
+
+    def cached_response(self, handler, request: DrfRequest, *args, **kwargs):
+        key = self.get_response_cache_key()
+        etag = menu_etag(key)
+        if etag_matches(request, etag):
+            menu_cache_stats.record(hit=True)
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        data = cache.get(key)
+        if data is not None:
+            menu_cache_stats.record(hit=True)
+            response = Response(data)
+        else:
+            menu_cache_stats.record(hit=False)
+            use_primary()
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, MENU_CACHE_TIMEOUT)
+        response["ETag"] = etag
+        return response
+
+    def list(self, request: DrfRequest, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: DrfRequest, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,71 @@
+"""
+Process-local snapshot of the menu for the cart write path.
+
+Adding to the cart only needs each menu item's existence and price, and the menu changes a few times a day
+while the cart is written on every request. The snapshot maps id -> MenuEntry and is tagged with the menu
+version of caching.py: it is loaded lazily, reloaded once the shared version moves on (any process saving or
+deleting a MenuItem or Category bumps it, see signals.py), and dropped right away in the process that made
+the change. Both happen once the change is committed (menu_changed()): before that, a concurrent reload would
+read the old rows and tag them with the new version, and keep them until the next change.
+
+Like the menu response cache, writes that bypass model signals must call menu_changed().
+"""
+
+from decimal import Decimal
+from threading import Lock
+from typing import NamedTuple
+from django.db import transaction
+from .caching import bump_menu_version, get_menu_version
+from .models import MenuItem
+
+
+class MenuEntry(NamedTuple):
+    id: int
+    price: Decimal
+    title: str
+    category_id: int
+    featured: bool
+
+
+class MenuCatalog:
+    def __init__(self):
+        self._lock = Lock()
+        # (version, entries) is replaced as a whole so that readers never need the lock
+        self._snapshot: tuple[int | None, dict[int, MenuEntry]] = (None, {})
+        self.loads = 0
+
+    def entries(self) -> dict[int, MenuEntry]:
+        version = get_menu_version()
+        loaded_version, entries = self._snapshot
+        if loaded_version == version:
+            return entries
+        with self._lock:
+            loaded_version, entries = self._snapshot
+            if loaded_version != version:
+                # The version is read before the rows, so a change committed in between reloads next time
+                entries = {
+                    row[0]: MenuEntry(*row)
+                    for row in MenuItem.objects.values_list("id", "price", "title", "category_id", "featured")
+                }
+                self._snapshot = (version, entries)
+                self.loads += 1
+            return entries
+
+    def get(self, menu_item_id: int) -> MenuEntry | None:
+        return self.entries().get(menu_item_id)
+
+    def invalidate(self):
+        self._snapshot = (None, {})
+
+
+menu_catalog = MenuCatalog()
+
+
+def menu_changed():
+    """Bumps the menu version and drops this process's snapshot once the current transaction commits"""
+
+    def publish():
+        bump_menu_version()
+        menu_catalog.invalidate()
+
+    transaction.on_commit(publish)
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core import checks
+from .routers import replica_enabled
+
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache_for_replica_reads(app_configs, **kwargs):
+    """Read-your-writes pins (routers.py) only hold when every server process sees the same cache"""
+    if replica_enabled() and settings.CACHES["default"]["BACKEND"] in LOCAL_CACHE_BACKENDS:
+        return [
+            checks.Warning(
+                "Replica reads are on, but the default cache is local to each process.",
+                hint="Set LITTLELEMON_REDIS_URL, or a client may not see its own writes on another worker.",
+                id="LittleLemonAPI.W001",
+            )
+        ]
+    return []
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache_for_menu_version(app_configs, **kwargs):
+    """The menu version (caching.py) is bumped in one process and must be seen by all of them"""
+    if settings.CACHES["default"]["BACKEND"] in LOCAL_CACHE_BACKENDS:
+        return [
+            checks.Warning(
+                "The default cache is local to each process, menu changes are not seen by the other workers.",
+                hint="Set LITTLELEMON_REDIS_URL when running more than one server process.",
+                id="LittleLemonAPI.W002",
+            )
+        ]
+    return []
@@ -0,0 +1,116 @@
+"""
+Automatic delivery crew assignment.
+
+Each dispatch cycle assigns up to DISPATCH_BATCH_SIZE unassigned pending orders, oldest first, to the active
+delivery crew members, always to the member with the fewest open (pending) orders. A cycle costs four
+queries however many orders and crew members there are:
+1. one grouped aggregate for the open-order count of every crew member
+2. the ids (and customers) of the unassigned pending orders
+3. a single UPDATE ... SET delivery_crew_id = CASE ... END for all of them
+4. one INSERT of their change events (events.py)
+
+The UPDATE only touches orders that are still unassigned, so an order a manager assigned in the meantime
+keeps its crew member. Cycles run from the dispatch_orders command, or from a Dispatcher thread inside the
+web process when settings.DISPATCHER_IN_PROCESS is set (in each process, which is safe for the same reason).
+"""
+
+import heapq
+import logging
+import threading
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import Case, Count, Q, Value, When
+from .events import record_order_events
+from .models import Order, OrderEvent
+from .utils import GroupEnum
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = getattr(settings, "DISPATCH_BATCH_SIZE", 100)
+DISPATCH_INTERVAL = getattr(settings, "DISPATCH_INTERVAL", 5)
+
+
+def get_open_order_counts() -> dict[int, int]:
+    """Open (pending) orders of every active delivery crew member, including those with none"""
+    return dict(
+        User.objects.filter(groups__name=GroupEnum.DELIVERY_CREW.value, is_active=True)
+        .annotate(open_orders=Count("delivery_crew", filter=Q(delivery_crew__status=False)))
+        .values_list("id", "open_orders")
+    )
+
+
+def balance(order_ids: list[int], open_orders: dict[int, int]) -> dict[int, list[int]]:
+    """Hands each order to the crew member with the fewest open orders (ties go to the lowest id)"""
+    heap = [(count, crew_id) for crew_id, count in open_orders.items()]
+    heapq.heapify(heap)
+    assignments = {}
+    for order_id in order_ids:
+        count, crew_id = heap[0]
+        assignments.setdefault(crew_id, []).append(order_id)
+        heapq.heapreplace(heap, (count + 1, crew_id))
+    return assignments
+
+
+@transaction.atomic
+def dispatch_pending_orders(batch_size: int = DISPATCH_BATCH_SIZE) -> dict[int, list[int]]:
+    """Runs one dispatch cycle and returns {crew member id: [order ids]}"""
+    open_orders = get_open_order_counts()
+    if not open_orders:
+        return {}
+    customers = dict(
+        Order.objects.filter(status=False, delivery_crew__isnull=True)
+        .select_for_update(skip_locked=True)
+        .order_by("date", "id")
+        .values_list("id", "user_id")[:batch_size]
+    )
+    if not customers:
+        return {}
+    assignments = balance(list(customers), open_orders)
+    Order.objects.filter(id__in=customers, delivery_crew__isnull=True).update(
+        delivery_crew_id=Case(
+            *[When(id__in=ids, then=Value(crew_id)) for crew_id, ids in assignments.items()]
+        )
+    )
+    record_order_events(
+        OrderEvent(order_id=order_id, customer_id=customers[order_id], status=False, delivery_crew_id=crew_id)
+        for crew_id, ids in assignments.items()
+        for order_id in ids
+    )
+    return assignments
+
+
+class Dispatcher(threading.Thread):
+    """Runs a dispatch cycle every interval seconds, or right away while there is a backlog"""
+
+    def __init__(self, batch_size: int = DISPATCH_BATCH_SIZE, interval: float = DISPATCH_INTERVAL):
+        super().__init__(name="order-dispatcher", daemon=True)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            assigned = 0
+            close_old_connections()
+            try:
+                assigned = sum(map(len, dispatch_pending_orders(self.batch_size).values()))
+            except Exception:
+                logger.exception("Dispatch cycle failed")
+            finally:
+                close_old_connections()
+            # A full batch means more orders are probably waiting
+            if assigned < self.batch_size:
+                self._stop_event.wait(self.interval)
+
+    def stop(self, timeout: float | None = None):
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def start_in_process_dispatcher() -> Dispatcher | None:
+    if not getattr(settings, "DISPATCHER_IN_PROCESS", False):
+        return None
+    dispatcher = Dispatcher()
+    dispatcher.start()
+    return dispatcher
@@ -0,0 +1,198 @@
+"""
+Order change events, pushed to the SSE stream of views/events.py.
+
+Status and delivery crew changes are written to the OrderEvent log in the transaction that makes them and
+handed to the in-process broker once it commits, which forwards them to the subscribers of this process
+straight away. Changes made by other worker processes arrive through the log: while a process has
+subscribers, a poller thread reads the events past the last id it has seen every ORDER_EVENTS_POLL_INTERVAL
+seconds. The broker remembers the ids it recently forwarded, so an event arriving both ways is only sent
+once.
+
+Subscribers only receive the events of orders they may see (the rules of filter_orders). Each one has a
+bounded queue: a subscriber that falls behind is flagged as lagging and catches up from the log instead of
+growing its queue. The log is also what lets a reconnecting client resume after its Last-Event-ID; events
+older than ORDER_EVENTS_RETENTION seconds are removed by the prune_order_events command.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .models import Order, OrderEvent
+from .utils import GroupEnum
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_POLL_INTERVAL = getattr(settings, "ORDER_EVENTS_POLL_INTERVAL", 1)
+ORDER_EVENTS_QUEUE_SIZE = getattr(settings, "ORDER_EVENTS_QUEUE_SIZE", 100)
+ORDER_EVENTS_RETENTION = getattr(settings, "ORDER_EVENTS_RETENTION", 24 * 3600)
+
+
+def order_event(
+    order: Order, previous_status: bool, previous_delivery_crew_id: int | None
+) -> OrderEvent | None:
+    """The event for an order whose status or delivery crew changed, None when neither did"""
+    if order.status == previous_status and order.delivery_crew_id == previous_delivery_crew_id:
+        return None
+    return OrderEvent(
+        order_id=order.id,
+        customer_id=order.user_id,
+        status=order.status,
+        delivery_crew_id=order.delivery_crew_id,
+        previous_delivery_crew_id=previous_delivery_crew_id,
+    )
+
+
+def record_order_events(events: Iterable[OrderEvent | None]):
+    """Writes the events (None entries are skipped) in the current transaction, publishes them after commit"""
+    events = [event for event in events if event is not None]
+    if not events:
+        return
+    OrderEvent.objects.bulk_create(events)
+    transaction.on_commit(lambda: order_event_broker.publish(events))
+
+
+def visible_events(user_id: int, group_names: frozenset[str]) -> Q:
+    """The events of the orders a user may see, as a filter on OrderEvent"""
+    if GroupEnum.MANAGER.value in group_names:
+        return Q()
+    if GroupEnum.DELIVERY_CREW.value in group_names:
+        # A crew member also learns that an order was taken away from them
+        return Q(delivery_crew_id=user_id) | Q(previous_delivery_crew_id=user_id)
+    return Q(customer_id=user_id)
+
+
+def serialize_event(event: OrderEvent, group_names: frozenset[str]) -> dict:
+    data = {"id": event.order_id, "status": event.status}
+    # Customers' order representations leave out the delivery crew as well
+    if group_names:
+        data["delivery_crew"] = event.delivery_crew_id
+    return data
+
+
+class Subscription:
+    """One SSE connection; created, fed and read on the event loop of its request"""
+
+    def __init__(self, user_id: int, group_names: frozenset[str]):
+        self.user_id = user_id
+        self.group_names = group_names
+        self.is_manager = GroupEnum.MANAGER.value in group_names
+        self.is_delivery_crew = GroupEnum.DELIVERY_CREW.value in group_names
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[OrderEvent] = asyncio.Queue(ORDER_EVENTS_QUEUE_SIZE)
+        self.lagging = False
+
+    def can_see(self, event: OrderEvent) -> bool:
+        """visible_events() for a single event"""
+        if self.is_manager:
+            return True
+        if self.is_delivery_crew:
+            return self.user_id in (event.delivery_crew_id, event.previous_delivery_crew_id)
+        return event.customer_id == self.user_id
+
+    def offer(self, events: list[OrderEvent]):
+        for event in events:
+            if self.lagging or not self.can_see(event):
+                continue
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The stream reads what it missed from the log
+                self.lagging = True
+
+
+class OrderEventBroker:
+    def __init__(self, poll_interval: float = ORDER_EVENTS_POLL_INTERVAL, remember: int = 10_000):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscriptions: set[Subscription] = set()
+        self._forwarded: OrderedDict[int, None] = OrderedDict()
+        self._remember = remember
+        self._poller: threading.Thread | None = None
+        self._has_subscribers = threading.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, user_id: int, group_names: frozenset[str]) -> Subscription:
+        subscription = Subscription(user_id, group_names)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            self._has_subscribers.set()
+            if self.poll_interval and self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="order-event-poller", daemon=True)
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            if not self._subscriptions:
+                self._has_subscribers.clear()
+
+    def publish(self, events: list[OrderEvent]):
+        """Forwards events not forwarded before to the subscribers; callable from any thread"""
+        with self._lock:
+            events = [event for event in events if event.id not in self._forwarded]
+            for event in events:
+                self._forwarded[event.id] = None
+            while len(self._forwarded) > self._remember:
+                self._forwarded.popitem(last=False)
+            subscriptions = list(self._subscriptions)
+        if not events:
+            return
+        # One callback per event loop rather than per subscriber
+        by_loop: dict[asyncio.AbstractEventLoop, list[Subscription]] = {}
+        for subscription in subscriptions:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, loop_subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._offer, loop_subscriptions, events)
+            except RuntimeError:
+                # The event loop is closed, and with it its connections
+                for subscription in loop_subscriptions:
+                    self.unsubscribe(subscription)
+
+    @staticmethod
+    def _offer(subscriptions: list[Subscription], events: list[OrderEvent]):
+        for subscription in subscriptions:
+            subscription.offer(events)
+
+    def _poll(self):
+        last_id = None
+        while True:
+            if not self._has_subscribers.is_set():
+                # Events written while nobody listened are not needed: clients resume from the log
+                last_id = None
+                self._has_subscribers.wait()
+            close_old_connections()
+            try:
+                if last_id is None:
+                    last_id = OrderEvent.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+                else:
+                    events = list(OrderEvent.objects.filter(id__gt=last_id).order_by("id")[:1000])
+                    if events:
+                        last_id = events[-1].id
+                        self.publish(events)
+            except Exception:
+                logger.exception("Polling the order event log failed")
+            finally:
+                close_old_connections()
+            time.sleep(self.poll_interval)
+
+
+order_event_broker = OrderEventBroker()
+
+
+def prune_order_events(older_than: float = ORDER_EVENTS_RETENTION) -> int:
+    """Deletes the events logged more than older_than seconds ago and returns how many"""
+    deleted, _ = OrderEvent.objects.filter(created__lt=timezone.now() - timedelta(seconds=older_than)).delete()
+    return deleted
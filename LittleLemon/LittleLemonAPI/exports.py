@@ -0,0 +1,118 @@
+"""
+Streaming order and menu exports.
+
+Orders are read as plain tuples with QuerySet.iterator(chunk_size=...), which fetches rows from the database
+cursor in chunks; the items of each chunk are loaded with one IN query, and every row is encoded and yielded
+immediately. Memory therefore stays bounded by the chunk size no matter how many orders are exported.
+
+Under ASGI, Django would consume these synchronous generators whole before sending anything (see
+StreamingHttpResponse.__aiter__). The views therefore pass them through streaming_content(), which under ASGI
+wraps them in aiter_export(): batches of EXPORT_ASYNC_BATCH_SIZE chunks are taken from the generator in a
+worker thread (always the request's own, so the database cursor stays usable) and sent as they come.
+"""
+
+import csv
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterator
+from itertools import batched, islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+EXPORT_ASYNC_BATCH_SIZE = getattr(settings, "EXPORT_ASYNC_BATCH_SIZE", 500)
+
+ORDER_COLUMNS = ["id", "user", "delivery_crew", "status", "total", "date"]
+ITEM_COLUMNS = ["menu_item", "quantity", "unit_price", "price"]
+# Categories are exported by title: slugs carry a random suffix and differ between environments
+MENU_COLUMNS = ["title", "price", "featured", "category"]
+
+
+async def aiter_export(chunks: Iterator[str], batch_size: int = EXPORT_ASYNC_BATCH_SIZE) -> AsyncIterator[str]:
+    """Async iterator over an export generator, advanced batch_size chunks per worker thread call"""
+    chunks = iter(chunks)
+    next_batch = sync_to_async(lambda: "".join(islice(chunks, batch_size)), thread_sensitive=True)
+    try:
+        while batch := await next_batch():
+            yield batch
+    finally:
+        # Closes the database cursor of a client that went away mid-export, in the thread that opened it
+        if hasattr(chunks, "close"):
+            await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def streaming_content(request, chunks: Iterator[str]) -> Iterator[str] | AsyncIterator[str]:
+    """The export generator as the server streams it without buffering: async under ASGI, as is under WSGI"""
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        return aiter_export(chunks)
+    return chunks
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes instead of buffering it"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _iter_orders(queryset: QuerySet) -> Iterator[tuple[tuple, list[tuple]]]:
+    """Yields (order values, [item values, ...]) in ORDER_COLUMNS / ITEM_COLUMNS order"""
+    rows = queryset.values_list(*ORDER_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for chunk in batched(rows, EXPORT_CHUNK_SIZE):
+        items = defaultdict(list)
+        for item in (
+            OrderItem.objects.filter(order_id__in=[row[0] for row in chunk])
+            .order_by("id")
+            .values_list("order_id", *ITEM_COLUMNS)
+        ):
+            items[item[0]].append(item[1:])
+        for row in chunk:
+            yield row, items.get(row[0], [])
+
+
+def iter_orders_csv(queryset: QuerySet) -> Iterator[str]:
+    """One row per order item; orders without items get a single row with empty item columns"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(ORDER_COLUMNS + [f"item_{column}" for column in ITEM_COLUMNS])
+    empty_item = ("",) * len(ITEM_COLUMNS)
+    for order, items in _iter_orders(queryset):
+        if not items:
+            yield writer.writerow(order + empty_item)
+        for item in items:
+            yield writer.writerow(order + item)
+
+
+def iter_orders_ndjson(queryset: QuerySet) -> Iterator[str]:
+    """One JSON object per line and per order, with its items nested"""
+    encoder = DjangoJSONEncoder()
+    for order, items in _iter_orders(queryset):
+        row = dict(zip(ORDER_COLUMNS, order))
+        row["items"] = [dict(zip(ITEM_COLUMNS, item)) for item in items]
+        yield encoder.encode(row) + "\n"
+
+
+def _iter_menu_items(queryset: QuerySet) -> Iterator[tuple]:
+    return queryset.values_list("title", "price", "featured", "category__title").iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def iter_menu_csv(queryset: QuerySet) -> Iterator[str]:
+    """Same format as imports.parse_menu_csv reads"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(MENU_COLUMNS)
+    for row in _iter_menu_items(queryset):
+        yield writer.writerow(row)
+
+
+def iter_menu_json(queryset: QuerySet) -> Iterator[str]:
+    """A JSON array with one item per line, as imports.parse_menu_json reads"""
+    encoder = DjangoJSONEncoder()
+    separator = "[\n"
+    for row in _iter_menu_items(queryset):
+        yield separator + encoder.encode(dict(zip(MENU_COLUMNS, row)))
+        separator = ",\n"
+    yield "[]\n" if separator == "[\n" else "\n]\n"
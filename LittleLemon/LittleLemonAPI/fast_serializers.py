@@ -0,0 +1,138 @@
+"""
+Read-only fast path for the list endpoints.
+
+A ModelSerializer builds a model instance per row and then calls every field's to_representation. For a list
+page, ValuesSerializer skips both: rows come straight from QuerySet.values(), and each field goes through a
+converter compiled once per serializer class (None when the database value is already the JSON value). The
+output is the same JSON as the ModelSerializer's, key order included.
+
+?fields=a,b (comma separated) narrows the response to some of the fields, and the SQL SELECT to their columns
+(plus the ordering columns cursor pagination needs to build the next cursor).
+"""
+
+from collections.abc import Callable, Iterable
+from decimal import Decimal
+from functools import cache
+from django.db.models import QuerySet
+from rest_framework import exceptions, fields as drf_fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .instrumentation import serializing
+from .utils import DrfRequest, KeysetPagination
+
+FIELDS_PARAM = "fields"
+
+
+def compile_converter(field: drf_fields.Field) -> Callable | None:
+    """Function turning a non-null database value into the field's representation, None for the identity"""
+    if isinstance(field, (drf_fields.IntegerField, drf_fields.BooleanField, drf_fields.CharField)):
+        return None
+    if isinstance(field, drf_fields.DecimalField):
+        if (
+            field.decimal_places is not None
+            and not field.normalize_output
+            and not field.localize
+            and getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+        ):
+            exponent = Decimal(1).scaleb(-field.decimal_places)
+            return lambda value: f"{value.quantize(exponent, rounding=field.rounding):f}"
+    if isinstance(field, drf_fields.DateField):
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if output_format is None:
+            return None
+        if output_format.lower() == drf_fields.ISO_8601:
+            return lambda value: value.isoformat()
+    return field.to_representation
+
+
+def skip_none(convert: Callable | None) -> Callable | None:
+    # Serializer.to_representation outputs None for a None attribute without calling the field
+    if convert is None:
+        return None
+    return lambda value: None if value is None else convert(value)
+
+
+def compile_field(field: drf_fields.Field) -> tuple[str, Callable | None]:
+    """The values() lookup and the converter (None for the identity) of a serializer field"""
+    if field.source == "*" or isinstance(field, (serializers.BaseSerializer, relations.ManyRelatedField)):
+        raise TypeError(f"{field.field_name}: only model columns and foreign keys are supported")
+    lookup = "__".join(field.source_attrs)
+    if isinstance(field, relations.SlugRelatedField):
+        return f"{lookup}__{field.slug_field}", None
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            return lookup, skip_none(field.pk_field.to_representation)
+        # values() returns the foreign key's id
+        return lookup, None
+    if isinstance(field, relations.RelatedField):
+        raise TypeError(f"{field.field_name}: {type(field).__name__} is not supported")
+    return lookup, skip_none(compile_converter(field))
+
+
+class ValuesSerializer:
+    def __init__(self, serializer_class: type[serializers.ModelSerializer]):
+        self.columns: dict[str, tuple[str, Callable | None]] = {
+            name: compile_field(field)
+            for name, field in serializer_class().fields.items()
+            if not field.write_only
+        }
+
+    def get_fields(self, query_params) -> list[str]:
+        """The ?fields= subset, in declaration order (all the fields without the parameter)"""
+        requested = {name.strip() for name in query_params.get(FIELDS_PARAM, "").split(",") if name.strip()}
+        if not requested:
+            return list(self.columns)
+        unknown = requested.difference(self.columns)
+        if unknown:
+            raise exceptions.ValidationError(
+                {
+                    FIELDS_PARAM: f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                    f"Available: {', '.join(self.columns)}"
+                }
+            )
+        return [name for name in self.columns if name in requested]
+
+    def values(self, queryset: QuerySet, fields: list[str], extra: Iterable[str] = ()) -> QuerySet:
+        lookups = dict.fromkeys([self.columns[name][0] for name in fields] + list(extra))
+        return queryset.values(*lookups)
+
+    def serialize(self, rows: Iterable[dict], fields: list[str]) -> list[dict]:
+        columns = [(name, *self.columns[name]) for name in fields]
+        with serializing():
+            return [
+                {
+                    name: row[lookup] if convert is None else convert(row[lookup])
+                    for name, lookup, convert in columns
+                }
+                for row in rows
+            ]
+
+
+@cache
+def get_values_serializer(serializer_class: type[serializers.ModelSerializer]) -> ValuesSerializer:
+    return ValuesSerializer(serializer_class)
+
+
+class ValuesListMixin:
+    """list() through the ValuesSerializer of get_serializer_class(), unless use_values_serializer() is False"""
+
+    def use_values_serializer(self) -> bool:
+        return True
+
+    def get_values(self, queryset: QuerySet) -> tuple[ValuesSerializer, list[str], QuerySet]:
+        """The ValuesSerializer, the ?fields= subset and the values() rows of the queryset for them"""
+        serializer = get_values_serializer(self.get_serializer_class())
+        fields = serializer.get_fields(self.request.query_params)
+        extra = ()
+        if isinstance(self.paginator, KeysetPagination):
+            extra = [field.lstrip("-") for field in self.paginator.get_ordering(queryset, self)]
+        return serializer, fields, serializer.values(queryset, fields, extra)
+
+    def list(self, request: DrfRequest, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().list(request, *args, **kwargs)
+        serializer, fields, rows = self.get_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page, fields))
+        return Response(serializer.serialize(rows, fields))
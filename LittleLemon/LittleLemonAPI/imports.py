@@ -0,0 +1,160 @@
+"""
+Bulk menu imports, in the format produced by exports.iter_menu_csv / iter_menu_json.
+
+Every row is a menu item (title, price, featured, category), where category is the slug or the title of a
+category; unknown categories are created on the fly. Rows are processed in batches of IMPORT_BATCH_SIZE,
+each costing a fixed number of queries and its own transaction:
+1. SELECT the referenced categories by slug or title
+2. INSERT the missing categories, then SELECT them back for their ids
+3. SELECT the titles that already exist, to tell created from updated items
+4. upsert the items with one INSERT ... ON CONFLICT (title) DO UPDATE ... RETURNING id
+5. reindex them for search (2 statements)
+
+Invalid rows are reported with their row number and skipped; they do not abort the rest of the import.
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import batched
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework import exceptions, serializers
+from .catalog import menu_changed
+from .exports import MENU_COLUMNS
+from .models import Category, MenuItem
+from .search import index_menu_items
+
+IMPORT_BATCH_SIZE = getattr(settings, "IMPORT_BATCH_SIZE", 1000)
+
+
+class MenuItemImportSerializer(serializers.Serializer):
+    """Validates a row without touching the database"""
+
+    title = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0)
+    featured = serializers.BooleanField(default=False)
+    category = serializers.CharField(max_length=255)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+
+def parse_menu_csv(stream: Iterable[str]) -> Iterator[dict]:
+    reader = csv.DictReader(stream)
+    missing = set(MENU_COLUMNS) - {"featured"} - set(reader.fieldnames or ())
+    if missing:
+        raise exceptions.ValidationError({"file": f"Missing CSV column(s): {', '.join(sorted(missing))}"})
+    for row in reader:
+        # Empty cells mean the default, as for a missing key in JSON
+        yield {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def parse_menu_json(data: str | bytes) -> list[dict]:
+    try:
+        rows = json.loads(data)
+    except ValueError as exc:
+        raise exceptions.ValidationError({"file": f"Invalid JSON: {exc}"})
+    if not isinstance(rows, list):
+        raise exceptions.ValidationError({"file": "Expected a JSON array of menu items"})
+    return rows
+
+
+def parse_menu_file(uploaded_file, input_format: str) -> Iterable[dict]:
+    if input_format == "json":
+        return parse_menu_json(uploaded_file.read())
+    return parse_menu_csv(io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline=""))
+
+
+def resolve_categories(names: set[str]) -> dict[str, int]:
+    """
+    Maps each slug or title to a category id, creating categories for the unknown names. Titles are matched
+    case-insensitively, like the category filter of the menu, so "mains" doesn't create a second "Mains".
+    """
+    by_slug, by_title = {}, {}
+    matching = Category.objects.annotate(title_lower=Lower("title")).filter(
+        Q(slug__in=names) | Q(title_lower__in={name.lower() for name in names})
+    )
+    for category_id, slug, title in matching.values_list("id", "slug", "title_lower"):
+        by_slug[slug] = by_title[title] = category_id
+    categories = {}
+    for name in names:
+        category_id = by_slug.get(name) or by_title.get(name.lower())
+        if category_id is not None:
+            categories[name] = category_id
+    missing = names - categories.keys()
+    if missing:
+        # One category per title, however it is capitalized in the rows
+        titles = {}
+        for title in sorted(missing):
+            titles.setdefault(title.lower(), title)
+        # ignore_conflicts: a concurrent import may create the same category
+        Category.objects.bulk_create(
+            [Category(title=title, slug=Category.generate_slug(title)) for title in titles.values()],
+            ignore_conflicts=True,
+        )
+        created = dict(
+            Category.objects.annotate(title_lower=Lower("title"))
+            .filter(title_lower__in=titles.keys())
+            .values_list("title_lower", "id")
+        )
+        categories.update((name, created[name.lower()]) for name in missing)
+    return categories
+
+
+def import_menu_items(rows: Iterable[dict], batch_size: int = IMPORT_BATCH_SIZE) -> ImportResult:
+    result = ImportResult()
+    seen_titles = set()
+    for batch in batched(enumerate(rows, start=1), batch_size):
+        valid = []
+        for row_number, row in batch:
+            serializer = MenuItemImportSerializer(data=row)
+            if not serializer.is_valid():
+                result.errors.append({"row": row_number, "errors": serializer.errors})
+            elif serializer.validated_data["title"] in seen_titles:
+                duplicate = {"title": ["Duplicate title in the import."]}
+                result.errors.append({"row": row_number, "errors": duplicate})
+            else:
+                seen_titles.add(serializer.validated_data["title"])
+                valid.append(serializer.validated_data)
+        if not valid:
+            continue
+
+        with transaction.atomic():
+            categories = resolve_categories({row["category"] for row in valid})
+            titles = [row["title"] for row in valid]
+            existing = set(MenuItem.objects.filter(title__in=titles).values_list("title", flat=True))
+            items = MenuItem.objects.bulk_create(
+                [
+                    MenuItem(
+                        title=row["title"],
+                        price=row["price"],
+                        featured=row["featured"],
+                        category_id=categories[row["category"]],
+                    )
+                    for row in valid
+                ],
+                update_conflicts=True,
+                unique_fields=["title"],
+                update_fields=["price", "featured", "category"],
+            )
+            # bulk_create sends no post_save: reindex here and report the menu change below.
+            # SQLite and PostgreSQL return the ids of both the inserted and the updated rows.
+            ids = [item.id for item in items]
+            if None in ids:
+                ids = MenuItem.objects.filter(title__in=titles).values_list("id", flat=True)
+            index_menu_items(ids)
+        result.updated += len(existing)
+        result.created += len(valid) - len(existing)
+
+    if result.created or result.updated:
+        menu_changed()
+    return result
@@ -0,0 +1,291 @@
+"""
+Per-request query and latency instrumentation.
+
+InstrumentationMiddleware measures, for every request, the number of SQL queries, the time spent in the
+database, the time spent serializing (the serializers' to_representation(), see serializing()), the time spent
+rendering the response and the wall time. They are sent back as a Server-Timing header and aggregated per
+view/action into histograms, which MetricsView exposes in the Prometheus text format. A request that runs more
+queries than settings.QUERY_BUDGET is logged as a warning.
+
+The content of a streaming response (exports, event streams) is produced after the view returned, so such a
+request is only observed once its response is closed, with the queries the content ran; its Server-Timing
+header, sent before the content, covers the view alone.
+
+Queries are counted by an execute wrapper installed on every database connection (see signals.py). It
+reports to the RequestStats of the current context, so queries run by async views in a worker thread
+(sync_to_async copies the context) are attributed to the right request as well.
+
+The histograms live in process memory: each worker process exposes its own.
+"""
+
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .caching import menu_cache_stats
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = getattr(settings, "QUERY_BUDGET", 20)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+@dataclass
+class RequestStats:
+    view: str = "unresolved"
+    queries: int = 0
+    db_time: float = 0.0
+    serialize_time: float = 0.0
+    render_time: float = 0.0
+    render_start: float = field(default=0.0, repr=False)
+    serializing: bool = field(default=False, repr=False)
+
+
+_current_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper (see connection.execute_wrappers) counting the queries of the current request"""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializing():
+    """
+    Adds the time spent in the block to the current request's serialization time, less the queries it ran
+    (counted as db time). Nested blocks, such as the nested serializers of a serializer, are only counted once.
+    """
+    stats = _current_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    db_time = stats.db_time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize_time += time.perf_counter() - start - (stats.db_time - db_time)
+        stats.serializing = False
+
+
+class TimedSerializerMixin:
+    """Counts a serializer's to_representation() as serialization time"""
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One counter per bucket plus +Inf, not cumulative until exported
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+class RequestMetrics:
+    METRICS = {
+        # name: (help, buckets)
+        "littlelemon_request_duration_seconds": ("Wall time of the request", SECONDS_BUCKETS),
+        "littlelemon_request_db_seconds": ("Time spent executing SQL queries", SECONDS_BUCKETS),
+        "littlelemon_request_serialize_seconds": ("Time spent serializing, SQL queries excluded", SECONDS_BUCKETS),
+        "littlelemon_request_render_seconds": ("Time spent rendering the response", SECONDS_BUCKETS),
+        "littlelemon_request_queries": ("Number of SQL queries", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = Lock()
+        self.histograms: dict[str, dict[str, Histogram]] = {name: {} for name in self.METRICS}
+
+    def observe(self, stats: RequestStats, wall_time: float):
+        values = {
+            "littlelemon_request_duration_seconds": wall_time,
+            "littlelemon_request_db_seconds": stats.db_time,
+            "littlelemon_request_serialize_seconds": stats.serialize_time,
+            "littlelemon_request_render_seconds": stats.render_time,
+            "littlelemon_request_queries": stats.queries,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histogram = self.histograms[name].get(stats.view)
+                if histogram is None:
+                    histogram = self.histograms[name][stats.view] = Histogram(self.METRICS[name][1])
+                histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in self.METRICS}
+
+    def export(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.METRICS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for view, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{view="{view}"}} {sum(histogram.counts)}')
+        lines += [
+            "# HELP littlelemon_menu_cache_requests_total Menu response cache lookups",
+            "# TYPE littlelemon_menu_cache_requests_total counter",
+            f'littlelemon_menu_cache_requests_total{{result="hit"}} {menu_cache_stats.hits}',
+            f'littlelemon_menu_cache_requests_total{{result="miss"}} {menu_cache_stats.misses}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def get_view_label(view_func, method: str) -> str:
+    """ViewSet.action for viewsets, View.method otherwise"""
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    if view_class is None:
+        return view_func.__name__
+    actions = getattr(view_func, "actions", None)
+    if actions:
+        return f"{view_class.__name__}.{actions.get(method.lower(), method.lower())}"
+    return f"{view_class.__name__}.{method.lower()}"
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.view = get_view_label(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler right after this hook
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.render_start = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(stats))
+        return response
+
+    @staticmethod
+    def rendered(stats: RequestStats):
+        stats.render_time = time.perf_counter() - stats.render_start
+
+    def finish(self, request, response, stats: RequestStats, start: float):
+        wall_time = time.perf_counter() - start
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+                f"serialize;dur={stats.serialize_time * 1000:.2f}",
+                f"render;dur={stats.render_time * 1000:.2f}",
+                f"total;dur={wall_time * 1000:.2f}",
+            ]
+        )
+        if not response.streaming:
+            self.observe(request, stats, wall_time)
+        elif response.is_async:
+            response.streaming_content = self.astream(response.streaming_content, request, stats, start)
+        else:
+            response.streaming_content = self.stream(response.streaming_content, request, stats, start)
+        return response
+
+    def stream(self, content, request, stats: RequestStats, start: float):
+        """The streaming content, its queries attributed to the request, which is observed once it is closed"""
+        try:
+            while True:
+                token = _current_stats.set(stats)
+                try:
+                    chunk = next(content, None)
+                finally:
+                    _current_stats.reset(token)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.observe(request, stats, time.perf_counter() - start)
+
+    async def astream(self, content, request, stats: RequestStats, start: float):
+        try:
+            while True:
+                token = _current_stats.set(stats)
+                try:
+                    chunk = await anext(content, None)
+                finally:
+                    _current_stats.reset(token)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.observe(request, stats, time.perf_counter() - start)
+
+    @staticmethod
+    def observe(request, stats: RequestStats, wall_time: float):
+        request_metrics.observe(stats, wall_time)
+        if stats.queries > QUERY_BUDGET:
+            logger.warning(
+                "%s %s (%s) ran %d SQL queries, over the budget of %d",
+                request.method,
+                request.path,
+                stats.view,
+                stats.queries,
+                QUERY_BUDGET,
+            )
@@ -0,0 +1,37 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.archiving import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than --older-than days, with their items, to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS, help="Age in days")
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            default=None,
+            help="Archive the orders dated before this day instead (YYYY-MM-DD)",
+        )
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Orders per transaction")
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Seconds to sleep between batches, to leave room for the API"
+        )
+        parser.add_argument("--max-orders", type=int, default=None, help="Stop after this many orders")
+
+    def handle(self, *args, **options):
+        cutoff = options["before"] or archive_cutoff(options["older_than"])
+        started = time.perf_counter()
+        archived = 0
+        for count in archive_orders(cutoff, options["batch_size"], options["pause"], options["max_orders"]):
+            archived += count
+            if options["verbosity"] > 1:
+                self.stdout.write(f"[{time.perf_counter() - started:7.1f}s] {archived} orders archived")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} delivered orders dated before {cutoff} "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        )
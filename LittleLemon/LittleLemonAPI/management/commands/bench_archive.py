@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+from statistics import median
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from LittleLemonAPI.archiving import archive_cutoff, archive_orders
+from LittleLemonAPI.models import CombinedOrder, Order
+from LittleLemonAPI.utils import CustomPageNumberPagination
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the first page (with its COUNT(*)) of the order listings before and after archiving the old "
+        "delivered orders (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=500_000)
+        parser.add_argument("--days", type=int, default=730, help="Number of days the orders are spread over")
+        parser.add_argument("--older-than", type=int, default=90, help="Archive delivered orders older than this")
+        parser.add_argument("--limit", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def time_page(self, queryset, limit: int, repeat: int) -> float:
+        request = Request(APIRequestFactory().get("/api/orders/", {"limit": limit}))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            page = CustomPageNumberPagination().paginate_queryset(queryset, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert page, "empty page"
+        return median(timings)
+
+    def run(self, orders: int, days: int, older_than: int, limit: int, repeat: int, **options):
+        users = User.objects.bulk_create(User(username=f"bench-archive-user-{i}") for i in range(100))
+        today = archive_cutoff(0)
+        Order.objects.bulk_create(
+            (
+                # Everything but the last two days has been delivered
+                Order(
+                    user=users[i % len(users)],
+                    total=10,
+                    status=i % days > 1,
+                    date=today - timedelta(days=i % days),
+                )
+                for i in range(orders)
+            ),
+            batch_size=5000,
+        )
+        shapes = [
+            ("all orders", lambda model: model.objects.all()),
+            ("pending", lambda model: model.objects.filter(status=False)),
+            ("customer", lambda model: model.objects.filter(user=users[0])),
+        ]
+        before = {label: self.time_page(shape(Order), limit, repeat) for label, shape in shapes}
+
+        started = time.perf_counter()
+        archived = sum(archive_orders(archive_cutoff(older_than), batch_size=5000))
+        self.stdout.write(f"Archived {archived} of {orders} orders in {time.perf_counter() - started:.1f}s")
+
+        self.stdout.write(f"{'listing':<12} {'before ms':>10} {'after ms':>9} {'include_archived ms':>20}")
+        for label, shape in shapes:
+            after = self.time_page(shape(Order), limit, repeat)
+            combined = self.time_page(shape(CombinedOrder), limit, repeat)
+            self.stdout.write(f"{label:<12} {before[label]:>10.2f} {after:>9.2f} {combined:>20.2f}")
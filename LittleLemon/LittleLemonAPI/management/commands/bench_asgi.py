@@ -0,0 +1,80 @@
+import asyncio
+import time
+from statistics import quantiles
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.urls import reverse
+from asgiref.sync import async_to_sync
+from rest_framework.authtoken.models import Token
+from LittleLemonAPI.models import Category, MenuItem, Order
+
+
+class Rollback(Exception):
+    pass
+
+
+ENDPOINTS = [
+    ("menu-items-list", "async-menu-items-list", "?limit=20"),
+    ("orders-list", "async-orders-list", "?limit=20"),
+    ("orders-list", "async-orders-list", "?paginate=cursor&limit=20"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and p99 latency of the DRF read endpoints and their native async versions "
+        "under concurrent requests through the ASGI handler (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--orders", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            # DEBUG would record every query and enable the debug toolbar, which dwarfs the request itself
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"], DEBUG=False):
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_data(self, orders: int) -> str:
+        user = User.objects.create_user("bench-asgi-user")
+        category = Category.objects.create(title="bench-asgi", slug="bench-asgi")
+        MenuItem.objects.bulk_create(
+            MenuItem(title=f"bench-asgi-{i}", price=i % 30 + 1, category=category) for i in range(100)
+        )
+        Order.objects.bulk_create((Order(user=user, total=10) for _ in range(orders)), batch_size=5000)
+        return Token.objects.create(user=user).key
+
+    async def measure(self, url: str, token: str, requests: int, concurrency: int) -> tuple[float, float]:
+        client = AsyncClient()
+        headers = {"Authorization": f"Token {token}"}
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+
+        async def fetch():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        return requests / elapsed, quantiles(timings, n=100)[98]
+
+    def run(self, requests: int, concurrency: int, orders: int, **options):
+        token = self.create_data(orders)
+        self.stdout.write(f"{'endpoint':<40} {'view':>6} {'req/s':>8} {'p99 ms':>8}")
+        for sync_name, async_name, query in ENDPOINTS:
+            for label, name in (("drf", sync_name), ("async", async_name)):
+                url = reverse(f"LittleLemonAPI:{name}") + query
+                rate, p99 = async_to_sync(self.measure)(url, token, requests, concurrency)
+                self.stdout.write(f"{reverse(f'LittleLemonAPI:{sync_name}') + query:<40} {label:>6} {rate:>8.0f} {p99:>8.2f}")
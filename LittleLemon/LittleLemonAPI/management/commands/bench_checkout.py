@@ -0,0 +1,81 @@
+import time
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from LittleLemonAPI.models import Category, MenuItem, Cart, Order, OrderItem
+from LittleLemonAPI.services import place_order
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_place_order(user: User):
+    """The per-line checkout that OrderView.create used before services.place_order"""
+    with transaction.atomic():
+        carts = Cart.objects.select_related("menu_item").filter(user=user)
+        if not carts.exists():
+            return
+        total = sum(item.price for item in carts)
+        order = Order.objects.create(user=user, total=total)
+        for item in carts:
+            OrderItem.objects.create(
+                order=order,
+                menu_item=item.menu_item,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                price=item.price,
+            )
+        carts.delete()
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy and bulk checkout paths at different cart sizes (all changes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["sizes"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes: list[int], repeat: int):
+        user = User.objects.create_user("bench-checkout-user")
+        category = Category.objects.create(title="bench-checkout", slug="bench-checkout")
+        menu_items = MenuItem.objects.bulk_create(
+            MenuItem(title=f"bench-checkout-{i}", price=i % 20 + 1, category=category)
+            for i in range(max(sizes))
+        )
+
+        def fill_cart(size: int):
+            Cart.objects.bulk_create(
+                Cart(
+                    user=user,
+                    menu_item=item,
+                    quantity=2,
+                    unit_price=item.price,
+                    price=Cart.compute_price(item.price, 2),
+                )
+                for item in menu_items[:size]
+            )
+
+        self.stdout.write(f"{'lines':>6} {'path':>8} {'queries':>8} {'median ms':>10}")
+        for size in sizes:
+            for name, checkout in (("legacy", legacy_place_order), ("bulk", place_order)):
+                timings = []
+                for _ in range(repeat):
+                    fill_cart(size)
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        checkout(user)
+                        timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f"{size:>6} {name:>8} {len(queries):>8} {median(timings):>10.2f}"
+                )
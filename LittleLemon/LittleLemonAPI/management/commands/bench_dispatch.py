@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+from LittleLemonAPI.dispatcher import dispatch_pending_orders, get_open_order_counts
+from LittleLemonAPI.models import Order
+from LittleLemonAPI.utils import GroupEnum
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure dispatcher throughput (assigned orders per second) for several batch sizes "
+        "(all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=20_000)
+        parser.add_argument("--crew", type=int, default=50)
+        parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'batch size':>10} {'cycles':>7} {'orders/s':>10} {'max-min open orders':>20}")
+        for batch_size in options["batch_sizes"]:
+            try:
+                with transaction.atomic():
+                    self.run(options["orders"], options["crew"], batch_size)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, orders: int, crew: int, batch_size: int):
+        group = Group.objects.get_or_create(name=GroupEnum.DELIVERY_CREW.value)[0]
+        members = User.objects.bulk_create(User(username=f"bench-dispatch-crew-{i}") for i in range(crew))
+        group.user_set.add(*members)
+        customer = User.objects.create_user("bench-dispatch-customer")
+        Order.objects.bulk_create((Order(user=customer, total=10) for _ in range(orders)), batch_size=5000)
+
+        cycles = 0
+        start = time.perf_counter()
+        while dispatch_pending_orders(batch_size):
+            cycles += 1
+        elapsed = time.perf_counter() - start
+        member_ids = {member.id for member in members}
+        counts = [count for user_id, count in get_open_order_counts().items() if user_id in member_ids]
+        self.stdout.write(
+            f"{batch_size:>10} {cycles:>7} {orders / elapsed:>10.0f} {max(counts) - min(counts):>20}"
+        )
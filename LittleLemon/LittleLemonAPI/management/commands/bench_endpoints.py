@@ -0,0 +1,342 @@
+import gc
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from statistics import quantiles
+from unittest import mock
+from urllib.parse import urlencode
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+from LittleLemonAPI.models import Category, MenuItem, Order
+
+BASELINE = Path(__file__).resolve().parents[2] / "bench_baseline.json"
+PREFIX = "bench-endpoints"
+ROLES = ("customer", "crew", "manager")
+# Written to new baseline files, then read from them: a latency regresses past baseline * ratio + slack, a
+# query count past baseline + queries. The tail is noisier than the median, and so is given more room.
+DEFAULT_TOLERANCE = {"latency_ratio": {"p50_ms": 1.5, "p95_ms": 2.0}, "latency_slack_ms": 2.0, "queries": 0}
+
+
+class Rollback(Exception):
+    pass
+
+
+@dataclass
+class Endpoint:
+    method: str
+    name: str  # URL name in the LittleLemonAPI namespace
+    kwargs: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    data: dict | list | None = None
+    # Tells apart the endpoints that only differ by their body
+    note: str = ""
+
+    @property
+    def label(self) -> str:
+        # Ids are left out so that labels stay the same across datasets
+        label = f"{self.method.upper()} {self.name}" + (f"?{urlencode(self.params)}" if self.params else "")
+        return f"{label} ({self.note})" if self.note else label
+
+
+@dataclass
+class Fixtures:
+    users: dict[str, User]
+    other_customer: User
+    other_crew: User
+    other_manager: User
+    order: Order
+    order_ids: list[int]
+    menu_item: MenuItem
+    category: Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every endpoint of LittleLemonAPI/urls.py as a customer, a delivery crew member and a manager "
+        "through the DRF test client against a seeded data set, record latency percentiles and query counts, "
+        "and fail on regressions against the JSON baseline (all changes are rolled back, after running and "
+        "measuring their on_commit callbacks). Latencies are only "
+        "compared when the database holds the same data set as when the baseline was recorded, so run it on "
+        "an empty database; query counts and status codes are always compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--baseline", type=Path, default=BASELINE)
+        parser.add_argument(
+            "--update-baseline", action="store_true", help="Write the results to the baseline instead"
+        )
+        parser.add_argument("--queries-only", action="store_true", help="Don't compare latencies")
+        parser.add_argument("--match", default="", help="Only the endpoints whose label contains this")
+        parser.add_argument("--repeat", type=int, default=50, help="Measured requests per endpoint and role")
+        parser.add_argument("--warmup", type=int, default=2, help="Requests fed to the caches first")
+        parser.add_argument("--customers", type=int, default=100)
+        parser.add_argument("--menu-items", type=int, default=100)
+        parser.add_argument("--orders", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+        # The throttles would turn the repeated writes into 429s
+        rates = {scope: None for scope in ScopedRateThrottle.THROTTLE_RATES}
+        try:
+            # DEBUG would record every query and enable the debug toolbar
+            with (
+                transaction.atomic(),
+                override_settings(ALLOWED_HOSTS=["testserver"], DEBUG=False),
+                mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, rates),
+            ):
+                dataset, results = self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options["update_baseline"]:
+            self.write_baseline(options["baseline"], dataset, results, options["match"])
+            return
+        try:
+            baseline = json.loads(options["baseline"].read_text())
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {options['baseline']}, record one with --update-baseline")
+        compare_latency = not options["queries_only"]
+        if compare_latency and baseline["dataset"] != dataset:
+            compare_latency = False
+            self.stdout.write(
+                f"Latencies not compared: the baseline was recorded on {baseline['dataset']}, this run on {dataset}"
+            )
+        regressions = self.compare(results, baseline, compare_latency, options["match"])
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regression(s) against {options['baseline']}:\n"
+                + "\n".join(f"  {regression}" for regression in regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def create_fixtures(self, customers: int, menu_items: int, orders: int) -> Fixtures:
+        call_command(
+            "seed_scale",
+            prefix=PREFIX,
+            customers=customers,
+            delivery_crew=5,
+            managers=2,
+            categories=10,
+            menu_items=menu_items,
+            orders=orders,
+            days=60,
+            end_date=date(2025, 6, 30),
+            stdout=StringIO(),
+        )
+        seeded = User.objects.filter(username__startswith=f"{PREFIX}-").order_by("id")
+        # The customer places an order, which needs a cart
+        customer = seeded.filter(username__contains="-customer-", cart__isnull=False).first()
+        crew = list(seeded.filter(username__contains="-crew-")[:2])
+        managers = list(seeded.filter(username__contains="-manager-")[:2])
+        order = Order.objects.filter(user=customer).order_by("-date", "-id").first()
+        # Visible to all three roles
+        Order.objects.filter(id=order.id).update(delivery_crew=crew[0], status=False)
+        order.refresh_from_db()
+        return Fixtures(
+            users={"customer": customer, "crew": crew[0], "manager": managers[0]},
+            other_customer=seeded.filter(username__contains="-customer-").exclude(id=customer.id).first(),
+            other_crew=crew[1],
+            other_manager=managers[1],
+            order=order,
+            order_ids=list(Order.objects.order_by("id").values_list("id", flat=True)[:50]),
+            menu_item=MenuItem.objects.filter(title__contains=PREFIX).order_by("id").first(),
+            category=Category.objects.get(slug=f"{PREFIX}-category-0"),
+        )
+
+    def get_endpoints(self, f: Fixtures) -> list[Endpoint]:
+        menu_item = {"menuItem": f.menu_item.id}
+        order = {"orderId": f.order.id}
+        menu_ids = list(MenuItem.objects.order_by("id").values_list("id", flat=True)[:5])
+        # Lists are read a page at a time, like clients do; without a limit they are not paginated
+        page = {"limit": 50}
+        return [
+            Endpoint("get", "menu-items-list", params=page),
+            Endpoint("get", "menu-items-list", params={**page, "ordering": "-price"}),
+            Endpoint("get", "menu-items-list", params={**page, "search": "pasta"}),
+            Endpoint("get", "menu-items-list", params={**page, "paginate": "cursor"}),
+            Endpoint("get", "menu-items-detail", menu_item),
+            Endpoint("get", "menu-items-export"),
+            Endpoint(
+                "post", "menu-items-list", data={"title": "Bench dish", "price": "9.50", "category": f.category.slug}
+            ),
+            Endpoint("patch", "menu-items-detail", menu_item, data={"price": "9.75"}),
+            Endpoint("delete", "menu-items-detail", menu_item),
+            Endpoint(
+                "post",
+                "menu-items-import-items",
+                data=[{"title": f"Bench import {i}", "price": "5.00", "category": f.category.slug} for i in range(20)],
+                note="20 rows",
+            ),
+            Endpoint("get", "category-list"),
+            Endpoint("get", "category-detail", {"pk": f.category.id}),
+            Endpoint("get", "cart"),
+            Endpoint("post", "cart", data={"menu_item": f.menu_item.id, "quantity": 2}),
+            Endpoint(
+                "post", "cart", data=[{"menu_item": item_id, "quantity": 1} for item_id in menu_ids], note="5 lines"
+            ),
+            Endpoint("delete", "cart"),
+            Endpoint("get", "orders-list", params=page),
+            Endpoint("get", "orders-list", params={**page, "status": "pending"}),
+            Endpoint("get", "orders-list", params={**page, "expand": "items"}),
+            Endpoint("get", "orders-list", params={**page, "paginate": "cursor"}),
+            Endpoint("get", "orders-detail", order),
+            Endpoint("get", "orders-export"),
+            Endpoint("post", "orders-list"),
+            Endpoint("put", "orders-detail", order, data={"status": True, "delivery_crew": f.other_crew.id}),
+            Endpoint("patch", "orders-detail", order, data={"status": True}),
+            Endpoint("delete", "orders-detail", order),
+            Endpoint("post", "orders-bulk", data={"ids": f.order_ids, "status": True}),
+            Endpoint("get", "reports"),
+            Endpoint("get", "manager-group-list"),
+            Endpoint("post", "manager-group-list", data={"username": f.other_customer.username}),
+            Endpoint("delete", "manager-group-detail", {"userId": f.other_manager.id}),
+            Endpoint(
+                "post",
+                "manager-group-bulk",
+                data={"add": [f.other_customer.id], "remove": [f.other_manager.id]},
+            ),
+            Endpoint("get", "delivery-crew-group-list"),
+            Endpoint("post", "delivery-crew-group-list", data={"username": f.other_customer.username}),
+            Endpoint("delete", "delivery-crew-group-detail", {"userId": f.other_crew.id}),
+            Endpoint(
+                "post",
+                "delivery-crew-group-bulk",
+                data={"add": [f.other_customer.id], "remove": [f.other_crew.id]},
+            ),
+        ]
+
+    def request(self, client: APIClient, endpoint: Endpoint, path: str) -> tuple[int, float, int]:
+        """Status, milliseconds and queries of one request, whose writes are rolled back"""
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            # Nothing commits, so the post-commit work of the request (cache invalidation, ...) is run here
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                if endpoint.method == "get":
+                    response = client.get(path, endpoint.params)
+                else:
+                    response = getattr(client, endpoint.method)(path, endpoint.data, format="json")
+                # Exports run their queries while streaming
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+            transaction.set_rollback(True)
+        return response.status_code, elapsed, len(queries)
+
+    def measure(self, client: APIClient, endpoint: Endpoint, warmup: int, repeat: int) -> dict:
+        path = reverse(f"LittleLemonAPI:{endpoint.name}", kwargs=endpoint.kwargs)
+        for _ in range(warmup):
+            self.request(client, endpoint, path)
+        statuses, timings, query_counts = set(), [], []
+        # Collection pauses would land on whichever request happens to trigger them
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                status, elapsed, query_count = self.request(client, endpoint, path)
+                statuses.add(status)
+                timings.append(elapsed)
+                query_counts.append(query_count)
+        finally:
+            gc.enable()
+        if len(statuses) > 1 or max(statuses) >= 500:
+            raise CommandError(f"{endpoint.label} answered {sorted(statuses)}")
+        p50, p95, p99 = (
+            [quantiles(timings, n=100, method="inclusive")[i - 1] for i in (50, 95, 99)]
+            if repeat > 1
+            else timings * 3
+        )
+        return {
+            "status": statuses.pop(),
+            "queries": max(query_counts),
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(p95, 2),
+            "p99_ms": round(p99, 2),
+        }
+
+    def run(
+        self, customers: int, menu_items: int, orders: int, warmup: int, repeat: int, match: str, **options
+    ) -> tuple[dict, dict]:
+        fixtures = self.create_fixtures(customers, menu_items, orders)
+        dataset = {
+            "users": User.objects.count(),
+            "menu_items": MenuItem.objects.count(),
+            "orders": Order.objects.count(),
+        }
+        clients = {}
+        for role, user in fixtures.users.items():
+            clients[role] = APIClient()
+            clients[role].credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<48} {'role':<8} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for endpoint in self.get_endpoints(fixtures):
+            if match not in endpoint.label:
+                continue
+            for role in ROLES:
+                result = self.measure(clients[role], endpoint, warmup, repeat)
+                results[f"{endpoint.label} as {role}"] = result
+                self.stdout.write(
+                    f"{endpoint.label:<48} {role:<8} {result['status']:>6} {result['queries']:>7} "
+                    f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+                )
+        return dataset, results
+
+    def write_baseline(self, path: Path, dataset: dict, results: dict, match: str):
+        tolerance = DEFAULT_TOLERANCE
+        endpoints = {}
+        if path.exists():
+            previous = json.loads(path.read_text())
+            tolerance = previous["tolerance"]
+            # Only the matching endpoints were measured; the others keep their baseline
+            if match:
+                endpoints = {key: value for key, value in previous["endpoints"].items() if match not in key}
+        baseline = {"dataset": dataset, "tolerance": tolerance, "endpoints": {**endpoints, **results}}
+        path.write_text(json.dumps(baseline, indent=2) + "\n")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {path}"))
+
+    def compare(self, results: dict, baseline: dict, compare_latency: bool, match: str) -> list[str]:
+        tolerance = baseline["tolerance"]
+        regressions = []
+        for key, current in results.items():
+            expected = baseline["endpoints"].get(key)
+            if expected is None:
+                self.stdout.write(f"{key}: not in the baseline")
+                continue
+            if current["status"] != expected["status"]:
+                regressions.append(f"{key}: status {expected['status']} -> {current['status']}")
+            allowed = expected["queries"] + tolerance["queries"]
+            if current["queries"] > allowed:
+                regressions.append(
+                    f"{key}: queries {expected['queries']} -> {current['queries']} (allowed {allowed})"
+                )
+            elif current["queries"] < expected["queries"]:
+                self.stdout.write(
+                    f"{key}: queries {expected['queries']} -> {current['queries']}, update the baseline"
+                )
+            if not compare_latency:
+                continue
+            for metric, ratio in tolerance["latency_ratio"].items():
+                allowed = expected[metric] * ratio + tolerance["latency_slack_ms"]
+                if current[metric] > allowed:
+                    regressions.append(
+                        f"{key}: {metric} {expected[metric]:.2f} -> {current[metric]:.2f} (allowed {allowed:.2f})"
+                    )
+        for key in baseline["endpoints"]:
+            if match in key and key not in results:
+                self.stdout.write(f"{key}: in the baseline but no longer measured")
+        return regressions
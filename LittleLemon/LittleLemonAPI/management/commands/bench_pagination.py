@@ -0,0 +1,71 @@
+import time
+from datetime import date, timedelta
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from LittleLemonAPI.models import Order
+from LittleLemonAPI.utils import CustomPageNumberPagination, KeysetPagination
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of a late orders page with page-number and cursor pagination "
+        "as the table grows (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+        parser.add_argument("--limit", type=int, default=50)
+        parser.add_argument("--depth", type=float, default=0.9, help="Position of the page in the table (0-1)")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def time_page(self, paginator, params: dict, repeat: int) -> float:
+        factory = APIRequestFactory()
+        timings = []
+        for _ in range(repeat):
+            request = Request(factory.get("/api/orders/", params))
+            start = time.perf_counter()
+            page = paginator.paginate_queryset(Order.objects.all(), request)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert page, "empty page"
+        return median(timings)
+
+    def run(self, sizes: list[int], limit: int, depth: float, repeat: int, **options):
+        user = User.objects.create_user("bench-pagination-user")
+        first_day = date(2020, 1, 1)
+        created = 0
+        self.stdout.write(f"{'orders':>9} {'page':>7} {'page-number ms':>15} {'cursor ms':>10}")
+        for size in sorted(sizes):
+            Order.objects.bulk_create(
+                (
+                    Order(user=user, total=10, date=first_day + timedelta(days=i // 500))
+                    for i in range(created, size)
+                ),
+                batch_size=5000,
+            )
+            created = size
+            offset = int(size * depth)
+            page_number = offset // limit + 1
+            # Cursor pointing at the same position, as a client would get it from the previous page's next link
+            before = Order.objects.all()[(page_number - 1) * limit - 1]
+            cursor = KeysetPagination.encode_cursor([before.date, before.id])
+            page_ms = self.time_page(
+                CustomPageNumberPagination(), {"page": page_number, "limit": limit}, repeat
+            )
+            cursor_ms = self.time_page(KeysetPagination(), {"cursor": cursor, "limit": limit}, repeat)
+            self.stdout.write(f"{size:>9} {page_number:>7} {page_ms:>15.2f} {cursor_ms:>10.2f}")
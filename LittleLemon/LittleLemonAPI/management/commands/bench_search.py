@@ -0,0 +1,82 @@
+import itertools
+import time
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.search import MenuItemSearchFilter, rebuild_search_index
+from LittleLemonAPI.views import MenuItemView
+from LittleLemonAPI.views.menu_items import filter_menu_items
+
+ADJECTIVES = ["spicy", "grilled", "smoked", "crispy", "roasted", "fresh", "creamy", "sweet", "sour", "baked"]
+INGREDIENTS = ["chicken", "salmon", "tofu", "beef", "lamb", "shrimp", "mushroom", "lemon", "garlic", "basil"]
+DISHES = ["pasta", "salad", "soup", "burger", "pizza", "curry", "risotto", "wrap", "stew", "tart"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ?search= through LIKE '%term%' (SearchFilter) and the FTS5 index "
+        "on a generated catalog (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument(
+            "--terms", nargs="+", default=["pa", "chicken", "spicy chick", "smoked salmon risotto", "mains"]
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_catalog(self, items: int):
+        categories = Category.objects.bulk_create(
+            Category(title=title, slug=f"bench-search-{title}") for title in ("Mains", "Starters", "Desserts", "Drinks")
+        )
+        names = itertools.cycle(itertools.product(ADJECTIVES, INGREDIENTS, DISHES))
+        MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    title=f"{' '.join(next(names))} {i}",
+                    price=i % 50 + 1,
+                    category=categories[i % len(categories)],
+                )
+                for i in range(items)
+            ),
+            batch_size=5000,
+        )
+        # bulk_create does not send post_save
+        rebuild_search_index()
+
+    def time_search(self, backend, term: str, repeat: int) -> tuple[float, int]:
+        request = Request(APIRequestFactory().get("/api/menu-items/", {"search": term}))
+        view = MenuItemView(request=request, format_kwarg=None)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = backend.filter_queryset(request, filter_menu_items({}), view)
+            # What a paginated response needs: the count and the first page
+            count = queryset.count()
+            list(queryset[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        return median(timings), count
+
+    def run(self, items: int, repeat: int, terms: list[str], **options):
+        self.create_catalog(items)
+        self.stdout.write(f"{'term':<24} {'LIKE ms':>9} {'matches':>8} {'FTS5 ms':>9} {'matches':>8}")
+        for term in terms:
+            like_ms, like_count = self.time_search(SearchFilter(), term, repeat)
+            fts_ms, fts_count = self.time_search(MenuItemSearchFilter(), term, repeat)
+            self.stdout.write(f"{term:<24} {like_ms:>9.2f} {like_count:>8} {fts_ms:>9.2f} {fts_count:>8}")
@@ -0,0 +1,87 @@
+import time
+from statistics import median
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from LittleLemonAPI.fast_serializers import get_values_serializer
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order
+from LittleLemonAPI.serializers import CartViewSerializer, MenuItemSerializer, OrderSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the ModelSerializers with the values-based fast path on list pages: query + serialization "
+        "and JSON rendering, with all fields and a sparse fieldset (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="Rows per page")
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def time_ms(self, function, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return median(timings)
+
+    def run(self, rows: int, repeat: int, **options):
+        user = User.objects.create_user("bench-serializers-user")
+        category = Category.objects.create(title="bench-serializers", slug="bench-serializers")
+        items = MenuItem.objects.bulk_create(
+            MenuItem(title=f"bench-serializers-{i}", price=f"{i % 40 + 3}.25", category=category)
+            for i in range(rows)
+        )
+        Order.objects.bulk_create(Order(user=user, delivery_crew=user, total="42.50") for _ in range(rows))
+        Cart.objects.bulk_create(
+            Cart(user=user, menu_item=item, quantity=2, unit_price=item.price, price=item.price)
+            for item in items
+        )
+        menu_items = MenuItem.objects.select_related("category").filter(category=category)
+        shapes = [
+            ("menu items", MenuItemSerializer, menu_items, "title,price"),
+            ("orders", OrderSerializer, Order.objects.filter(user=user), "id,total,status"),
+            ("cart", CartViewSerializer, Cart.objects.filter(user=user), "menu_item,quantity"),
+        ]
+        render = JSONRenderer().render
+        self.stdout.write(
+            f"{'endpoint':<12} {'model ms':>9} {'values ms':>10} {'speedup':>8} "
+            f"{'?fields ms':>11} {'same JSON':>10}"
+        )
+        for label, serializer_class, queryset, sparse in shapes:
+            values_serializer = get_values_serializer(serializer_class)
+            fields = values_serializer.get_fields({})
+            sparse_fields = values_serializer.get_fields({"fields": sparse})
+
+            def model():
+                return render(serializer_class(list(queryset.all()), many=True).data)
+
+            def values():
+                rows = list(values_serializer.values(queryset, fields))
+                return render(values_serializer.serialize(rows, fields))
+
+            def sparse_values():
+                rows = list(values_serializer.values(queryset, sparse_fields))
+                return render(values_serializer.serialize(rows, sparse_fields))
+
+            model_ms = self.time_ms(model, repeat)
+            values_ms = self.time_ms(values, repeat)
+            sparse_ms = self.time_ms(sparse_values, repeat)
+            self.stdout.write(
+                f"{label:<12} {model_ms:>9.2f} {values_ms:>10.2f} {model_ms / values_ms:>7.1f}x "
+                f"{sparse_ms:>11.2f} {str(model() == values()):>10}"
+            )
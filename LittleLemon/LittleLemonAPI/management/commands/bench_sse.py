@@ -0,0 +1,161 @@
+import asyncio
+import gc
+import time
+import tracemalloc
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from LittleLemonAPI.events import order_event_broker
+from LittleLemonAPI.models import Order, OrderEvent
+
+
+class Rollback(Exception):
+    pass
+
+
+class SSEConnection:
+    """An SSE request driven straight through the ASGI application, without a server or sockets"""
+
+    def __init__(self, application, path: str, token: str):
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Token {token}".encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        self.application = application
+        self.status = None
+        self.events = 0
+        self.ready = asyncio.Event()
+        self.received = asyncio.Event()
+        self._request_sent = False
+        self._disconnect = asyncio.Event()
+        self.task = asyncio.create_task(application(self.scope, self.receive, self.send))
+
+    async def receive(self):
+        if not self._request_sent:
+            self._request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            # The first chunk is the retry: preamble, sent once the connection is subscribed
+            self.ready.set()
+            events = message["body"].count(b"\nevent: order\n")
+            if events:
+                self.events += events
+                self.received.set()
+        elif self.status != 200:
+            self.ready.set()
+
+    async def close(self):
+        self._disconnect.set()
+        await self.task
+
+
+class Command(BaseCommand):
+    help = (
+        "Open concurrent idle SSE subscribers on the order event stream through the ASGI handler, and measure "
+        "the memory per connection and the fan-out of a change to all of them (all changes are rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=1000)
+        parser.add_argument("--customers", type=int, default=100, help="Subscribers are spread over them")
+
+    def handle(self, *args, **options):
+        # The in-process broker is measured; the log poller's thread could not see the uncommitted data
+        poll_interval, order_event_broker.poll_interval = order_event_broker.poll_interval, 0
+        # Like Django's test client: the handler must not close the connection holding the transaction
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            # DEBUG would record every query and enable the debug toolbar
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"], DEBUG=False):
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            order_event_broker.poll_interval = poll_interval
+
+    def create_data(self, customers: int) -> tuple[list[str], list[Order]]:
+        users = User.objects.bulk_create(User(username=f"bench-sse-user-{i}") for i in range(customers))
+        tokens = Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in users)
+        orders = Order.objects.bulk_create(Order(user=user, total=10) for user in users)
+        return [token.key for token in tokens], orders
+
+    async def measure(self, tokens: list[str], orders: list[Order], subscribers: int) -> dict:
+        application = get_asgi_application()
+        path = reverse("LittleLemonAPI:async-order-events")
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline, _ = tracemalloc.get_traced_memory()
+            started = time.perf_counter()
+            connections = [
+                SSEConnection(application, path, tokens[i % len(tokens)]) for i in range(subscribers)
+            ]
+            await asyncio.gather(*(connection.ready.wait() for connection in connections))
+            connect_seconds = time.perf_counter() - started
+            if any(connection.status != 200 for connection in connections):
+                raise CommandError(f"Status {[c.status for c in connections if c.status != 200][0]}")
+            # Let the handlers settle into waiting on their queues
+            await asyncio.sleep(0.1)
+            gc.collect()
+            connected, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # One status change per customer, each streamed to the connections of that customer only
+        events = await OrderEvent.objects.abulk_create(
+            OrderEvent(order_id=order.id, customer_id=order.user_id, status=True) for order in orders
+        )
+        started = time.perf_counter()
+        order_event_broker.publish(events)
+        await asyncio.gather(*(connection.received.wait() for connection in connections))
+        fan_out_seconds = time.perf_counter() - started
+        delivered = sum(connection.events for connection in connections)
+
+        await asyncio.gather(*(connection.close() for connection in connections))
+        return {
+            "connect_seconds": connect_seconds,
+            "bytes_per_connection": (connected - baseline) / subscribers,
+            "fan_out_ms": fan_out_seconds * 1000,
+            "delivered": delivered,
+            "left_subscribed": order_event_broker.subscriber_count,
+        }
+
+    def run(self, subscribers: int, customers: int, **options):
+        tokens, orders = self.create_data(customers)
+        result = async_to_sync(self.measure)(tokens, orders, subscribers)
+        self.stdout.write(
+            f"{subscribers} subscribers connected in {result['connect_seconds']:.2f}s (while tracing memory), "
+            f"{result['bytes_per_connection'] / 1024:.1f} KiB per idle connection"
+        )
+        self.stdout.write(
+            f"{len(orders)} changes fanned out in {result['fan_out_ms']:.1f} ms, "
+            f"{result['delivered']} of {subscribers} events delivered, "
+            f"{result['left_subscribed']} subscriptions left after disconnecting"
+        )
+        if result["delivered"] != subscribers or result["left_subscribed"]:
+            raise CommandError("Events were lost or subscriptions leaked")
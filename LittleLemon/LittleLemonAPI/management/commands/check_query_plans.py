@@ -0,0 +1,146 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User, Group
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from LittleLemonAPI.caching import bump_menu_version
+from LittleLemonAPI.models import Category, MenuItem, Order
+from LittleLemonAPI.roles import get_group_names
+from LittleLemonAPI.utils import GroupEnum, KeysetPagination
+from LittleLemonAPI.views import OrderView, MenuItemView
+
+
+@dataclass
+class Shape:
+    view: type
+    role: GroupEnum | None  # None is a customer
+    params: dict = field(default_factory=dict)
+    action: str = "list"
+    # Tables that may be scanned in full because the shape cannot be answered from an index
+    allow_scan: tuple[str, ...] = ()
+    # Whether the ordering may need a sort, e.g. of full-text matches by another column
+    allow_sort: bool = False
+
+
+CURSOR = KeysetPagination.encode_cursor(["2025-01-01", 1])
+
+SHAPES = [
+    Shape(OrderView, GroupEnum.MANAGER),
+    Shape(OrderView, GroupEnum.MANAGER, {"status": "pending"}),
+    Shape(OrderView, GroupEnum.MANAGER, {"status": "delivered"}),
+    Shape(OrderView, GroupEnum.MANAGER, {"date": "2025-01-01"}),
+    Shape(OrderView, GroupEnum.MANAGER, {"status": "delivered", "date": "2025-01-01"}),
+    Shape(OrderView, GroupEnum.MANAGER, {"paginate": "cursor", "cursor": CURSOR}),
+    Shape(OrderView, GroupEnum.MANAGER, action="retrieve"),
+    Shape(OrderView, GroupEnum.MANAGER, {"expand": "items"}),
+    Shape(OrderView, GroupEnum.DELIVERY_CREW),
+    Shape(OrderView, GroupEnum.DELIVERY_CREW, {"paginate": "cursor", "cursor": CURSOR}),
+    Shape(OrderView, None),
+    Shape(OrderView, None, {"paginate": "cursor", "cursor": CURSOR}),
+    # The unfiltered menu is read in full anyway
+    Shape(MenuItemView, None, allow_scan=("LittleLemonAPI_menuitem",)),
+    Shape(MenuItemView, None, {"featured": "true"}),
+    Shape(MenuItemView, None, {"category": "mains"}),
+    Shape(MenuItemView, None, {"ordering": "price"}),
+    Shape(MenuItemView, None, {"ordering": "-price"}),
+    Shape(MenuItemView, None, {"paginate": "cursor", "ordering": "price"}),
+    # Substring matches (LIKE '%term%') cannot use a b-tree index
+    Shape(MenuItemView, None, {"title": "pasta"}, allow_scan=("LittleLemonAPI_menuitem",)),
+    Shape(MenuItemView, None, {"search": "pasta"}),
+    Shape(MenuItemView, None, {"search": "pas sal", "ordering": "price"}, allow_sort=True),
+    Shape(MenuItemView, None, action="retrieve"),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN on every OrderView/MenuItemView query shape "
+        "and fail if one of them scans a table without an index or sorts in a temp b-tree"
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans only understands SQLite query plans")
+        try:
+            with transaction.atomic():
+                failures = self.check_shapes()
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(
+                f"{len(failures)} query shape(s) fall back to a full scan:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("All query shapes use an index"))
+
+    def get_users(self) -> dict[GroupEnum | None, User]:
+        users = {}
+        for role in (GroupEnum.MANAGER, GroupEnum.DELIVERY_CREW, None):
+            user = User.objects.create_user(f"query-plan-{role or 'customer'}")
+            if role:
+                user.groups.add(Group.objects.get_or_create(name=role.value)[0])
+            get_group_names(user)
+            users[role] = user
+        return users
+
+    def check_shapes(self) -> list[str]:
+        # An empty ALLOWED_HOSTS only admits localhost (in DEBUG)
+        factory = APIRequestFactory(SERVER_NAME=next(iter(settings.ALLOWED_HOSTS), "localhost"))
+        users = self.get_users()
+        # Empty results would skip the page query after COUNT(*)
+        category = Category.objects.create(title="query-plan", slug="query-plan")
+        menu_item = MenuItem.objects.create(title="query-plan pasta salad", price=1, category=category)
+        for status in (False, True):
+            for user in users.values():
+                order = Order.objects.create(
+                    user=user, delivery_crew=user, status=status, total=1, date=date(2025, 1, 1)
+                )
+        lookups = {OrderView: order.id, MenuItemView: menu_item.id}
+        failures = []
+        for shape in SHAPES:
+            request = factory.get("/", {"limit": 10, **shape.params})
+            force_authenticate(request, users[shape.role])
+            kwargs = {}
+            if shape.action == "retrieve":
+                kwargs[shape.view.lookup_url_kwarg] = lookups[shape.view]
+            view = shape.view.as_view({"get": shape.action})
+            # Start from a cold menu cache so the queries actually run
+            bump_menu_version()
+            with CaptureQueriesContext(connection) as queries:
+                view(request, **kwargs)
+
+            label = f"{shape.view.__name__}.{shape.action} as {shape.role or 'Customer'} {shape.params}"
+            self.stdout.write(label)
+            for query in queries.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                    plan = [row[3] for row in cursor.fetchall()]
+                for step in plan:
+                    problem = self.get_problem(step, shape)
+                    self.stdout.write(f"    {step}" + (f"  <-- {problem}" if problem else ""))
+                    if problem:
+                        failures.append(f"{label}: {step}")
+        return failures
+
+    @staticmethod
+    def get_problem(step: str, shape: Shape) -> str | None:
+        if step.startswith("USE TEMP B-TREE FOR ORDER BY") and not shape.allow_sort:
+            return "sort without index"
+        # A full-text MATCH shows up as a scan of the virtual table with an "M" constraint
+        if re.match(r"SCAN \S+ VIRTUAL TABLE INDEX \d+:M", step):
+            return None
+        if step.startswith("SCAN ") and " USING " not in step:
+            table = step.split()[1]
+            if table not in shape.allow_scan:
+                return "full scan"
+        return None
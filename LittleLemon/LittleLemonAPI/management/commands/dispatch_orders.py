@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.dispatcher import DISPATCH_BATCH_SIZE, DISPATCH_INTERVAL, dispatch_pending_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign unassigned pending orders to the delivery crew members with the fewest open orders, in a loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DISPATCH_BATCH_SIZE)
+        parser.add_argument(
+            "--interval", type=float, default=DISPATCH_INTERVAL, help="Seconds between idle cycles"
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the backlog once and exit")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            assignments = dispatch_pending_orders(batch_size)
+            assigned = sum(map(len, assignments.values()))
+            if assigned:
+                self.stdout.write(f"Assigned {assigned} orders to {len(assignments)} crew members")
+            if assigned < batch_size:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
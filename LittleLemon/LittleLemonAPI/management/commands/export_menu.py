@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.exports import iter_menu_csv, iter_menu_json
+from LittleLemonAPI.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = "Write every menu item in the format read by import_menu"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="Defaults to stdout")
+        parser.add_argument("--output", choices=["csv", "json"], help="Defaults to the file extension, else csv")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        output = options["output"] or ("json" if path and path.lower().endswith(".json") else "csv")
+        queryset = MenuItem.objects.order_by("id")
+        chunks = iter_menu_json(queryset) if output == "json" else iter_menu_csv(queryset)
+        if not path:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.writelines(chunks)
@@ -0,0 +1,29 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import exceptions
+from LittleLemonAPI.imports import import_menu_items, parse_menu_csv, parse_menu_json
+
+
+class Command(BaseCommand):
+    help = "Create or update menu items (and their categories) from a CSV or JSON file written by export_menu"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--input", choices=["csv", "json"], help="Defaults to the file extension")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["input"] or ("json" if path.lower().endswith(".json") else "csv")
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                rows = parse_menu_json(file.read()) if input_format == "json" else parse_menu_csv(file)
+                result = import_menu_items(rows)
+        except exceptions.ValidationError as exc:
+            raise CommandError(json.dumps(exc.detail))
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result.created} menu items created, {result.updated} updated, {len(result.errors)} rows skipped"
+            )
+        )
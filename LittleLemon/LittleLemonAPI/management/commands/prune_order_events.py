@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.events import ORDER_EVENTS_RETENTION, prune_order_events
+
+
+class Command(BaseCommand):
+    help = "Delete the order change events that reconnecting SSE clients can no longer need"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=float, default=ORDER_EVENTS_RETENTION, help="Age in seconds"
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_order_events(options["older_than"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} order events"))
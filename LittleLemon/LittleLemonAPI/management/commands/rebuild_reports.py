@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.reports import rebuild_reports, find_report_mismatches
+
+
+class Command(BaseCommand):
+    help = "Rebuild the sales reporting aggregates from the order tables, or check them with --check"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-days", type=int, default=31, help="Number of order dates processed per transaction"
+        )
+        parser.add_argument(
+            "--check", action="store_true", help="Only compare the aggregates with the raw tables"
+        )
+
+    def handle(self, *args, **options):
+        chunk_days = options["chunk_days"]
+        if options["check"]:
+            mismatches = 0
+            for mismatch in find_report_mismatches(chunk_days):
+                mismatches += 1
+                self.stdout.write(mismatch)
+            if mismatches:
+                raise CommandError(f"{mismatches} reporting aggregate(s) are inconsistent")
+            self.stdout.write(self.style.SUCCESS("Reporting aggregates are consistent"))
+            return
+
+        days = 0
+        for dates in rebuild_reports(chunk_days):
+            days += len(dates)
+            self.stdout.write(f"Rebuilt {dates[0]} .. {dates[-1]} ({days} days so far)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt reporting aggregates for {days} days"))
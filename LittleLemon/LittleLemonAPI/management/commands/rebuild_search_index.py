@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from LittleLemonAPI.caching import bump_menu_version
+from LittleLemonAPI.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Repopulate the menu item full-text search index from the menu tables"
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError("The full-text search index only exists on SQLite")
+        with transaction.atomic():
+            count = rebuild_search_index()
+        # Cached search responses may differ from the rebuilt index
+        bump_menu_version()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} menu items"))
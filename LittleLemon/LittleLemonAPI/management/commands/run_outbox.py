@@ -0,0 +1,44 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.outbox import OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OutboxWorker, process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the outbox workers: a pool of threads handling the side effects enqueued with the orders "
+        "(start the command on several processes or machines to scale further)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker threads")
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE, help="Messages claimed at once")
+        parser.add_argument(
+            "--interval", type=float, default=OUTBOX_POLL_INTERVAL, help="Seconds between polls of an empty outbox"
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the due messages once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            processed = 0
+            while claimed := process_batch(options["batch_size"]):
+                processed += claimed
+            self.stdout.write(f"Processed {processed} outbox messages")
+            return
+        workers = [
+            OutboxWorker(options["batch_size"], options["interval"], name=f"outbox-worker-{i}")
+            for i in range(options["workers"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} outbox workers")
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stopping.set())
+        stopping.wait()
+        # Batches in flight are finished; a worker killed instead leaves its claims to expire
+        for worker in workers:
+            worker.stop(timeout=0)
+        for worker in workers:
+            worker.join()
+        self.stdout.write(f"Processed {sum(worker.processed for worker in workers)} outbox messages")
@@ -0,0 +1,218 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from LittleLemonAPI.caching import bump_menu_version
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.reports import rebuild_reports
+from LittleLemonAPI.search import rebuild_search_index, search_enabled
+from LittleLemonAPI.utils import GroupEnum
+
+ADJECTIVES = ["Spicy", "Grilled", "Smoked", "Crispy", "Roasted", "Fresh", "Creamy", "Sweet", "Tangy", "Baked"]
+INGREDIENTS = ["Chicken", "Salmon", "Tofu", "Beef", "Lamb", "Shrimp", "Mushroom", "Lemon", "Garlic", "Basil"]
+DISHES = ["Pasta", "Salad", "Soup", "Burger", "Pizza", "Curry", "Risotto", "Wrap", "Stew", "Tart"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large, deterministic data set (users, groups, menu, carts, orders and order items) "
+        "with chunked bulk inserts, for scale testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="seed", help="Prefix of the generated usernames and titles")
+        parser.add_argument("--customers", type=int, default=10_000)
+        parser.add_argument("--delivery-crew", type=int, default=50)
+        parser.add_argument("--managers", type=int, default=5)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--menu-items", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=100_000)
+        parser.add_argument("--max-items-per-order", type=int, default=4)
+        parser.add_argument(
+            "--cart-ratio", type=float, default=0.2, help="Share of the customers with a non-empty cart"
+        )
+        parser.add_argument("--days", type=int, default=365, help="Number of days the orders are spread over")
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            default=None,
+            help="Date of the most recent orders (YYYY-MM-DD, default today)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        if options["menu_items"] < options["max_items_per_order"]:
+            raise CommandError("--menu-items must be at least --max-items-per-order")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed with {options['prefix']}- already exist, use another --prefix")
+        self.rng = random.Random(options["seed"])
+        self.chunk_size = options["chunk_size"]
+        self.prefix = options["prefix"]
+        self.started = time.perf_counter()
+
+        customers, crew = self.create_users(options["customers"], options["delivery_crew"], options["managers"])
+        menu_items = self.create_menu(options["categories"], options["menu_items"])
+        self.create_carts(customers, menu_items, options["cart_ratio"])
+        end_date = options["end_date"] or date.today()
+        self.create_orders(
+            customers,
+            crew,
+            menu_items,
+            options["orders"],
+            options["max_items_per_order"],
+            end_date - timedelta(days=options["days"] - 1),
+            end_date,
+        )
+
+        # Bulk inserts bypass the signals and the incremental report maintenance
+        for _ in rebuild_reports():
+            pass
+        self.report("rebuilt reports")
+        if search_enabled():
+            rebuild_search_index()
+            self.report("rebuilt search index")
+        bump_menu_version()
+        self.stdout.write(self.style.SUCCESS("Seeding completed!"))
+
+    def report(self, message: str):
+        self.stdout.write(f"[{time.perf_counter() - self.started:7.1f}s] {message}")
+
+    def chunks(self, total: int):
+        for start in range(0, total, self.chunk_size):
+            yield range(start, min(start + self.chunk_size, total))
+
+    def create_users(self, customers: int, crew: int, managers: int) -> tuple[list[int], list[int]]:
+        # Hashing once keeps user creation fast; every generated user logs in with "password"
+        password = make_password("password")
+        ids = {}
+        for role, count in (("customer", customers), ("crew", crew), ("manager", managers)):
+            ids[role] = []
+            for chunk in self.chunks(count):
+                with transaction.atomic():
+                    users = User.objects.bulk_create(
+                        User(username=f"{self.prefix}-{role}-{i:07d}", password=password) for i in chunk
+                    )
+                ids[role] += [user.id for user in users]
+                self.report(f"{len(ids[role])}/{count} {role} users")
+
+        memberships = []
+        for role, group in (("crew", GroupEnum.DELIVERY_CREW), ("manager", GroupEnum.MANAGER)):
+            group_id = Group.objects.get_or_create(name=group.value)[0].id
+            memberships += [User.groups.through(user_id=user_id, group_id=group_id) for user_id in ids[role]]
+        # New users have no cached roles, so skipping the m2m_changed signal is fine
+        User.groups.through.objects.bulk_create(memberships, batch_size=self.chunk_size)
+        self.report(f"{len(memberships)} group memberships")
+        return ids["customer"], ids["crew"]
+
+    def create_menu(self, categories: int, menu_items: int) -> list[tuple[int, Decimal]]:
+        with transaction.atomic():
+            category_ids = [
+                category.id
+                for category in Category.objects.bulk_create(
+                    Category(title=f"{self.prefix} category {i}", slug=f"{self.prefix}-category-{i}")
+                    for i in range(categories)
+                )
+            ]
+            items = MenuItem.objects.bulk_create(
+                (
+                    MenuItem(
+                        title=(
+                            f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(INGREDIENTS)} "
+                            f"{self.rng.choice(DISHES)} {self.prefix}-{i}"
+                        ),
+                        price=Decimal(self.rng.randrange(300, 4000)) / 100,
+                        featured=self.rng.random() < 0.05,
+                        category_id=self.rng.choice(category_ids),
+                    )
+                    for i in range(menu_items)
+                ),
+                batch_size=self.chunk_size,
+            )
+        self.report(f"{categories} categories, {menu_items} menu items")
+        return [(item.id, item.price) for item in items]
+
+    def pick_lines(self, menu_items: list, max_lines: int) -> list[tuple[int, Decimal, int]]:
+        # Distinct menu items, as required by unique_together on Cart and OrderItem
+        return [
+            (item_id, price, self.rng.randint(1, 3))
+            for item_id, price in self.rng.sample(menu_items, self.rng.randint(1, max_lines))
+        ]
+
+    def create_carts(self, customers: list[int], menu_items: list, cart_ratio: float):
+        shoppers = [user_id for user_id in customers if self.rng.random() < cart_ratio]
+        lines = 0
+        for chunk in self.chunks(len(shoppers)):
+            carts = [
+                Cart(
+                    user_id=shoppers[i],
+                    menu_item_id=item_id,
+                    quantity=quantity,
+                    unit_price=price,
+                    price=price * quantity,
+                )
+                for i in chunk
+                for item_id, price, quantity in self.pick_lines(menu_items, 5)
+            ]
+            with transaction.atomic():
+                Cart.objects.bulk_create(carts)
+            lines += len(carts)
+        self.report(f"{lines} cart lines for {len(shoppers)} customers")
+
+    def create_orders(
+        self,
+        customers: list[int],
+        crew: list[int],
+        menu_items: list,
+        orders: int,
+        max_lines: int,
+        first_date: date,
+        end_date: date,
+    ):
+        days = [first_date + timedelta(days=i) for i in range((end_date - first_date).days + 1)]
+        # Business grows over the period (twice the orders at the end), and weekends are busier
+        cum_weights = list(
+            accumulate(
+                (1 + i / len(days)) * (1.4 if day.weekday() >= 5 else 1) for i, day in enumerate(days)
+            )
+        )
+        created = lines = 0
+        for chunk in self.chunks(orders):
+            order_dates = sorted(self.rng.choices(days, cum_weights=cum_weights, k=len(chunk)))
+            order_lines = [self.pick_lines(menu_items, max_lines) for _ in chunk]
+            batch = []
+            for order_date, items in zip(order_dates, order_lines):
+                age = (end_date - order_date).days
+                # Everything but the last couple of days has been delivered
+                delivered = age > 1 or self.rng.random() < 0.3
+                batch.append(
+                    Order(
+                        user_id=self.rng.choice(customers),
+                        delivery_crew_id=self.rng.choice(crew) if crew and (delivered or age > 0) else None,
+                        status=delivered,
+                        total=sum(price * quantity for _, price, quantity in items),
+                        date=order_date,
+                    )
+                )
+            with transaction.atomic():
+                batch = Order.objects.bulk_create(batch)
+                items = [
+                    OrderItem(
+                        order_id=order.id,
+                        menu_item_id=item_id,
+                        quantity=quantity,
+                        unit_price=price,
+                        price=price * quantity,
+                    )
+                    for order, order_items in zip(batch, order_lines)
+                    for item_id, price, quantity in order_items
+                ]
+                OrderItem.objects.bulk_create(items)
+            created += len(batch)
+            lines += len(items)
+            self.report(f"{created}/{orders} orders, {lines} order items")
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE "LittleLemonAPI_menuitem_search" USING fts5('
+        "title, category, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    # Title matches weigh more than category matches
+    schema_editor.execute(
+        'INSERT INTO "LittleLemonAPI_menuitem_search" ("LittleLemonAPI_menuitem_search", rank) '
+        "VALUES ('rank', 'bm25(10.0, 1.0)')"
+    )
+    schema_editor.execute(
+        'INSERT INTO "LittleLemonAPI_menuitem_search" (rowid, title, category) '
+        'SELECT item.id, item.title, category.title FROM "LittleLemonAPI_menuitem" item '
+        'INNER JOIN "LittleLemonAPI_category" category ON category.id = item.category_id'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute('DROP TABLE "LittleLemonAPI_menuitem_search"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0003_dailysales_menuitemsales'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,92 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ORDER_COLUMNS = '"id", "user_id", "delivery_crew_id", "status", "total", "date"'
+ORDER_ITEM_COLUMNS = '"id", "order_id", "menu_item_id", "quantity", "unit_price", "price"'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0004_menuitem_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.BooleanField(default=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField()),
+                ('delivery_crew', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_deliveries', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [
+                    models.Index(fields=['-date', '-id'], name='archived_order_date_idx'),
+                    models.Index(fields=['user', '-date', '-id'], name='archived_order_user_date_idx'),
+                    models.Index(fields=['delivery_crew', '-date', '-id'], name='archived_order_crew_date_idx'),
+                    models.Index(fields=['status', '-date', '-id'], name='archived_order_status_date_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveSmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='LittleLemonAPI.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.archivedorder')),
+            ],
+            options={
+                'unique_together': {('order', 'menu_item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CombinedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.BooleanField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField()),
+                ('delivery_crew', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CombinedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveSmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('menu_item', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='LittleLemonAPI.menuitem')),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='orderitem_set', to='LittleLemonAPI.combinedorder')),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            f'CREATE VIEW "LittleLemonAPI_combinedorder" AS '
+            f'SELECT {ORDER_COLUMNS} FROM "LittleLemonAPI_order" '
+            f'UNION ALL SELECT {ORDER_COLUMNS} FROM "LittleLemonAPI_archivedorder"',
+            'DROP VIEW "LittleLemonAPI_combinedorder"',
+        ),
+        migrations.RunSQL(
+            f'CREATE VIEW "LittleLemonAPI_combinedorderitem" AS '
+            f'SELECT {ORDER_ITEM_COLUMNS} FROM "LittleLemonAPI_orderitem" '
+            f'UNION ALL SELECT {ORDER_ITEM_COLUMNS} FROM "LittleLemonAPI_archivedorderitem"',
+            'DROP VIEW "LittleLemonAPI_combinedorderitem"',
+        ),
+    ]
@@ -82,11 +82,12 @@ class Cart(models.Model):
 
 
 class Order(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Both foreign keys lead the composite indexes below, which replace their single-column indexes
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     delivery_crew = models.ForeignKey(
-        User, on_delete=models.SET_NULL, null=True, related_name="delivery_crew"
+        User, on_delete=models.SET_NULL, null=True, related_name="delivery_crew", db_index=False
     )
-    status = models.BooleanField(default=False, db_index=True)
+    status = models.BooleanField(default=False)
     total = models.DecimalField(
         max_digits=6, decimal_places=2, validators=[MinValueValidator(0)]
     )
@@ -94,6 +95,13 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-date", "-id"]
+        # Composite indexes follow OrderView's access paths so each listing is read in index order
+        # (see the check_query_plans command)
+        indexes = [
+            models.Index(fields=["user", "-date", "-id"], name="order_user_date_idx"),
+            models.Index(fields=["delivery_crew", "-date", "-id"], name="order_crew_date_idx"),
+            models.Index(fields=["status", "-date", "-id"], name="order_status_date_idx"),
+        ]
 
 
 class OrderItem(models.Model):
@@ -113,3 +121,139 @@ class OrderItem(models.Model):
 
     class Meta:
         unique_together = ("order", "menu_item")
+
+
+# Archive of delivered orders, moved out of Order/OrderItem by archiving.py with their original ids
+
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders", db_index=False)
+    delivery_crew = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="archived_deliveries", db_index=False
+    )
+    status = models.BooleanField(default=True)
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField()
+
+    class Meta:
+        ordering = ["-date", "-id"]
+        # The same access paths as Order's; the id is not SQLite's rowid here, so it is part of every index
+        indexes = [
+            models.Index(fields=["-date", "-id"], name="archived_order_date_idx"),
+            models.Index(fields=["user", "-date", "-id"], name="archived_order_user_date_idx"),
+            models.Index(fields=["delivery_crew", "-date", "-id"], name="archived_order_crew_date_idx"),
+            models.Index(fields=["status", "-date", "-id"], name="archived_order_status_date_idx"),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="archived_order_items")
+    quantity = models.PositiveSmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        unique_together = ("order", "menu_item")
+
+
+# Read-only UNION ALL views over the live and the archived tables (migration 0005), with the same field names
+# as Order/OrderItem so that the order serializers and filters work on them unchanged
+
+
+class CombinedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="+", db_constraint=False)
+    delivery_crew = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, related_name="+", db_constraint=False
+    )
+    status = models.BooleanField()
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField()
+
+    class Meta:
+        managed = False
+        ordering = ["-date", "-id"]
+
+
+class CombinedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        CombinedOrder, on_delete=models.DO_NOTHING, related_name="orderitem_set", db_constraint=False
+    )
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.DO_NOTHING, related_name="+", db_constraint=False)
+    quantity = models.PositiveSmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        managed = False
+
+
+# Change log of order status and delivery crew changes, streamed to clients by events.py
+
+
+class OrderEvent(models.Model):
+    # Plain ids rather than foreign keys: the log outlives deleted and archived orders
+    order_id = models.BigIntegerField()
+    customer_id = models.BigIntegerField()
+    status = models.BooleanField()
+    delivery_crew_id = models.BigIntegerField(null=True)
+    previous_delivery_crew_id = models.BigIntegerField(null=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+# Transactional outbox: side effects enqueued with the write they follow, run by outbox.py's workers
+
+
+class OutboxMessage(models.Model):
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created = models.DateTimeField(default=timezone.now)
+    # When a worker may claim the message next: pushed forward by a claim's lease and by retry backoff
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Gave up after OUTBOX_MAX_ATTEMPTS, kept for inspection
+    dead = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["dead", "available_at"], name="outbox_due_idx")]
+
+
+class OutboxEffect(models.Model):
+    """A side effect an outbox handler completed (e.g. "receipt:<order id>"), so a redelivery doesn't repeat it"""
+
+    key = models.CharField(max_length=200, unique=True)
+    done_at = models.DateTimeField(default=timezone.now)
+
+
+# Reporting aggregates, maintained incrementally by reports.py
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    pending_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    @property
+    def order_count(self):
+        return self.pending_count + self.delivered_count
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name_plural = "daily sales"
+
+
+class MenuItemSales(models.Model):
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("date", "menu_item")
+        verbose_name_plural = "menu item sales"
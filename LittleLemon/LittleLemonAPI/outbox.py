@@ -0,0 +1,213 @@
+"""
+Transactional outbox for the side effects that follow a write.
+
+Work that must happen after a write but need not hold up its response (order receipts now; kitchen tickets or
+analytics later) is enqueued as an OutboxMessage in the same transaction as the write, so the message exists
+if and only if the write committed. The run_outbox command drains the table with a pool of worker threads,
+without any broker. Each batch is:
+1. claimed: in one short transaction, up to OUTBOX_BATCH_SIZE due messages are taken and their available_at
+   pushed OUTBOX_LEASE seconds ahead, so no other worker (thread or process) picks them up meanwhile
+2. handled, one message after the other, outside of any transaction: the message's lease is renewed for
+   another OUTBOX_LEASE seconds (the handlers before it may have used up the batch's), then its topic's
+   handler runs
+3. acknowledged, right after its handler: a handled message is deleted; failures are retried after an
+   exponential backoff (with jitter), and marked dead after OUTBOX_MAX_ATTEMPTS
+
+The attempts counter, incremented by every claim, fences the lease: renewing and acknowledging only apply to
+the claim they follow, so a message whose lease ran out (and was claimed by another worker) is skipped.
+
+A worker dying mid-batch leaves its messages to be claimed again once their lease runs out: delivery is at
+least once, so handlers must be idempotent, e.g. by recording what they did as an OutboxEffect (effect_done(),
+mark_effect_done()). MetricsView exposes the queue depth and the processing lag.
+"""
+
+import logging
+import random
+import threading
+import traceback
+from collections.abc import Callable
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from .models import Order, OutboxEffect, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 20)
+OUTBOX_LEASE = getattr(settings, "OUTBOX_LEASE", 60)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+OUTBOX_BACKOFF = getattr(settings, "OUTBOX_BACKOFF", 5)
+OUTBOX_MAX_BACKOFF = getattr(settings, "OUTBOX_MAX_BACKOFF", 3600)
+OUTBOX_POLL_INTERVAL = getattr(settings, "OUTBOX_POLL_INTERVAL", 1)
+
+handlers: dict[str, Callable[[dict], None]] = {}
+
+
+def handler(topic: str):
+    """Registers the decorated function as the handler of a topic; it is called with the message payload"""
+
+    def register(function: Callable[[dict], None]):
+        handlers[topic] = function
+        return function
+
+    return register
+
+
+def enqueue(topic: str, payload: dict) -> OutboxMessage:
+    """Must run in the transaction of the write the message follows"""
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before the next attempt after attempts failures, between half and all of the exponential delay"""
+    delay = min(OUTBOX_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1)
+
+
+@transaction.atomic
+def claim(batch_size: int = OUTBOX_BATCH_SIZE) -> list[OutboxMessage]:
+    now = timezone.now()
+    ids = list(
+        OutboxMessage.objects.filter(dead=False, available_at__lte=now)
+        .select_for_update(skip_locked=True)
+        .order_by("available_at", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    OutboxMessage.objects.filter(id__in=ids).update(
+        available_at=now + timedelta(seconds=OUTBOX_LEASE), attempts=F("attempts") + 1
+    )
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by("id"))
+
+
+def leased(message: OutboxMessage):
+    """The message, as long as it is still under the claim it was returned by"""
+    return OutboxMessage.objects.filter(id=message.id, attempts=message.attempts)
+
+
+def renew(message: OutboxMessage) -> bool:
+    """Extends the message's lease; False if it is no longer leased by this claim"""
+    return leased(message).update(available_at=timezone.now() + timedelta(seconds=OUTBOX_LEASE)) == 1
+
+
+def process_batch(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Claims, handles and acknowledges one batch; returns how many messages were claimed"""
+    messages = claim(batch_size)
+    for message in messages:
+        if not renew(message):
+            logger.warning("Outbox message %s (%s) lost its lease, skipped", message.id, message.topic)
+            continue
+        try:
+            if message.topic not in handlers:
+                raise LookupError(f"No handler for {message.topic!r}")
+            handlers[message.topic](message.payload)
+        except Exception:
+            logger.exception(
+                "Outbox message %s (%s) failed, attempt %s", message.id, message.topic, message.attempts
+            )
+            dead = message.attempts >= OUTBOX_MAX_ATTEMPTS
+            leased(message).update(
+                available_at=timezone.now() + timedelta(seconds=backoff(message.attempts)),
+                last_error=traceback.format_exc()[-4000:],
+                dead=dead,
+            )
+        else:
+            leased(message).delete()
+    return len(messages)
+
+
+class OutboxWorker(threading.Thread):
+    """Processes batches back to back while there is a backlog, and polls every interval seconds otherwise"""
+
+    def __init__(
+        self,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        interval: float = OUTBOX_POLL_INTERVAL,
+        name: str = "outbox-worker",
+    ):
+        super().__init__(name=name, daemon=True)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.processed = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            claimed = 0
+            close_old_connections()
+            try:
+                claimed = process_batch(self.batch_size)
+                self.processed += claimed
+            except Exception:
+                logger.exception("Outbox batch failed")
+            finally:
+                close_old_connections()
+            if claimed < self.batch_size:
+                self._stop_event.wait(self.interval)
+
+    def stop(self, timeout: float | None = None):
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def export_outbox_metrics() -> str:
+    """Queue depth and processing lag in the Prometheus text format, from one aggregate query"""
+    stats = OutboxMessage.objects.aggregate(
+        pending=Count("id", filter=Q(dead=False)),
+        # Not named after the dead field, which the filters refer to
+        given_up=Count("id", filter=Q(dead=True)),
+        oldest=Min("created", filter=Q(dead=False)),
+    )
+    lag = (timezone.now() - stats["oldest"]).total_seconds() if stats["oldest"] else 0
+    lines = [
+        "# HELP littlelemon_outbox_messages Outbox messages waiting to be processed, or given up on (dead)",
+        "# TYPE littlelemon_outbox_messages gauge",
+        f'littlelemon_outbox_messages{{state="pending"}} {stats["pending"]}',
+        f'littlelemon_outbox_messages{{state="dead"}} {stats["given_up"]}',
+        "# HELP littlelemon_outbox_lag_seconds Age of the oldest pending outbox message",
+        "# TYPE littlelemon_outbox_lag_seconds gauge",
+        f"littlelemon_outbox_lag_seconds {lag:.3f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def effect_done(key: str) -> bool:
+    return OutboxEffect.objects.filter(key=key).exists()
+
+
+def mark_effect_done(key: str):
+    OutboxEffect.objects.bulk_create([OutboxEffect(key=key)], ignore_conflicts=True)
+
+
+# Handlers
+
+
+@handler("order.placed")
+def send_order_receipt(payload: dict):
+    order = (
+        Order.objects.select_related("user")
+        .prefetch_related("orderitem_set__menu_item")
+        .filter(id=payload["order_id"])
+        .first()
+    )
+    # Deleted in the meantime, or nowhere to send the receipt to
+    if order is None or not order.user.email:
+        return
+    # Already sent by an earlier delivery of the message, which failed to be acknowledged
+    effect = f"receipt:{order.id}"
+    if effect_done(effect):
+        return
+    lines = [
+        f"{item.quantity} x {item.menu_item.title}: {item.price}" for item in order.orderitem_set.all()
+    ]
+    send_mail(
+        f"Your Little Lemon order #{order.id}",
+        "\n".join([*lines, f"Total: {order.total}"]),
+        None,
+        [order.user.email],
+    )
+    mark_effect_done(effect)
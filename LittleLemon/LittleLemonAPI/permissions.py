@@ -1,35 +1,30 @@
 from rest_framework import permissions
-from .utils import GroupEnum, DrfRequest
-from .models import Order
+from .utils import DrfRequest
+from .models import CombinedOrder, Order
+from .roles import is_manager, is_delivery_crew, is_customer
 
 class IsManager(permissions.BasePermission):
     # message: str
     # code: int # Default 403
 
     def has_permission(self, request: DrfRequest, view):
-        return bool(
-            request.user
-            and request.user.groups.filter(name=GroupEnum.MANAGER.value).exists()
-        )
+        return bool(request.user and is_manager(request.user))
 
 
 class IsDeliveryCrew(permissions.BasePermission):
     def has_permission(self, request: DrfRequest, view):
-        return bool(
-            request.user
-            and request.user.groups.filter(name=GroupEnum.DELIVERY_CREW.value).exists()
-        )
+        return bool(request.user and is_delivery_crew(request.user))
     def has_object_permission(self, request: DrfRequest, view, obj):
-        if isinstance(obj, Order):
-            return obj.delivery_crew == request.user
+        if isinstance(obj, (Order, CombinedOrder)):
+            return obj.delivery_crew_id == request.user.id
         return True
 
 
 class IsCustomer(permissions.BasePermission):    
     def has_permission(self, request: DrfRequest, view):
-        return bool(request.user and not request.user.groups.exists())
+        return bool(request.user and is_customer(request.user))
     
     def has_object_permission(self, request: DrfRequest, view, obj):
-        if type(obj) == Order:
-            return obj.user == request.user
+        if isinstance(obj, (Order, CombinedOrder)):
+            return obj.user_id == request.user.id
         return True
@@ -0,0 +1,204 @@
+"""
+Pre-aggregated sales reporting.
+
+DailySales and MenuItemSales are kept up to date incrementally by the order write paths
+(services.place_order and bulk_update_orders, OrderView.update/partial_update/destroy) with single-statement
+"INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x" upserts, inside the same transaction as the order change.
+Anything that bypasses those paths (admin edits, cascading user deletes, raw SQL) is repaired by the
+rebuild_reports command, which also checks the aggregates against the raw tables. Both read the live and the
+archived orders (the CombinedOrder/CombinedOrderItem views, see archiving.py).
+"""
+
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import date
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from .models import CombinedOrder, CombinedOrderItem, Order, OrderItem, DailySales, MenuItemSales
+
+DAILY_FIELDS = ("pending_count", "delivered_count", "revenue")
+MENU_ITEM_FIELDS = ("quantity", "revenue")
+
+
+def _increment(model, key_fields: tuple[str, ...], rows: list[dict]):
+    """Adds the non-key values of each row to the matching aggregate row, creating it if needed"""
+    if not rows:
+        return
+    opts = model._meta
+    fields = [opts.get_field(name) for name in rows[0]]
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    columns = ", ".join(qn(field.column) for field in fields)
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    conflict = ", ".join(qn(opts.get_field(name).column) for name in key_fields)
+    updates = ", ".join(
+        f"{qn(field.column)} = {table}.{qn(field.column)} + excluded.{qn(field.column)}"
+        for field in fields
+        if field.name not in key_fields
+    )
+    params = [
+        field.get_db_prep_save(row[field.name], connection) for row in rows for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}",
+            params,
+        )
+
+
+def _daily_row(order: Order, sign: int = 1) -> dict:
+    return {
+        "date": order.date,
+        "pending_count": sign * (not order.status),
+        "delivered_count": sign * order.status,
+        "revenue": sign * order.total,
+    }
+
+
+def record_order_placed(order: Order, items: Iterable[OrderItem]):
+    _increment(DailySales, ("date",), [_daily_row(order)])
+    _increment(
+        MenuItemSales,
+        ("date", "menu_item"),
+        [
+            {"date": order.date, "menu_item": item.menu_item_id, "quantity": item.quantity, "revenue": item.price}
+            for item in items
+        ],
+    )
+
+
+def record_status_change(order: Order, previous_status: bool):
+    record_status_changes([(order.date, previous_status)], order.status)
+
+
+def record_status_changes(orders: Iterable[tuple[date, bool]], status: bool):
+    """Moves orders given as (date, previous status) to the new status, one aggregate row per date"""
+    changed = Counter(day for day, previous_status in orders if previous_status != status)
+    sign = 1 if status else -1
+    _increment(
+        DailySales,
+        ("date",),
+        [
+            {"date": day, "pending_count": -sign * count, "delivered_count": sign * count, "revenue": Decimal(0)}
+            for day, count in sorted(changed.items())
+        ],
+    )
+
+
+def record_order_deleted(order: Order):
+    """Must be called before the order (and with it its items) is deleted"""
+    _increment(DailySales, ("date",), [_daily_row(order, sign=-1)])
+    _increment(
+        MenuItemSales,
+        ("date", "menu_item"),
+        [
+            {"date": order.date, "menu_item": menu_item, "quantity": -quantity, "revenue": -price}
+            for menu_item, quantity, price in OrderItem.objects.filter(order=order).values_list(
+                "menu_item", "quantity", "price"
+            )
+        ],
+    )
+
+
+# Rebuild and consistency check
+
+
+CENT = Decimal("0.01")
+
+
+def _round_revenue(row: dict) -> dict:
+    # SQLite sums decimals as floats, so the sum is off by a tiny fraction from the stored (rounded) value
+    row["revenue"] = row["revenue"].quantize(CENT)
+    return row
+
+
+def compute_daily_sales(dates: list[date]) -> list[DailySales]:
+    return [
+        DailySales(**_round_revenue(row))
+        for row in CombinedOrder.objects.filter(date__in=dates)
+        .order_by()
+        .values("date")
+        .annotate(
+            pending_count=Count("id", filter=Q(status=False)),
+            delivered_count=Count("id", filter=Q(status=True)),
+            revenue=Sum("total"),
+        )
+    ]
+
+
+def compute_menu_item_sales(dates: list[date]) -> list[MenuItemSales]:
+    return [
+        MenuItemSales(
+            date=row["order__date"], menu_item_id=row["menu_item"], quantity=row["quantity"], revenue=row["revenue"]
+        )
+        for row in map(_round_revenue, CombinedOrderItem.objects.filter(order__date__in=dates)
+        .order_by()
+        .values("order__date", "menu_item")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("price")))
+    ]
+
+
+def iter_date_chunks(chunk_days: int) -> Iterator[list[date]]:
+    dates = CombinedOrder.objects.order_by("date").values_list("date", flat=True).distinct()
+    chunk = []
+    for day in dates.iterator():
+        chunk.append(day)
+        if len(chunk) == chunk_days:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild_reports(chunk_days: int = 31) -> Iterator[list[date]]:
+    """Recomputes the aggregates from the raw tables, one transaction per chunk of order dates"""
+    order_dates = CombinedOrder.objects.values("date")
+    DailySales.objects.exclude(date__in=order_dates).delete()
+    MenuItemSales.objects.exclude(date__in=order_dates).delete()
+    for dates in iter_date_chunks(chunk_days):
+        with transaction.atomic():
+            DailySales.objects.filter(date__in=dates).delete()
+            MenuItemSales.objects.filter(date__in=dates).delete()
+            DailySales.objects.bulk_create(compute_daily_sales(dates))
+            MenuItemSales.objects.bulk_create(compute_menu_item_sales(dates))
+        yield dates
+
+
+def find_report_mismatches(chunk_days: int = 31) -> Iterator[str]:
+    def daily_values(row: DailySales):
+        return tuple(getattr(row, name) for name in DAILY_FIELDS)
+
+    def menu_item_values(row: MenuItemSales):
+        return tuple(getattr(row, name) for name in MENU_ITEM_FIELDS)
+
+    order_dates = CombinedOrder.objects.values("date")
+    for row in DailySales.objects.exclude(date__in=order_dates).exclude(
+        pending_count=0, delivered_count=0, revenue=0
+    ):
+        yield f"DailySales {row.date}: {daily_values(row)} but there are no orders"
+    for row in MenuItemSales.objects.exclude(date__in=order_dates).exclude(quantity=0, revenue=0):
+        yield f"MenuItemSales {row.date} #{row.menu_item_id}: {menu_item_values(row)} but there are no orders"
+
+    for dates in iter_date_chunks(chunk_days):
+        expected = {row.date: daily_values(row) for row in compute_daily_sales(dates)}
+        stored = {row.date: daily_values(row) for row in DailySales.objects.filter(date__in=dates)}
+        for day in sorted(expected.keys() | stored.keys()):
+            # Rows that were incremented back down to zero are equivalent to missing rows
+            if expected.get(day, (0, 0, 0)) != stored.get(day, (0, 0, 0)):
+                yield f"DailySales {day}: stored {stored.get(day)}, expected {expected.get(day)}"
+
+        expected = {
+            (row.date, row.menu_item_id): menu_item_values(row) for row in compute_menu_item_sales(dates)
+        }
+        stored = {
+            (row.date, row.menu_item_id): menu_item_values(row)
+            for row in MenuItemSales.objects.filter(date__in=dates)
+        }
+        for day, menu_item in sorted(expected.keys() | stored.keys()):
+            key = (day, menu_item)
+            if expected.get(key, (0, 0)) != stored.get(key, (0, 0)):
+                yield (
+                    f"MenuItemSales {day} #{menu_item}: stored {stored.get(key)}, expected {expected.get(key)}"
+                )
@@ -0,0 +1,72 @@
+"""
+Resolved-role layer.
+
+A user's group names are loaded once and then reused:
+- memoized on the user object, which DRF keeps for the lifetime of the request
+- stored in Django's cache framework (LocMem per process by default) with a TTL
+
+Membership changes invalidate the cached entry (see signals.py), so permission classes and views
+should always go through these helpers instead of querying request.user.groups directly.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from .utils import GroupEnum
+
+ROLE_CACHE_TIMEOUT = getattr(settings, "ROLE_CACHE_TIMEOUT", 300)
+_USER_ATTR = "_resolved_group_names"
+
+
+def _cache_key(user_id: int):
+    return f"roles:{user_id}"
+
+
+def get_group_names(user) -> frozenset[str]:
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, _USER_ATTR, None)
+    if names is not None:
+        return names
+    names = cache.get(_cache_key(user.pk))
+    if names is None:
+        names = frozenset(user.groups.values_list("name", flat=True))
+        cache.set(_cache_key(user.pk), names, ROLE_CACHE_TIMEOUT)
+    setattr(user, _USER_ATTR, names)
+    return names
+
+
+async def aget_group_names(user) -> frozenset[str]:
+    """Async counterpart of get_group_names for native async views"""
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, _USER_ATTR, None)
+    if names is not None:
+        return names
+    names = await cache.aget(_cache_key(user.pk))
+    if names is None:
+        names = frozenset([name async for name in user.groups.values_list("name", flat=True)])
+        await cache.aset(_cache_key(user.pk), names, ROLE_CACHE_TIMEOUT)
+    setattr(user, _USER_ATTR, names)
+    return names
+
+
+def remember_group_names(user, names: frozenset[str]):
+    """Memoizes group names that were resolved elsewhere (e.g. with the cached token) on the user"""
+    setattr(user, _USER_ATTR, names)
+
+
+def invalidate_group_names(*user_ids: int):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def is_manager(user) -> bool:
+    return GroupEnum.MANAGER.value in get_group_names(user)
+
+
+def is_delivery_crew(user) -> bool:
+    return GroupEnum.DELIVERY_CREW.value in get_group_names(user)
+
+
+def is_customer(user) -> bool:
+    # Users not assigned to a group are considered customers
+    return not get_group_names(user)
@@ -0,0 +1,165 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary ("default"). Reads go to the replica (settings.REPLICA_DATABASE) only when
+settings.REPLICA_READS is on, where a view opted in, through ReplicaReadMixin (the list/retrieve actions) or
+use_replica(), and only while:
+- the request has not written anything yet: the first write pins the rest of the request to the primary
+- no transaction is open on the primary, so read-modify-write code reads what it is about to change
+- the user did not write during the last REPLICA_PIN_TIMEOUT seconds, so a client reading right after its own
+  POST/PUT/PATCH/DELETE sees its changes even while the replica lags behind
+
+Pins live in the default cache, which must therefore be shared by all server processes (LITTLELEMON_REDIS_URL):
+with a per-process LocMemCache, a read landing on another worker than the write is not pinned (checks.py warns).
+
+The routing state is per request (DatabaseRoutingMiddleware); outside a request (management commands, the
+dispatcher thread) everything goes to the primary.
+
+Locally the replica is a second SQLite file, refreshed from the primary by the sync_replica command. It holds
+neither schema nor data before the first sync, hence REPLICA_READS being off by default: run sync_replica (and
+keep it running with --interval), then turn it on. In tests it mirrors the primary (TEST["MIRROR"]).
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DATABASE = getattr(settings, "REPLICA_DATABASE", "replica")
+REPLICA_READS = getattr(settings, "REPLICA_READS", False)
+REPLICA_PIN_TIMEOUT = getattr(settings, "REPLICA_PIN_TIMEOUT", 5)
+
+
+@dataclass
+class RoutingState:
+    replica: bool = False
+    wrote: bool = False
+
+
+_routing_state: ContextVar[RoutingState | None] = ContextVar("routing_state", default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+def replica_enabled() -> bool:
+    return REPLICA_READS and replica_configured()
+
+
+def _pin_key(user_id: int) -> str:
+    return f"db:pinned:{user_id}"
+
+
+def use_replica():
+    """Sends the remaining reads of the current request to the replica"""
+    state = _routing_state.get()
+    if state is not None:
+        state.replica = True
+
+
+def use_primary():
+    """Sends the remaining reads of the current request to the primary, e.g. for data about to be cached"""
+    state = _routing_state.get()
+    if state is not None:
+        state.replica = False
+
+
+def is_pinned(user) -> bool:
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+async def ais_pinned(user) -> bool:
+    return user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if (
+            state is None
+            or not state.replica
+            or state.wrote
+            or not replica_enabled()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DATABASE}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary (sync_replica)
+        return db != REPLICA_DATABASE
+
+
+class ReplicaReadMixin:
+    """Serves the safe replica_actions of a viewset from the replica, once authentication and permissions ran"""
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and replica_enabled()
+            and not is_pinned(request.user)
+        ):
+            use_replica()
+
+
+class DatabaseRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        user = self.writer(request, state)
+        if user is not None:
+            cache.set(_pin_key(user.pk), True, REPLICA_PIN_TIMEOUT)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        user = self.writer(request, state)
+        if user is not None:
+            await cache.aset(_pin_key(user.pk), True, REPLICA_PIN_TIMEOUT)
+        return response
+
+    @staticmethod
+    def writer(request, state: RoutingState):
+        """The authenticated user who wrote during the request, if any"""
+        # DRF sets request.user on the underlying HttpRequest once it authenticated the request
+        user = getattr(request, "user", None) if state.wrote else None
+        if user is not None and user.is_authenticated:
+            return user
+        return None
@@ -0,0 +1,109 @@
+"""
+Full-text search over menu items, backed by an SQLite FTS5 table.
+
+LittleLemonAPI_menuitem_search holds one row per menu item (rowid = MenuItem.id) with its title and category
+title. It is created by migration 0004 and kept in sync by the MenuItem/Category signals (see signals.py).
+Writes that bypass model signals (QuerySet.update(), bulk_create()) must call index_menu_items() or
+rebuild_search_index().
+
+Every word of ?search= is matched as a prefix ("pas sal" finds "Pasta salad"), and results are ranked by
+bm25 with title matches weighing more than category matches unless an explicit ordering is requested.
+On other databases MenuItemSearchFilter falls back to DRF's SearchFilter (LIKE '%term%').
+"""
+
+import re
+from django.db import connection
+from django.db.models import QuerySet
+from rest_framework.filters import SearchFilter
+
+SEARCH_TABLE = "LittleLemonAPI_menuitem_search"
+
+INDEX_ROWS_SQL = f"""
+    INSERT INTO "{SEARCH_TABLE}" (rowid, title, category)
+    SELECT item.id, item.title, category.title
+    FROM "LittleLemonAPI_menuitem" item
+    INNER JOIN "LittleLemonAPI_category" category ON category.id = item.category_id
+"""
+
+
+def search_enabled() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def build_match_query(term: str) -> str | None:
+    """Quoted prefix query for every word of the term, or None if it has no words"""
+    words = re.findall(r"\w+", term.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def index_menu_items(ids):
+    if not search_enabled():
+        return
+    ids = list(ids)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid IN ({placeholders})', ids)
+        cursor.execute(f"{INDEX_ROWS_SQL} WHERE item.id IN ({placeholders})", ids)
+
+
+def index_category(category_id: int):
+    """Reindexes the items of a category, e.g. after its title changed"""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""DELETE FROM "{SEARCH_TABLE}" WHERE rowid IN
+                (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = %s)""",
+            [category_id],
+        )
+        cursor.execute(f"{INDEX_ROWS_SQL} WHERE item.category_id = %s", [category_id])
+
+
+def remove_menu_items(ids):
+    if not search_enabled():
+        return
+    ids = list(ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids
+        )
+
+
+def rebuild_search_index() -> int:
+    """Repopulates the whole index from the menu tables and returns the number of indexed items"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}"')
+        cursor.execute(INDEX_ROWS_SQL)
+        count = cursor.rowcount
+        # Merges the b-trees left by incremental writes
+        cursor.execute(f"""INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}") VALUES ('optimize')""")
+    return count
+
+
+class MenuItemSearchFilter(SearchFilter):
+    """?search= through the FTS5 index"""
+
+    def filter_queryset(self, request, queryset: QuerySet, view) -> QuerySet:
+        if not search_enabled():
+            return super().filter_queryset(request, queryset, view)
+        term = request.query_params.get(self.search_param, "")
+        if not term.strip():
+            return queryset
+        match = build_match_query(term)
+        if match is None:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        # extra() so that the search table is joined (and drives the query) rather than probed per row
+        queryset = queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'"{SEARCH_TABLE}".rowid = "{table}".id', f'"{SEARCH_TABLE}" MATCH %s'],
+            params=[match],
+            # The rank column is bm25 with the column weights configured by migration 0004
+            select={"search_rank": f'"{SEARCH_TABLE}".rank'},
+        )
+        if not queryset.ordered:
+            # Ordering by rank alone lets FTS5 return the rows already sorted
+            queryset = queryset.extra(order_by=["search_rank"])
+        return queryset
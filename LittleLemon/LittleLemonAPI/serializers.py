@@ -1,5 +1,31 @@
 from rest_framework import serializers
 from .models import *
+from .utils import GroupEnum
+from .catalog import menu_catalog
+from .instrumentation import TimedSerializerMixin
+
+
+class MenuItemPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Resolves menu items to MenuEntry tuples from the in-memory menu_catalog instead of one query per value"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            entry = menu_catalog.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if entry is None:
+            self.fail("does_not_exist", pk_value=data)
+        return entry
+
+
+class CartInputListSerializer(serializers.ListSerializer):
+    def validate(self, attrs: list):
+        menu_items = [row["menu_item_id"] for row in attrs]
+        if len(menu_items) != len(set(menu_items)):
+            raise serializers.ValidationError("Each menu item can only appear once")
+        return attrs
 
 
 class CartInputSerializer(serializers.ModelSerializer):
@@ -7,18 +33,17 @@ class CartInputSerializer(serializers.ModelSerializer):
     Method responsibilities:
     - to_internal_value(): Converts and transforms field values from the input data itself.
                            Use this for computing/deriving new fields based on other input fields
-                           (e.g., calculating price from unit_price and quantity).
+                           (e.g., unit_price from menu_item and price from unit_price and quantity).
     - validate(): Handles business logic validation and assigns context-based values
                   (e.g., user from request context).
     """
 
+    menu_item = MenuItemPrimaryKeyField(queryset=MenuItem.objects.all())
+
     def validate(self, attrs: dict):
-        menu_item = attrs.get("menu_item")
-        if not menu_item:
+        if not attrs.get("menu_item_id"):
             raise serializers.ValidationError("Menu item is required")
 
-        attrs["unit_price"] = menu_item.price
-
         if self.context.get("user"):
             attrs["user"] = self.context["user"]
 
@@ -26,34 +51,40 @@ class CartInputSerializer(serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         ret = super().to_internal_value(data)
-        if "unit_price" in ret or "quantity" in ret:
+        # The MenuEntry becomes a plain menu_item_id, so Cart(**validated_data) needs no MenuItem instance
+        menu_item = ret.pop("menu_item", None)
+        if menu_item:
+            ret["menu_item_id"] = menu_item.id
+        if menu_item or "quantity" in ret:
             if self.instance:
-                unit_price = ret.get("unit_price", self.instance.unit_price)
+                menu_item = menu_item or menu_catalog.get(self.instance.menu_item_id)
                 quantity = ret.get("quantity", self.instance.quantity)
             else:
-                unit_price = ret.get("unit_price", 0)
                 quantity = ret.get("quantity", 0)
 
-            ret["price"] = Cart.compute_price(unit_price, quantity)
+            if menu_item:
+                ret["unit_price"] = menu_item.price
+                ret["price"] = Cart.compute_price(menu_item.price, quantity)
         return ret
 
     class Meta:
         model = Cart
         fields = ["menu_item", "quantity"]
         read_only_fields = ["user", "unit_price", "price"]
+        list_serializer_class = CartInputListSerializer
 
 
 class CartRemoveSerializer(serializers.Serializer):
     menu_item = serializers.IntegerField()
 
 
-class CartViewSerializer(serializers.ModelSerializer):
+class CartViewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = "__all__"
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         ret = super().to_internal_value(data)
@@ -69,7 +100,7 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ["slug"]
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = serializers.SlugRelatedField(
         slug_field="slug", queryset=Category.objects.all()
     )
@@ -79,25 +110,124 @@ class MenuItemSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class CustomerOrderViewSerializer(serializers.ModelSerializer):
+class CustomerOrderViewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
         exclude = ["delivery_crew"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = "__all__"
 
 
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    menu_item_title = serializers.CharField(source="menu_item.title", read_only=True)
+
+    class Meta:
+        model = OrderItem
+        exclude = ["order"]
+
+
+# ?expand=items variants; the view prefetches orderitem_set with its menu items
+
+
+class ExpandedCustomerOrderViewSerializer(CustomerOrderViewSerializer):
+    items = OrderItemSerializer(source="orderitem_set", many=True, read_only=True)
+
+    class Meta(CustomerOrderViewSerializer.Meta):
+        pass
+
+
+class ExpandedOrderSerializer(OrderSerializer):
+    items = OrderItemSerializer(source="orderitem_set", many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        pass
+
+
 class ManagerOrderUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ["status", "delivery_crew"]
 
 
+class OrderFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=["pending", "delivered"], required=False)
+    date = serializers.DateField(required=False)
+
+    def validate(self, attrs: dict):
+        # An empty filter would select every order
+        if not attrs:
+            raise serializers.ValidationError("Filter on status and/or date")
+        return attrs
+
+
+class OrderBulkUpdateSerializer(serializers.Serializer):
+    """Either ids or filter selects the orders; status and/or delivery_crew is applied to them"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+    filter = OrderFilterSerializer(required=False)
+    status = serializers.BooleanField(required=False)
+    # One query checks both that the user exists and that it belongs to the delivery crew
+    delivery_crew = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(groups__name=GroupEnum.DELIVERY_CREW.value),
+        allow_null=True,
+        required=False,
+        error_messages={"does_not_exist": "User {pk_value} is not in the delivery crew group."},
+    )
+
+    def validate(self, attrs: dict):
+        if ("ids" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Provide either ids or filter")
+        if "status" not in attrs and "delivery_crew" not in attrs:
+            raise serializers.ValidationError("Provide status and/or delivery_crew")
+        return attrs
+
+
+class UserReferenceField(serializers.Field):
+    """A user id (integer) or username (string)"""
+
+    default_error_messages = {"invalid": "Expected a user id or a username."}
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data in (0, ""):
+            self.fail("invalid")
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class GroupMembershipBulkSerializer(serializers.Serializer):
+    add = serializers.ListField(child=UserReferenceField(), required=False)
+    remove = serializers.ListField(child=UserReferenceField(), required=False)
+
+    def validate(self, attrs: dict):
+        if not attrs.get("add") and not attrs.get("remove"):
+            raise serializers.ValidationError("Provide users to add and/or remove")
+        return attrs
+
+
 class DeliveryCrewOrderUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ["status"]
+
+
+class DailySalesSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    order_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DailySales
+        fields = ["date", "order_count", "pending_count", "delivered_count", "revenue"]
+
+
+class TopMenuItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    menu_item = serializers.IntegerField()
+    title = serializers.CharField(source="menu_item__title")
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
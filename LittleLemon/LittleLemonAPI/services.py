@@ -0,0 +1,147 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, QuerySet, Sum, Window
+from rest_framework import exceptions
+from .authentication import invalidate_user_tokens
+from .events import order_event, record_order_events
+from .models import Cart, Order, OrderItem
+from .outbox import enqueue
+from .reports import record_order_placed, record_status_changes
+from .roles import invalidate_group_names
+
+
+@transaction.atomic
+def place_order(user: User) -> Order:
+    """
+    Turns the user's cart into an order in a fixed number of queries regardless of the cart size:
+    1. SELECT the cart lines together with their total (window aggregate, so no second round-trip)
+    2. INSERT the order
+    3. INSERT all order items (bulk_create)
+    4. upsert the reporting aggregates (2 statements)
+    5. DELETE the cart lines that were ordered
+    6. INSERT the order.placed outbox message; its side effects (the receipt) run in the outbox workers
+    """
+    carts = list(
+        Cart.objects.filter(user=user).annotate(
+            order_total=Window(expression=Sum("price"))
+        )
+    )
+    if not carts:
+        raise exceptions.ValidationError(
+            "Your cart is empty. Please add items to your cart before placing an order."
+        )
+    order = Order.objects.create(user=user, total=carts[0].order_total)
+    items = OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            menu_item_id=item.menu_item_id,
+            quantity=item.quantity,
+            unit_price=item.unit_price,
+            price=item.price,
+        )
+        for item in carts
+    )
+    record_order_placed(order, items)
+    # Only the lines that were ordered, in case the cart changed concurrently
+    Cart.objects.filter(id__in=[item.id for item in carts]).delete()
+    enqueue("order.placed", {"order_id": order.id})
+    return order
+
+
+@transaction.atomic
+def bulk_update_orders(queryset: QuerySet, changes: dict, max_orders: int) -> list[int]:
+    """
+    Applies changes (status and/or delivery_crew) to the orders of the queryset and returns their ids:
+    1. SELECT the orders' ids, statuses, dates, customers and crews (locked where the database supports it)
+    2. a single UPDATE ... WHERE id IN (...)
+    3. move the status counts of the reporting aggregates (one upsert)
+    4. INSERT the change events of the orders that actually changed (one bulk_create)
+    """
+    orders = list(
+        queryset.select_for_update()
+        .order_by()
+        .only("id", "status", "date", "user_id", "delivery_crew_id")[: max_orders + 1]
+    )
+    if len(orders) > max_orders:
+        raise exceptions.ValidationError(f"More than {max_orders} orders match, narrow down the selection.")
+    ids = [order.id for order in orders]
+    if ids:
+        Order.objects.filter(id__in=ids).update(**changes)
+    if "status" in changes:
+        record_status_changes([(order.date, order.status) for order in orders], changes["status"])
+    events = []
+    for order in orders:
+        previous_status, previous_delivery_crew_id = order.status, order.delivery_crew_id
+        order.status = changes.get("status", order.status)
+        if "delivery_crew" in changes:
+            order.delivery_crew = changes["delivery_crew"]
+        events.append(order_event(order, previous_status, previous_delivery_crew_id))
+    record_order_events(events)
+    return ids
+
+
+@transaction.atomic
+def bulk_update_membership(group: Group, add: list[int | str], remove: list[int | str]) -> list[dict]:
+    """
+    Adds users to and removes users from the group, each given by id or username, and returns a result per
+    reference (added, removed, already_member, not_member, duplicate or not_found):
+    1. SELECT the referenced users, with whether they are members of the group
+    2. one INSERT of the new memberships into the through table
+    3. one DELETE of the removed memberships
+    4. the token keys of the changed users, whose cached roles are dropped
+    """
+    Membership = User.groups.through
+    references = [*add, *remove]
+    users = {}
+    rows = (
+        User.objects.filter(
+            Q(id__in=[ref for ref in references if isinstance(ref, int)])
+            | Q(username__in=[ref for ref in references if isinstance(ref, str)])
+        )
+        .annotate(is_member=Exists(Membership.objects.filter(user_id=OuterRef("id"), group_id=group.id)))
+        .values_list("id", "username", "is_member")
+    )
+    for user_id, username, is_member in rows:
+        users[user_id] = users[username] = (user_id, username, is_member)
+
+    added, removed, seen, results = [], [], {}, []
+    for operation, refs in (("add", add), ("remove", remove)):
+        for ref in refs:
+            user = users.get(ref)
+            if user is None:
+                results.append({"user": ref, "result": "not_found"})
+                continue
+            user_id, username, is_member = user
+            if user_id in seen:
+                if seen[user_id] != operation:
+                    raise exceptions.ValidationError(f"User {username} cannot be both added and removed.")
+                result = "duplicate"
+            elif operation == "add":
+                result = "already_member" if is_member else "added"
+                if not is_member:
+                    added.append(user_id)
+            else:
+                result = "removed" if is_member else "not_member"
+                if is_member:
+                    removed.append(user_id)
+            seen[user_id] = operation
+            results.append({"user": ref, "id": user_id, "username": username, "result": result})
+
+    if added:
+        # ignore_conflicts: a concurrent request may add the same user
+        Membership.objects.bulk_create(
+            [Membership(user_id=user_id, group_id=group.id) for user_id in added], ignore_conflicts=True
+        )
+    if removed:
+        Membership.objects.filter(group_id=group.id, user_id__in=removed).delete()
+    if added or removed:
+        changed = [*added, *removed]
+
+        def invalidate():
+            invalidate_group_names(*changed)
+            invalidate_user_tokens(*changed)
+
+        # The through table is written directly, so m2m_changed (see signals.py) is not sent. Only once committed:
+        # a request in between would cache the old membership again for ROLE_CACHE_TIMEOUT
+        transaction.on_commit(invalidate)
+    return results
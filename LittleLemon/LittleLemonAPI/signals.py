@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import Category, MenuItem
+from .roles import invalidate_group_names
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .catalog import menu_changed
+from .instrumentation import install_query_recorder
+from .search import index_menu_items, index_category, remove_menu_items
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    user_ids = ()
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        if action in ("post_add", "post_remove", "post_clear"):
+            user_ids = (instance.pk,)
+    elif action == "pre_clear":
+        # group.user_set.clear(): pk_set is not provided, so collect the members before they are removed
+        user_ids = tuple(instance.user_set.values_list("id", flat=True))
+    elif action in ("post_add", "post_remove") and pk_set:
+        # group.user_set.add/remove(...)
+        user_ids = tuple(pk_set)
+    if user_ids:
+        invalidate_group_names(*user_ids)
+        # Cached token snapshots carry the group names as well
+        invalidate_user_tokens(*user_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, created, update_fields, **kwargs):
+    # Logging in only updates last_login, which nothing reads from the snapshot
+    if created or (update_fields and set(update_fields) == {"last_login"}):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Djoser's logout deletes the user's tokens; so does deleting the user
+    invalidate_tokens(instance.key)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def bump_menu_version_on_change(sender, **kwargs):
+    # Other processes notice the new version; this one drops its catalog right away
+    menu_changed()
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, **kwargs):
+    index_menu_items([instance.id])
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    remove_menu_items([instance.id])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, **kwargs):
+    # Items are indexed with their category's title
+    if not created:
+        index_category(instance.id)
+
+
+@receiver(connection_created)
+def count_queries_per_request(sender, connection, **kwargs):
+    install_query_recorder(connection)
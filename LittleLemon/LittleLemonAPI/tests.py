@@ -1,3 +1,1477 @@
-from django.test import TestCase
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import tempfile
+import tracemalloc
+import warnings
+import asyncio
+from asgiref.sync import async_to_sync, sync_to_async
+from io import StringIO
+from unittest import mock
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command, CommandError
+from django.contrib.auth.models import User, Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import Category, MenuItem, Cart, Order, OrderItem, DailySales, MenuItemSales
+from .models import ArchivedOrder, ArchivedOrderItem, OrderEvent, OutboxMessage
+from .roles import get_group_names, is_delivery_crew
+from .services import place_order
+from .dispatcher import dispatch_pending_orders
+from .archiving import archive_cutoff, archive_orders
+from .events import order_event_broker, record_order_events
+from . import outbox
+from .views.events import OrderEventsView
+from .routers import PrimaryReplicaRouter, RoutingState, _routing_state
+from .serializers import MenuItemSerializer, OrderSerializer, CustomerOrderViewSerializer, CartViewSerializer
+from rest_framework.renderers import JSONRenderer
+from . import checks, instrumentation, routers
+from .authentication import local_token_cache
+from .caching import bump_menu_version, get_menu_version, menu_cache_stats
+from .catalog import menu_catalog
+from .utils import GroupEnum, KeysetPagination
 
 # Create your tests here.
+
+
+class LittleLemonTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name=GroupEnum.MANAGER.value)
+        cls.crew_group = Group.objects.create(name=GroupEnum.DELIVERY_CREW.value)
+        cls.manager = User.objects.create_user("manager", password="pass")
+        cls.manager.groups.add(cls.manager_group)
+        cls.crew = User.objects.create_user("crew", password="pass")
+        cls.crew.groups.add(cls.crew_group)
+        cls.customer = User.objects.create_user("customer", password="pass")
+        cls.category = Category.objects.create(title="Mains", slug="mains")
+        cls.menu_item = MenuItem.objects.create(
+            title="Pasta", price="12.50", category=cls.category
+        )
+        for _ in range(3):
+            Order.objects.create(user=cls.customer, delivery_crew=cls.crew, total="12.50")
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        self.client = APIClient()
+
+    def login(self, user: User):
+        # Fresh instance per login so that memoized roles don't leak between requests
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+
+
+class RoleCacheTests(LittleLemonTestCase):
+    def test_order_list_query_count(self):
+        url = reverse("LittleLemonAPI:orders-list") + "?limit=10"
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                self.login(user)
+                # cold: group names + COUNT(*) + page
+                with self.assertNumQueries(3):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.login(user)
+                # warm: roles come from the cache
+                with self.assertNumQueries(2):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_order_retrieve_query_count(self):
+        order = Order.objects.first()
+        url = reverse("LittleLemonAPI:orders-detail", args=[order.id])
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                get_group_names(User.objects.get(pk=user.pk))
+                self.login(user)
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_membership_change_invalidates_cache(self):
+        self.assertFalse(is_delivery_crew(User.objects.get(pk=self.customer.pk)))
+        self.login(self.manager)
+        response = self.client.post(
+            reverse("LittleLemonAPI:delivery-crew-group-list"),
+            {"username": self.customer.username},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(is_delivery_crew(User.objects.get(pk=self.customer.pk)))
+
+        response = self.client.delete(
+            reverse("LittleLemonAPI:delivery-crew-group-detail", args=[self.customer.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(is_delivery_crew(User.objects.get(pk=self.customer.pk)))
+
+
+class CheckoutTests(LittleLemonTestCase):
+    def fill_cart(self, size: int):
+        items = MenuItem.objects.bulk_create(
+            MenuItem(title=f"Item {i}", price=i + 1, category=self.category)
+            for i in range(size)
+        )
+        Cart.objects.bulk_create(
+            Cart(user=self.customer, menu_item=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in items
+        )
+
+    def test_place_order_query_count_is_constant(self):
+        for size in (1, 30):
+            with self.subTest(size=size):
+                self.fill_cart(size)
+                # SAVEPOINT, SELECT cart, INSERT order, INSERT items, 2 report upserts, DELETE cart,
+                # INSERT outbox message, RELEASE
+                with self.assertNumQueries(9):
+                    order = place_order(self.customer)
+                self.assertEqual(OrderItem.objects.filter(order=order).count(), size)
+                self.assertEqual(order.total, sum((i + 1) * 2 for i in range(size)))
+                self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+                MenuItem.objects.exclude(pk=self.menu_item.pk).delete()
+
+    def test_create_order_with_empty_cart(self):
+        self.login(self.customer)
+        response = self.client.post(reverse("LittleLemonAPI:orders-list"))
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuCacheTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        menu_cache_stats.reset()
+
+    def test_cache_hit_and_invalidation_after_price_edit(self):
+        url = reverse("LittleLemonAPI:menu-items-list")
+        self.login(self.customer)
+        self.assertEqual(self.client.get(url).data[0]["price"], "12.50")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]["price"], "12.50")
+        self.assertEqual(menu_cache_stats.hits, 1)
+
+        self.login(self.manager)
+        version = get_menu_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("LittleLemonAPI:menu-items-detail", args=[self.menu_item.id]),
+                {"price": "14.00"},
+            )
+            # Not before the edit is committed, or a concurrent miss could cache the old rows as the new version
+            self.assertEqual(get_menu_version(), version)
+        self.assertEqual(response.status_code, 200)
+
+        self.login(self.customer)
+        self.assertEqual(self.client.get(url).data[0]["price"], "14.00")
+        self.assertEqual(menu_cache_stats.misses, 2)
+
+    def test_normalized_query_params_share_an_entry(self):
+        url = reverse("LittleLemonAPI:menu-items-list")
+        self.login(self.customer)
+        self.client.get(url, {"category": "Mains", "utm": "a"})
+        with self.assertNumQueries(0):
+            self.client.get(url, {"category": " mains ", "utm": "b"})
+        self.assertEqual(menu_cache_stats.hits, 1)
+
+    def test_etag_returns_not_modified(self):
+        url = reverse("LittleLemonAPI:category-list")
+        self.login(self.customer)
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title="Desserts", slug="desserts")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_deploy_check_needs_a_shared_cache(self):
+        self.assertEqual(
+            [warning.id for warning in checks.check_shared_cache_for_menu_version(None)], ["LittleLemonAPI.W002"]
+        )
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://"}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(checks.check_shared_cache_for_menu_version(None), [])
+
+
+class KeysetPaginationTests(LittleLemonTestCase):
+    def walk(self, url: str, params: dict) -> list[dict]:
+        rows = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            rows += response.data["results"]
+            if not response.data["next"]:
+                return rows
+            with self.assertNumQueries(1):
+                response = self.client.get(response.data["next"])
+
+    def test_orders_cursor_walk_matches_default_ordering(self):
+        Order.objects.bulk_create(
+            Order(user=self.customer, total=1, date=date(2025, 1, i % 3 + 1)) for i in range(12)
+        )
+        self.login(self.manager)
+        get_group_names(User.objects.get(pk=self.manager.pk))
+        url = reverse("LittleLemonAPI:orders-list")
+        rows = self.walk(url, {"paginate": "cursor", "limit": 4})
+        self.assertEqual([row["id"] for row in rows], list(Order.objects.values_list("id", flat=True)))
+
+    def test_menu_items_cursor_walk_by_price(self):
+        MenuItem.objects.bulk_create(
+            MenuItem(title=f"Item {i}", price=i % 4, category=self.category) for i in range(9)
+        )
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:menu-items-list")
+        for ordering, expected in (
+            ("price", MenuItem.objects.order_by("price", "id")),
+            ("-price", MenuItem.objects.order_by("-price", "-id")),
+        ):
+            with self.subTest(ordering=ordering):
+                rows = self.walk(url, {"paginate": "cursor", "limit": 2, "ordering": ordering})
+                self.assertEqual([row["id"] for row in rows], [item.id for item in expected])
+
+    def test_page_number_stays_default(self):
+        self.login(self.customer)
+        response = self.client.get(reverse("LittleLemonAPI:orders-list"), {"limit": 2})
+        self.assertEqual(response.data["count"], 3)
+
+    def test_invalid_cursor(self):
+        self.login(self.customer)
+        response = self.client.get(
+            reverse("LittleLemonAPI:orders-list"), {"paginate": "cursor", "cursor": "garbage"}
+        )
+        self.assertEqual(response.status_code, 404)
+        # Well-formed cursors whose values don't fit the ordering columns
+        for url, params, values in (
+            ("menu-items-list", {"ordering": "price"}, ["abc", "x"]),
+            ("menu-items-list", {"ordering": "price"}, [None, 1]),
+            ("orders-list", {}, [20250101, 1]),
+            ("async-orders-list", {}, ["2025-13-01", 1]),
+        ):
+            with self.subTest(url=url, values=values):
+                cursor = KeysetPagination.encode_cursor(values)
+                if url.startswith("async-"):
+                    token = Token.objects.get_or_create(user=self.customer)[0].key
+                    response = async_to_sync(AsyncClient().get)(
+                        reverse(f"LittleLemonAPI:{url}"),
+                        {"paginate": "cursor", "cursor": cursor},
+                        headers={"Authorization": f"Token {token}"},
+                    )
+                else:
+                    response = self.client.get(
+                        reverse(f"LittleLemonAPI:{url}"), {**params, "paginate": "cursor", "cursor": cursor}
+                    )
+                self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(TestCase):
+    def test_order_and_menu_shapes_use_indexes(self):
+        call_command("check_query_plans", stdout=StringIO())
+
+
+class ReportTests(LittleLemonTestCase):
+    def place_order(self, quantity: int) -> Order:
+        Cart.objects.create(
+            user=self.customer, menu_item=self.menu_item, quantity=quantity, unit_price="12.50", price=12.5 * quantity
+        )
+        return place_order(self.customer)
+
+    def assert_consistent(self):
+        call_command("rebuild_reports", check=True, stdout=StringIO())
+
+    def test_incremental_maintenance(self):
+        # The orders created in setUpTestData bypassed the write paths
+        call_command("rebuild_reports", stdout=StringIO())
+        first = self.place_order(2)
+        second = self.place_order(1)
+        self.assert_consistent()
+        day = DailySales.objects.get(date=first.date)
+        self.assertEqual((day.pending_count, day.delivered_count), (5, 0))
+        self.assertEqual(MenuItemSales.objects.get(date=first.date, menu_item=self.menu_item).quantity, 3)
+
+        self.login(self.manager)
+        url = reverse("LittleLemonAPI:orders-detail", args=[first.id])
+        self.assertEqual(self.client.patch(url, {"status": True}).status_code, 200)
+        self.assertEqual(self.client.put(url, {"status": True, "delivery_crew": self.crew.id}).status_code, 200)
+        self.assert_consistent()
+        day.refresh_from_db()
+        self.assertEqual((day.pending_count, day.delivered_count), (4, 1))
+
+        url = reverse("LittleLemonAPI:orders-detail", args=[second.id])
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assert_consistent()
+
+    def test_check_detects_drift(self):
+        self.assertRaises(CommandError, self.assert_consistent)
+        call_command("rebuild_reports", chunk_days=1, stdout=StringIO())
+        self.assert_consistent()
+
+    def test_report_endpoint(self):
+        call_command("rebuild_reports", stdout=StringIO())
+        self.place_order(4)
+        url = reverse("LittleLemonAPI:reports")
+        self.login(self.customer)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.login(self.manager)
+        response = self.client.get(url, {"top": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["totals"]["order_count"], 4)
+        self.assertEqual(response.data["top_items"][0]["title"], "Pasta")
+        self.assertEqual(response.data["top_items"][0]["quantity"], 4)
+        self.assertEqual(self.client.get(url, {"from": "2000-01-01", "to": "2000-01-31"}).data["daily"], [])
+        self.assertEqual(self.client.get(url, {"from": "yesterday"}).status_code, 400)
+
+
+class OrderExportTests(LittleLemonTestCase):
+    def export(self, **params):
+        self.login(self.manager)
+        return self.client.get(reverse("LittleLemonAPI:orders-export"), params)
+
+    def test_csv_and_ndjson_honor_filters(self):
+        order = Order.objects.first()
+        order.status = True
+        order.save()
+        OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=1, unit_price="12.50", price="12.50")
+
+        response = self.export(status="delivered")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{order.id},"))
+
+        response = self.export(status="pending", output="ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["items"], [])
+
+        self.assertEqual(self.export(output="xml").status_code, 400)
+        self.login(self.crew)
+        self.assertEqual(self.client.get(reverse("LittleLemonAPI:orders-export")).status_code, 403)
+
+    def test_asgi_streams_without_buffering(self):
+        for order in Order.objects.all():
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=1, unit_price="1", price="1")
+        token = Token.objects.create(user=self.manager)
+        url = reverse("LittleLemonAPI:orders-export") + "?output=ndjson"
+
+        async def export() -> tuple[bool, bytes]:
+            response = await AsyncClient().get(url, headers={"Authorization": f"Token {token.key}"})
+            return response.is_async, b"".join([chunk async for chunk in response.streaming_content])
+
+        # "StreamingHttpResponse must consume synchronous iterators" when the export is buffered
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            is_async, content = async_to_sync(export)()
+        self.assertTrue(is_async)
+        self.assertEqual(content, b"".join(self.export(output="ndjson").streaming_content))
+
+    def test_memory_stays_bounded(self):
+        # Generated in SQL, bulk_create would spend most of the test building model instances
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 100000) "
+                f"INSERT INTO {Order._meta.db_table} (user_id, status, total, date) "
+                f"SELECT %s, 0, 12.5, %s FROM seq",
+                [self.customer.id, date.today()],
+            )
+            cursor.execute(
+                f"INSERT INTO {OrderItem._meta.db_table} (order_id, menu_item_id, quantity, unit_price, price) "
+                f"SELECT id, %s, 1, 12.5, 12.5 FROM {Order._meta.db_table}",
+                [self.menu_item.id],
+            )
+        response = self.export()
+        rows = 0
+        tracemalloc.start()
+        try:
+            for chunk in response.streaming_content:
+                rows += chunk.count(b"\n")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(rows, 100_004)
+        self.assertLess(peak, 8 * 1024 * 1024)
+
+
+class CartUpsertTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        get_group_names(User.objects.get(pk=self.customer.pk))
+        self.login(self.customer)
+        self.url = reverse("LittleLemonAPI:cart")
+
+    def test_single_add_and_update(self):
+        # Menu catalog load, existing line, INSERT ... ON CONFLICT DO UPDATE
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 2}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["message"], "Item successfully added to cart")
+        self.assertEqual(response.data["result"]["price"], "25.00")
+
+        # The catalog is loaded: the existing line and the upsert are left
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"], "Cart item quantity updated")
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual((cart.quantity, cart.unit_price, cart.price), (3, Decimal("12.50"), Decimal("37.50")))
+        self.assertEqual(response.data["result"]["id"], cart.id)
+
+    def test_batch_add(self):
+        items = MenuItem.objects.bulk_create(
+            MenuItem(title=f"Item {i}", price=i + 1, category=self.category) for i in range(10)
+        )
+        Cart.objects.create(user=self.customer, menu_item=items[0], quantity=5, unit_price=1, price=5)
+        data = [{"menu_item": item.id, "quantity": 2} for item in items]
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["result"]), 10)
+        self.assertEqual(
+            list(Cart.objects.filter(user=self.customer).order_by("menu_item").values_list("quantity", "price")),
+            [(2, Decimal(2 * (i + 1))) for i in range(10)],
+        )
+
+    def test_batch_validation(self):
+        for data in (
+            [],
+            [{"menu_item": self.menu_item.id, "quantity": 1}] * 2,
+            [{"menu_item": 0, "quantity": 1}],
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data, format="json")
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_catalog_follows_menu_changes(self):
+        item = MenuItem.objects.create(title="Soup", price="4.00", category=self.category)
+        self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 1}, format="json")
+        loads = menu_catalog.loads
+
+        self.login(self.manager)
+        detail = reverse("LittleLemonAPI:menu-items-detail", args=[self.menu_item.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.patch(detail, {"price": "14.00"}).status_code, 200)
+        self.login(self.customer)
+        response = self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 2}, format="json")
+        self.assertEqual(response.data["result"]["price"], "28.00")
+        self.assertEqual(menu_catalog.loads, loads + 1)
+
+        # Another process' change only reaches this one through the shared version
+        MenuItem.objects.filter(id=self.menu_item.id).update(price="15.00")
+        response = self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 1}, format="json")
+        self.assertEqual(response.data["result"]["unit_price"], "14.00")
+        bump_menu_version()
+        response = self.client.post(self.url, {"menu_item": self.menu_item.id, "quantity": 1}, format="json")
+        self.assertEqual(response.data["result"]["unit_price"], "15.00")
+
+        # The cart's throttle allows this fifth POST
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(
+            self.client.post(self.url, {"menu_item": item.id, "quantity": 1}, format="json").status_code, 400
+        )
+
+
+class AsyncReadTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+        self.tokens = {
+            user.username: Token.objects.create(user=user).key
+            for user in (self.manager, self.crew, self.customer)
+        }
+        Cart.objects.create(
+            user=self.customer, menu_item=self.menu_item, quantity=2, unit_price="12.50", price="25.00"
+        )
+
+    def async_get(self, url: str, user: User | None = None, **headers):
+        if user is not None:
+            headers["Authorization"] = f"Token {self.tokens[user.username]}"
+        return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    def test_responses_match_sync_views(self):
+        order = Order.objects.first()
+        urls = [
+            ("menu-items-list", "async-menu-items-list", [], "?ordering=-price&limit=1"),
+            ("menu-items-detail", "async-menu-items-detail", [self.menu_item.id], ""),
+            ("orders-list", "async-orders-list", [], "?limit=2&page=2"),
+            ("orders-list", "async-orders-list", [], "?paginate=cursor&limit=2"),
+            ("orders-detail", "async-orders-detail", [order.id], ""),
+            ("orders-list", "async-orders-list", [], "?expand=items"),
+            ("orders-list", "async-orders-list", [], "?fields=id,total&limit=2"),
+            ("menu-items-list", "async-menu-items-list", [], "?fields=title&paginate=cursor&limit=1"),
+        ]
+        for user in (self.manager, self.crew, self.customer):
+            for sync_name, async_name, args, query in urls:
+                with self.subTest(user=user.username, url=async_name, query=query):
+                    self.login(user)
+                    expected = self.client.get(reverse(f"LittleLemonAPI:{sync_name}", args=args) + query)
+                    cache.clear()
+                    response = self.async_get(reverse(f"LittleLemonAPI:{async_name}", args=args) + query, user)
+                    self.assertEqual(response.status_code, 200)
+                    # Pagination links point back at the endpoint that was requested
+                    self.assertEqual(
+                        json.loads(response.content.decode().replace("/api/async/", "/api/")),
+                        expected.json(),
+                    )
+
+        self.login(self.customer)
+        expected = self.client.get(reverse("LittleLemonAPI:cart"))
+        response = self.async_get(reverse("LittleLemonAPI:async-cart"), self.customer)
+        self.assertEqual(response.json(), expected.json())
+
+    def test_menu_cache_and_etag_are_shared(self):
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:menu-items-list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(2):  # token + group names
+            response = self.async_get(
+                reverse("LittleLemonAPI:async-menu-items-list"), self.customer, If_None_Match=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors(self):
+        response = self.async_get(reverse("LittleLemonAPI:async-orders-list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        self.assertEqual(response.json(), {"detail": "Authentication credentials were not provided."})
+        response = self.async_get(reverse("LittleLemonAPI:async-orders-list"), Authorization="Token nope")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"detail": "Invalid token."})
+        response = self.async_get(reverse("LittleLemonAPI:async-cart"), self.manager)
+        self.assertEqual(response.status_code, 403)
+        other = Order.objects.create(user=self.manager, total="1.00")
+        response = self.async_get(reverse("LittleLemonAPI:async-orders-detail", args=[other.id]), self.customer)
+        self.assertEqual(response.status_code, 404)
+        response = self.async_get(reverse("LittleLemonAPI:async-orders-list") + "?limit=2&page=9", self.manager)
+        self.assertEqual(response.status_code, 404)
+        response = self.async_get(reverse("LittleLemonAPI:async-orders-list") + "?fields=id,secret", self.manager)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["fields"])
+
+
+class InstrumentationTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentation.request_metrics.reset()
+
+    def test_server_timing_header(self):
+        get_group_names(User.objects.get(pk=self.manager.pk))
+        self.login(self.manager)
+        response = self.client.get(reverse("LittleLemonAPI:orders-list") + "?limit=10")
+        timings = dict(
+            (part.split(";")[0], part) for part in response["Server-Timing"].split(", ")
+        )
+        self.assertEqual(set(timings), {"db", "serialize", "render", "total"})
+        self.assertIn('desc="2 queries"', timings["db"])
+        serializer_histograms = instrumentation.request_metrics.histograms["littlelemon_request_serialize_seconds"]
+        self.assertGreater(serializer_histograms["OrderView.list"].sum, 0)
+
+        # Queries of async views run in a worker thread and are still attributed to the request
+        token = Token.objects.create(user=self.manager).key
+        response = async_to_sync(AsyncClient().get)(
+            reverse("LittleLemonAPI:async-orders-list") + "?limit=10",
+            headers={"Authorization": f"Token {token}"},
+        )
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+
+    def test_metrics_endpoint(self):
+        self.login(self.customer)
+        self.client.get(reverse("LittleLemonAPI:menu-items-list"))
+        self.client.get(reverse("LittleLemonAPI:orders-list"))
+        self.assertEqual(self.client.get(reverse("LittleLemonAPI:metrics")).status_code, 403)
+
+        admin = User.objects.create_user("admin", is_staff=True)
+        self.login(admin)
+        response = self.client.get(reverse("LittleLemonAPI:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE littlelemon_request_queries histogram", body)
+        self.assertIn('littlelemon_request_duration_seconds_count{view="MenuItemView.list"} 1', body)
+        self.assertIn('littlelemon_request_queries_bucket{view="OrderView.list",le="+Inf"} 1', body)
+        self.assertIn('littlelemon_menu_cache_requests_total{result="miss"}', body)
+        self.assertIn('littlelemon_outbox_messages{state="pending"} 0', body)
+        self.assertIn("littlelemon_outbox_lag_seconds 0.000", body)
+
+    def test_streamed_queries_are_counted_when_the_response_closes(self):
+        self.login(self.manager)
+        response = self.client.get(reverse("LittleLemonAPI:orders-export"))
+        # The manager's roles; the orders and their items are read while the content is streamed
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+        histograms = instrumentation.request_metrics.histograms["littlelemon_request_queries"]
+        self.assertNotIn("OrderView.export", histograms)
+        b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(histograms["OrderView.export"].sum, 3)
+
+    def test_query_budget_warning(self):
+        self.login(self.manager)
+        url = reverse("LittleLemonAPI:orders-list")
+        with mock.patch.object(instrumentation, "QUERY_BUDGET", 1):
+            with self.assertLogs("LittleLemonAPI.instrumentation", "WARNING") as logs:
+                self.client.get(url)
+        self.assertIn("(OrderView.list) ran 2 SQL queries, over the budget of 1", logs.output[0])
+
+
+class OrderExpandTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_item = MenuItem.objects.create(title="Salad", price="8.00", category=cls.category)
+        orders = Order.objects.bulk_create(
+            Order(user=cls.customer, delivery_crew=cls.crew, total="20.50") for _ in range(100)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menu_item=menu_item, quantity=1, unit_price=price, price=price)
+            for order in orders
+            for menu_item, price in ((cls.menu_item, "12.50"), (cls.other_item, "8.00"))
+        )
+
+    def test_list_query_count_is_constant(self):
+        for user in (self.manager, self.crew, self.customer):
+            with self.subTest(user=user.username):
+                get_group_names(User.objects.get(pk=user.pk))
+                self.login(user)
+                # COUNT(*) + page + items with their menu items
+                with self.assertNumQueries(3):
+                    response = self.client.get(
+                        reverse("LittleLemonAPI:orders-list") + "?limit=100&expand=items"
+                    )
+                results = response.json()["results"]
+                self.assertEqual(len(results), 100)
+                self.assertEqual(
+                    sorted(item["menu_item_title"] for item in results[0]["items"]), ["Pasta", "Salad"]
+                )
+                self.assertEqual("delivery_crew" in results[0], user != self.customer)
+
+    def test_retrieve_and_validation(self):
+        order = Order.objects.filter(orderitem__isnull=False).first()
+        get_group_names(User.objects.get(pk=self.customer.pk))
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:orders-detail", args=[order.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url + "?expand=items")
+        self.assertEqual(len(response.json()["items"]), 2)
+        self.assertNotIn("items", self.client.get(url).json())
+        self.assertEqual(self.client.get(url + "?expand=user").status_code, 400)
+
+
+class MenuSearchTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.desserts = Category.objects.create(title="Desserts", slug="desserts")
+        cls.tart = MenuItem.objects.create(title="Lemon tart", price="6.00", category=cls.desserts)
+        cls.salad = MenuItem.objects.create(title="Pasta salad", price="9.00", category=cls.category)
+
+    def search(self, term: str, **params) -> list[str]:
+        self.login(self.customer)
+        response = self.client.get(reverse("LittleLemonAPI:menu-items-list"), {"search": term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.json()]
+
+    def test_prefix_matching_and_ranking(self):
+        self.assertEqual(self.search("pas"), ["Pasta", "Pasta salad"])
+        self.assertEqual(self.search("pas sal"), ["Pasta salad"])
+        self.assertEqual(self.search("Pas", ordering="-price"), ["Pasta", "Pasta salad"])
+        self.assertEqual(self.search("dessert"), ["Lemon tart"])
+        self.assertEqual(self.search("zzz"), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_cursor_pagination_needs_an_ordering(self):
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:menu-items-list")
+        # The rank ordering cannot be seeked on, rather than silently switching to another one
+        response = self.client.get(url, {"search": "pas", "paginate": "cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("paginate", response.json())
+        response = self.client.get(url, {"search": "pas", "paginate": "cursor", "ordering": "-price"})
+        self.assertEqual([item["title"] for item in response.json()["results"]], ["Pasta", "Pasta salad"])
+
+    def test_index_follows_menu_changes(self):
+        # The cached search responses are dropped once each change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tart.title = "Lime pie"
+            self.tart.save()
+        self.assertEqual(self.search("lemon"), [])
+        self.assertEqual(self.search("lime"), ["Lime pie"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desserts.title = "Sweets"
+            self.desserts.save()
+        self.assertEqual(self.search("sweets"), ["Lime pie"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tart.delete()
+        self.assertEqual(self.search("lime"), [])
+
+    def test_rebuild_command(self):
+        # bulk_create bypasses the signals
+        MenuItem.objects.bulk_create([MenuItem(title="Pastrami", price="7.00", category=self.category)])
+        self.assertEqual(self.search("pastr"), [])
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Indexed 4 menu items", out.getvalue())
+        self.assertEqual(self.search("pastr"), ["Pastrami"])
+
+
+class CachedTokenAuthenticationTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_warm_requests_need_no_auth_queries(self):
+        url = reverse("LittleLemonAPI:menu-items-list")
+        # token + user, group names, menu items
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Menu response cached too
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # The shared cache alone is enough
+        local_token_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(2):  # COUNT(*) + page
+            self.assertEqual(self.client.get(reverse("LittleLemonAPI:orders-list") + "?limit=10").status_code, 200)
+
+    def test_snapshot_user(self):
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.json()["username"], "customer")
+        # The password hash is loaded on demand
+        response = self.client.post(
+            "/api/users/set_password/", {"current_password": "pass", "new_password": "N3w-passw0rd!"}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(User.objects.get(pk=self.customer.pk).check_password("N3w-passw0rd!"))
+
+    def test_logout_invalidates(self):
+        url = reverse("LittleLemonAPI:menu-items-list")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post("/token/logout/").status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_deactivation_invalidates(self):
+        url = reverse("LittleLemonAPI:menu-items-list")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        user = User.objects.get(pk=self.customer.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_group_change_invalidates(self):
+        url = reverse("LittleLemonAPI:cart")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.login(self.manager)
+        response = self.client.post(
+            reverse("LittleLemonAPI:delivery-crew-group-list"), {"username": self.customer.username}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        # Customers only
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class SeedScaleTests(TestCase):
+    def seed(self, prefix: str):
+        call_command(
+            "seed_scale",
+            prefix=prefix,
+            customers=30,
+            delivery_crew=3,
+            managers=1,
+            categories=3,
+            menu_items=10,
+            orders=500,
+            days=30,
+            end_date=date(2025, 6, 30),
+            chunk_size=100,
+            stdout=StringIO(),
+        )
+        return list(
+            Order.objects.filter(user__username__startswith=f"{prefix}-")
+            .order_by("id")
+            .values_list("date", "status", "total")
+        )
+
+    def test_volumes_and_determinism(self):
+        orders = self.seed("a")
+        self.assertEqual(len(orders), 500)
+        self.assertTrue(all(date(2025, 6, 1) <= day <= date(2025, 6, 30) for day, _, _ in orders))
+        self.assertEqual(User.objects.filter(groups__name=GroupEnum.DELIVERY_CREW.value).count(), 3)
+        self.assertEqual(MenuItem.objects.count(), 10)
+        self.assertTrue(Cart.objects.exists())
+        for order in Order.objects.prefetch_related("orderitem_set")[:50]:
+            self.assertEqual(order.total, sum(item.price for item in order.orderitem_set.all()))
+        call_command("rebuild_reports", check=True, stdout=StringIO())
+
+        self.assertEqual(self.seed("b"), orders)
+        with self.assertRaises(CommandError):
+            self.seed("a")
+
+
+class MenuImportTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.manager)
+
+    def test_json_import_upserts_and_reports_errors(self):
+        rows = [
+            {"title": "Pasta", "price": "13.00", "category": "mains"},
+            {"title": "Tiramisu", "price": "7.50", "featured": True, "category": "Desserts"},
+            {"title": "Gelato", "price": "-1", "category": "Desserts"},
+            {"title": "Tiramisu", "price": "8.00", "category": "Desserts"},
+            {"title": "Soup", "price": "5.00", "category": "Mains"},
+        ]
+        url = reverse("LittleLemonAPI:menu-items-import-items")
+        # roles, categories, new categories + their ids, existing titles, upsert, reindex (2),
+        # savepoint + release
+        with self.assertNumQueries(10):
+            response = self.client.post(url, rows, format="json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["created"], body["updated"]), (2, 1))
+        self.assertEqual([error["row"] for error in body["errors"]], [3, 4])
+        self.assertIn("price", body["errors"][0]["errors"])
+
+        self.assertEqual(MenuItem.objects.get(title="Pasta").price, Decimal("13.00"))
+        tiramisu = MenuItem.objects.select_related("category").get(title="Tiramisu")
+        self.assertTrue(tiramisu.featured)
+        self.assertEqual(tiramisu.category.title, "Desserts")
+        self.assertEqual(MenuItem.objects.get(title="Soup").category, self.category)
+        # The menu cache and the search index follow
+        self.assertEqual(
+            [item["title"] for item in self.client.get(reverse("LittleLemonAPI:menu-items-list"), {"search": "tira"}).json()],
+            ["Tiramisu"],
+        )
+
+    def test_categories_match_titles_case_insensitively(self):
+        rows = [
+            {"title": "Soup", "price": "5.00", "category": "MAINS"},
+            {"title": "Tiramisu", "price": "7.50", "category": "desserts"},
+            {"title": "Gelato", "price": "4.00", "category": "Desserts"},
+        ]
+        response = self.client.post(reverse("LittleLemonAPI:menu-items-import-items"), rows, format="json")
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual(MenuItem.objects.get(title="Soup").category, self.category)
+        self.assertEqual(Category.objects.filter(title__iexact="desserts").count(), 1)
+        desserts = Category.objects.get(title__iexact="desserts")
+        self.assertEqual(MenuItem.objects.filter(category=desserts).count(), 2)
+
+    def test_round_trip(self):
+        MenuItem.objects.create(title='Chef\'s "special", hot', price="21.00", featured=True, category=self.category)
+        for output in ("csv", "json"):
+            with self.subTest(output=output):
+                url = reverse("LittleLemonAPI:menu-items-export")
+                response = self.client.get(url, {"output": output})
+                exported = b"".join(response.streaming_content)
+                with transaction.atomic():
+                    MenuItem.objects.all().delete()
+                    Category.objects.all().delete()
+                    upload = SimpleUploadedFile(f"menu.{output}", exported)
+                    response = self.client.post(
+                        reverse("LittleLemonAPI:menu-items-import-items"), {"file": upload}, format="multipart"
+                    )
+                    self.assertEqual(response.json(), {"created": 2, "updated": 0, "errors": []})
+                    reexported = b"".join(self.client.get(url, {"output": output}).streaming_content)
+                    self.assertEqual(
+                        sorted(reexported.decode().splitlines()), sorted(exported.decode().splitlines())
+                    )
+                    transaction.set_rollback(True)
+
+    def test_commands(self):
+        out = StringIO()
+        call_command("export_menu", "--output", "json", stdout=out)
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            file.write(out.getvalue().replace("12.50", "11.00"))
+            file.flush()
+            out = StringIO()
+            call_command("import_menu", file.name, stdout=out)
+        self.assertIn("0 menu items created, 1 updated, 0 rows skipped", out.getvalue())
+        self.assertEqual(MenuItem.objects.get(title="Pasta").price, Decimal("11.00"))
+
+
+class OrderBulkUpdateTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        get_group_names(User.objects.get(pk=self.manager.pk))
+        self.login(self.manager)
+        self.url = reverse("LittleLemonAPI:orders-bulk")
+        self.other_crew = User.objects.create_user("crew2")
+        self.other_crew.groups.add(self.crew_group)
+        call_command("rebuild_reports", stdout=StringIO())
+
+    def test_update_by_ids(self):
+        ids = list(Order.objects.values_list("id", flat=True))
+        # crew check, savepoint, SELECT, UPDATE, report upsert, change events, release
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                self.url,
+                {"ids": ids[:2] + [9999], "status": True, "delivery_crew": self.other_crew.id},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": ids[0], "result": "updated"},
+                {"id": ids[1], "result": "updated"},
+                {"id": 9999, "result": "not_found"},
+            ],
+        )
+        self.assertEqual(
+            Order.objects.filter(status=True, delivery_crew=self.other_crew).count(), 2
+        )
+        sales = DailySales.objects.get()
+        self.assertEqual((sales.pending_count, sales.delivered_count), (1, 2))
+        call_command("rebuild_reports", check=True, stdout=StringIO())
+
+    def test_update_by_filter(self):
+        Order.objects.filter(id=Order.objects.first().id).update(status=True)
+        response = self.client.post(
+            self.url, {"filter": {"status": "pending"}, "delivery_crew": None}, format="json"
+        )
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 2)
+
+    def test_validation(self):
+        order_id = Order.objects.first().id
+        for body in (
+            {"ids": [order_id], "delivery_crew": self.customer.id},  # not in the delivery crew
+            {"ids": [order_id]},
+            {"ids": [order_id], "filter": {"status": "pending"}, "status": True},
+            {"filter": {}, "status": True},
+            {"filter": {"date": "yesterday"}, "status": True},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(self.url, body, format="json").status_code, 400)
+        self.login(self.crew)
+        response = self.client.post(self.url, {"ids": [order_id], "status": True}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class GroupMembershipBulkTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("LittleLemonAPI:delivery-crew-group-bulk")
+        self.login(self.manager)
+
+    def test_onboarding_query_count(self):
+        users = User.objects.bulk_create(User(username=f"driver{i}") for i in range(50))
+        payload = {"add": [user.username for user in users[:25]] + [user.id for user in users[25:]]}
+        # manager's roles, group, users with membership, INSERT, token keys after commit (+ savepoint and release)
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["added"], 50)
+        self.assertEqual(self.crew_group.user_set.count(), 51)
+
+    def test_conflicts_and_removal(self):
+        get_group_names(User.objects.get(pk=self.customer.pk))
+        payload = {
+            "add": [self.customer.username, self.crew.id, "nobody", self.customer.id],
+            "remove": [self.manager.username],
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [result["result"] for result in response.data["results"]],
+            ["added", "already_member", "not_found", "duplicate", "not_member"],
+        )
+        # Cached roles are dropped although no m2m_changed signal was sent, once the change is committed
+        self.assertFalse(is_delivery_crew(User.objects.get(pk=self.customer.pk)))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(is_delivery_crew(User.objects.get(pk=self.customer.pk)))
+
+        response = self.client.post(self.url, {"remove": [self.customer.id, self.crew.username]}, format="json")
+        self.assertEqual(response.data["removed"], 2)
+        self.assertFalse(self.crew_group.user_set.exists())
+
+    def test_validation(self):
+        for payload in ({}, {"add": [True]}, {"add": [self.crew.id], "remove": [self.crew.username]}):
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload, format="json")
+                self.assertEqual(response.status_code, 400)
+        self.assertTrue(self.crew_group.user_set.exists())
+        self.login(self.crew)
+        self.assertEqual(self.client.post(self.url, {"add": ["customer"]}, format="json").status_code, 403)
+
+
+class ValuesSerializerTests(LittleLemonTestCase):
+    def assertSameJson(self, data, serializer_class, queryset):
+        render = JSONRenderer().render
+        self.assertEqual(render(data), render(serializer_class(queryset, many=True).data))
+
+    def test_same_json_as_model_serializers(self):
+        MenuItem.objects.create(title="Soup", price="4.05", featured=True, category=self.category)
+        Order.objects.create(user=self.customer, total="7.10")
+        Cart.objects.create(user=self.customer, menu_item=self.menu_item, quantity=2, unit_price="12.50", price="25.00")
+        self.login(self.manager)
+        response = self.client.get(reverse("LittleLemonAPI:menu-items-list") + "?ordering=price&limit=10")
+        self.assertSameJson(response.data["results"], MenuItemSerializer, MenuItem.objects.order_by("price"))
+        response = self.client.get(reverse("LittleLemonAPI:orders-list"))
+        self.assertSameJson(response.data, OrderSerializer, Order.objects.all())
+        self.login(self.customer)
+        response = self.client.get(reverse("LittleLemonAPI:orders-list") + "?paginate=cursor&limit=2")
+        self.assertSameJson(response.data["results"], CustomerOrderViewSerializer, Order.objects.all()[:2])
+        response = self.client.get(response.data["next"])
+        self.assertSameJson(response.data["results"], CustomerOrderViewSerializer, Order.objects.all()[2:4])
+        response = self.client.get(reverse("LittleLemonAPI:cart"))
+        self.assertSameJson(response.data, CartViewSerializer, Cart.objects.all())
+
+    def test_sparse_fieldsets(self):
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:menu-items-list") + "?fields=price,title&paginate=cursor"
+        with self.assertNumQueries(1) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.data["results"], [{"title": "Pasta", "price": "12.50"}])
+        # The ordering columns (price, id) are selected for the cursor, not the category
+        sql = context.captured_queries[0]["sql"]
+        self.assertNotIn("category", sql)
+        self.assertNotIn("featured", sql)
+
+        response = self.client.get(reverse("LittleLemonAPI:orders-list") + "?fields=total,delivery_crew")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("delivery_crew", str(response.data["fields"]))
+
+
+class DispatcherTests(LittleLemonTestCase):
+    def test_balances_by_open_orders(self):
+        # self.crew already has the 3 pending fixture orders
+        other_crew = User.objects.create_user("crew2")
+        other_crew.groups.add(self.crew_group)
+        inactive_crew = User.objects.create_user("crew3", is_active=False)
+        inactive_crew.groups.add(self.crew_group)
+        Order.objects.create(user=self.customer, delivery_crew=other_crew, status=True, total="1.00")
+        orders = Order.objects.bulk_create(Order(user=self.customer, total="1.00") for _ in range(5))
+
+        # open-order counts, unassigned orders, UPDATE, change events (+ savepoint and release)
+        with self.assertNumQueries(6):
+            assignments = dispatch_pending_orders(batch_size=10)
+        self.assertEqual(len(assignments[other_crew.id]), 4)
+        self.assertEqual(assignments[self.crew.id], [orders[3].id])
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 0)
+        self.assertEqual(dispatch_pending_orders(batch_size=10), {})
+
+    def test_batches_and_command(self):
+        Order.objects.bulk_create(Order(user=self.customer, total="1.00") for _ in range(5))
+        self.assertEqual(sum(map(len, dispatch_pending_orders(batch_size=2).values())), 2)
+        order = Order.objects.filter(delivery_crew__isnull=True).first()
+        out = StringIO()
+        call_command("dispatch_orders", "--once", "--batch-size", "2", stdout=out)
+        self.assertIn("Assigned 2 orders", out.getvalue())
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.delivery_crew, self.crew)
+
+
+class OrderArchiveTests(LittleLemonTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        old = archive_cutoff(120)
+        cls.old_orders = Order.objects.bulk_create(
+            Order(user=cls.customer, delivery_crew=cls.crew, status=True, total="12.50", date=old) for _ in range(3)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menu_item=cls.menu_item, quantity=1, unit_price="12.50", price="12.50")
+            for order in cls.old_orders
+        )
+        # Old but still pending, and recent but delivered: both stay live
+        Order.objects.create(user=cls.customer, total="1.00", date=old)
+        Order.objects.create(user=cls.customer, status=True, total="1.00")
+
+    def test_archive_keeps_ids_and_reports(self):
+        call_command("rebuild_reports", stdout=StringIO())
+        self.assertEqual(list(archive_orders(archive_cutoff(), batch_size=2)), [2, 1])
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list("id", flat=True)), [order.id for order in self.old_orders]
+        )
+        self.assertEqual(ArchivedOrderItem.objects.count(), 3)
+        self.assertFalse(Order.objects.filter(id__in=[order.id for order in self.old_orders]).exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(list(archive_orders(archive_cutoff())), [])
+        call_command("rebuild_reports", check=True, stdout=StringIO())
+
+    def test_include_archived(self):
+        archived_ids = [order.id for order in self.old_orders]
+        out = StringIO()
+        call_command("archive_orders", "--pause", "0", stdout=out)
+        self.assertIn("Archived 3 delivered orders", out.getvalue())
+
+        self.login(self.customer)
+        url = reverse("LittleLemonAPI:orders-list")
+        self.assertEqual(self.client.get(url, {"limit": 50}).json()["count"], 5)
+        response = self.client.get(url, {"limit": 50, "include_archived": "true", "expand": "items"})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 8)
+        archived = [order for order in results if order["id"] in archived_ids]
+        self.assertEqual([item["menu_item_title"] for order in archived for item in order["items"]], ["Pasta"] * 3)
+
+        detail = reverse("LittleLemonAPI:orders-detail", args=[archived_ids[0]])
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        self.assertEqual(self.client.get(detail, {"include_archived": "1"}).json()["total"], "12.50")
+
+        self.login(self.manager)
+        # Archived orders are read-only
+        self.assertEqual(self.client.patch(detail + "?include_archived=true", {"status": False}).status_code, 404)
+
+
+class OrderEventsTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        # The poller thread would query the test database outside of the test's transaction, and the rolled back
+        # event ids are used again by the next test
+        for patcher in (
+            mock.patch.object(order_event_broker, "poll_interval", 0),
+            mock.patch.object(order_event_broker, "_forwarded", OrderedDict()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.order = Order.objects.filter(user=self.customer).first()
+
+    def open_stream(self, user: User, last_event_id: int | None = None):
+        token, _ = Token.objects.get_or_create(user=user)
+        return OrderEventsView().stream(user.id, token.key, get_group_names(user), last_event_id)
+
+    def test_update_is_streamed_to_the_orders_watchers(self):
+        other_crew = User.objects.create_user("crew2")
+        other_crew.groups.add(self.crew_group)
+        other_customer = User.objects.create_user("customer2")
+        watchers = [self.customer, self.crew, other_crew, self.manager, other_customer]
+
+        def reassign():
+            self.login(self.manager)
+            url = reverse("LittleLemonAPI:orders-detail", args=[self.order.id])
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {"delivery_crew": other_crew.id}, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        streams = [self.open_stream(user) for user in watchers]
+
+        async def scenario():
+            for stream in streams:
+                self.assertEqual(await anext(stream), "retry: 3000\n\n")
+            self.assertEqual(order_event_broker.subscriber_count, len(watchers))
+            await sync_to_async(reassign)()
+            messages = [await asyncio.wait_for(anext(stream), 1) for stream in streams[:-1]]
+            with self.assertRaises(TimeoutError):
+                await asyncio.wait_for(anext(streams[-1]), 0.1)
+            for stream in streams:
+                await stream.aclose()
+            return messages
+
+        messages = async_to_sync(scenario)()
+        event = OrderEvent.objects.get()
+        self.assertEqual(
+            (event.order_id, event.delivery_crew_id, event.previous_delivery_crew_id),
+            (self.order.id, other_crew.id, self.crew.id),
+        )
+        self.assertEqual(
+            messages[0], f'id: {event.id}\nevent: order\ndata: {{"id":{self.order.id},"status":false}}\n\n'
+        )
+        for message in messages[1:]:
+            self.assertIn(f'"delivery_crew":{other_crew.id}', message)
+        self.assertEqual(order_event_broker.subscriber_count, 0)
+
+    def test_resume_and_catch_up_from_the_log(self):
+        other_order = Order.objects.create(user=self.manager, total="1.00")
+        with self.captureOnCommitCallbacks() as callbacks:
+            record_order_events(
+                OrderEvent(order_id=order.id, customer_id=order.user_id, status=True)
+                for order in [self.order] * 3 + [other_order] + [self.order] * 2
+            )
+        events = list(OrderEvent.objects.order_by("id"))
+
+        async def read(stream, count: int) -> list[str]:
+            messages = [await anext(stream) for _ in range(count)]
+            await stream.aclose()
+            return messages
+
+        async def resume(stream):
+            await anext(stream)
+            # The queued copies of the events replayed from the log are skipped
+            for callback in callbacks:
+                callback()
+            return await read(stream, 4)
+
+        messages = async_to_sync(resume)(self.open_stream(self.customer, last_event_id=events[0].id))
+        self.assertEqual(
+            [message.split("\n")[0] for message in messages],
+            [f"id: {event.id}" for event in events[1:3] + events[4:]],
+        )
+
+        async def lag(stream):
+            await anext(stream)
+            with mock.patch.object(asyncio.Queue, "put_nowait", side_effect=asyncio.QueueFull):
+                order_event_broker._offer(list(order_event_broker._subscriptions), events)
+            return await read(stream, 5)
+
+        messages = async_to_sync(lag)(self.open_stream(self.customer))
+        self.assertEqual(len(set(messages)), 5)
+        self.assertEqual(order_event_broker.subscriber_count, 0)
+
+        out = StringIO()
+        call_command("prune_order_events", "--older-than", "0", stdout=out)
+        self.assertIn("Deleted 6 order events", out.getvalue())
+
+    def test_stream_ends_when_authorization_changes(self):
+        async def drain(stream) -> list[str]:
+            return [message async for message in stream]
+
+        async def heartbeats(stream) -> list[str]:
+            messages = [await anext(stream)]
+            with mock.patch("LittleLemonAPI.views.events.ORDER_EVENTS_HEARTBEAT", 0):
+                messages.append(await anext(stream))
+                with self.captureOnCommitCallbacks(execute=True):
+                    await sync_to_async(change)()
+                messages += await asyncio.wait_for(drain(stream), 5)
+            return messages
+
+        for name, change in [
+            ("roles", lambda: self.customer.groups.add(self.crew_group)),
+            ("logout", lambda: Token.objects.filter(user=self.customer).delete()),
+        ]:
+            with self.subTest(name):
+                cache.clear()
+                local_token_cache.clear()
+                stream = self.open_stream(self.customer)
+                messages = async_to_sync(heartbeats)(stream)
+                self.assertEqual(messages, ["retry: 3000\n\n", ": keep-alive\n\n"])
+                self.assertEqual(order_event_broker.subscriber_count, 0)
+                self.customer.groups.clear()
+
+    def test_wsgi_requests_are_refused(self):
+        token = Token.objects.create(user=self.customer)
+        response = Client().get(
+            reverse("LittleLemonAPI:async-order-events"), headers={"Authorization": f"Token {token.key}"}
+        )
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(order_event_broker.subscriber_count, 0)
+
+    def test_idle_subscribers_load(self):
+        out = StringIO()
+        call_command("bench_sse", "--subscribers", "50", "--customers", "5", stdout=out)
+        self.assertIn("50 of 50 events delivered, 0 subscriptions left", out.getvalue())
+        per_connection = float(out.getvalue().split(" KiB per idle connection")[0].rsplit(" ", 1)[1])
+        self.assertLess(per_connection, 64)
+
+
+class OutboxTests(LittleLemonTestCase):
+    def test_receipt_is_sent_by_worker(self):
+        self.customer.email = "customer@example.com"
+        self.customer.save()
+        Cart.objects.create(user=self.customer, menu_item=self.menu_item, quantity=2, unit_price="12.50", price="25")
+        order = place_order(self.customer)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.topic, message.payload), ("order.placed", {"order_id": order.id}))
+        self.assertIn('littlelemon_outbox_messages{state="pending"} 1', outbox.export_outbox_metrics())
+        self.assertEqual(len(mail.outbox), 0)
+
+        out = StringIO()
+        call_command("run_outbox", "--once", stdout=out)
+        self.assertIn("Processed 1 outbox messages", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["customer@example.com"])
+        self.assertIn("2 x Pasta: 25.00", mail.outbox[0].body)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_receipt_is_sent_once(self):
+        self.customer.email = "customer@example.com"
+        self.customer.save()
+        order = Order.objects.filter(user=self.customer).first()
+        outbox.enqueue("order.placed", {"order_id": order.id})
+        outbox.process_batch()
+        # Delivered again, as after a worker died before acknowledging it
+        outbox.enqueue("order.placed", {"order_id": order.id})
+        outbox.process_batch()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(outbox.effect_done(f"receipt:{order.id}"))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_lease_is_renewed_per_message(self):
+        first, second = outbox.enqueue("test.slow", {"n": 1}), outbox.enqueue("test.slow", {"n": 2})
+        calls = []
+
+        def slow(payload: dict):
+            calls.append(payload["n"])
+            message = OutboxMessage.objects.get(id=first.id)
+            self.assertGreater(message.available_at, timezone.now() + timedelta(seconds=outbox.OUTBOX_LEASE - 5))
+            # The batch's lease ran out meanwhile, and another worker claimed the second message
+            OutboxMessage.objects.filter(id=second.id).update(available_at=timezone.now())
+            self.assertEqual([message.id for message in outbox.claim()], [second.id])
+
+        with mock.patch.dict(outbox.handlers, {"test.slow": slow}), self.assertLogs("LittleLemonAPI.outbox"):
+            self.assertEqual(outbox.process_batch(), 2)
+        self.assertEqual(calls, [1])
+        # Left to the worker that holds its lease now
+        self.assertEqual(list(OutboxMessage.objects.values_list("id", "attempts")), [(second.id, 2)])
+
+    def test_claimed_message_is_leased(self):
+        outbox.enqueue("order.placed", {"order_id": 0})
+        self.assertEqual(len(outbox.claim()), 1)
+        self.assertEqual(outbox.claim(), [])
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.claim()[0].attempts, 2)
+
+    def test_failures_back_off_then_die(self):
+        message = outbox.enqueue("test.failing", {})
+        failing = mock.Mock(side_effect=ValueError("boom"))
+        with (
+            mock.patch.dict(outbox.handlers, {"test.failing": failing}),
+            mock.patch.object(outbox, "OUTBOX_MAX_ATTEMPTS", 2),
+            self.assertLogs("LittleLemonAPI.outbox", "ERROR"),
+        ):
+            self.assertEqual(outbox.process_batch(), 1)
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+            self.assertFalse(message.dead)
+            self.assertGreater(message.available_at, timezone.now())
+            self.assertIn("ValueError: boom", message.last_error)
+            # Not due yet
+            self.assertEqual(outbox.process_batch(), 0)
+
+            OutboxMessage.objects.update(available_at=timezone.now())
+            self.assertEqual(outbox.process_batch(), 1)
+        message.refresh_from_db()
+        self.assertTrue(message.dead)
+        self.assertEqual(failing.call_count, 2)
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), 0)
+        self.assertIn('littlelemon_outbox_messages{state="dead"} 1', outbox.export_outbox_metrics())
+
+    def test_unknown_topic_fails(self):
+        message = outbox.enqueue("test.unknown", {})
+        with self.assertLogs("LittleLemonAPI.outbox", "ERROR"):
+            outbox.process_batch()
+        message.refresh_from_db()
+        self.assertIn("No handler for 'test.unknown'", message.last_error)
+
+
+class EndpointBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+
+    def test_query_counts_match_baseline(self):
+        out = StringIO()
+        call_command("bench_endpoints", "--repeat", "1", "--warmup", "1", "--queries-only", stdout=out)
+        self.assertIn("No regressions", out.getvalue())
+        self.assertIn("POST cart (5 lines)", out.getvalue())
+        # Fewer queries than the baseline is not a regression, but a stale baseline
+        self.assertNotIn("update the baseline", out.getvalue())
+
+    def test_regressions_are_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_path = f"{directory}/baseline.json"
+            options = ["--baseline", baseline_path, "--match", "POST orders-list", "--repeat", "2"]
+            call_command("bench_endpoints", *options, "--update-baseline", stdout=StringIO())
+            with open(baseline_path) as file:
+                baseline = json.load(file)
+            self.assertEqual(len(baseline["endpoints"]), 3)
+            baseline["endpoints"]["POST orders-list as customer"]["queries"] -= 2
+            baseline["endpoints"]["POST orders-list as crew"]["status"] = 201
+            with open(baseline_path, "w") as file:
+                json.dump(baseline, file)
+
+            with self.assertRaises(CommandError) as raised:
+                call_command("bench_endpoints", *options, "--queries-only", stdout=StringIO())
+        message = str(raised.exception)
+        self.assertIn("2 regression(s)", message)
+        self.assertIn("POST orders-list as customer: queries 7 -> 9 (allowed 7)", message)
+        self.assertIn("POST orders-list as crew: status 201 -> 403", message)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica mirrors the primary in tests; TransactionTestCase, as TestCase keeps a transaction open on
+    # the primary, which routes every read there
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        patcher = mock.patch.object(routers, "REPLICA_READS", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customer = User.objects.create_user("customer", password="pass")
+        self.category = Category.objects.create(title="Mains", slug="mains")
+        self.menu_item = MenuItem.objects.create(title="Pasta", price="12.50", category=self.category)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, url):
+        token = Token.objects.get_or_create(user=self.customer)[0]
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                if "/async/" in url:
+                    headers = {"Authorization": f"Token {token.key}"}
+                    response = async_to_sync(AsyncClient().get)(url, headers=headers)
+                else:
+                    response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_router(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(MenuItem), "default")
+        token = _routing_state.set(RoutingState(replica=True))
+        try:
+            self.assertEqual(router.db_for_read(MenuItem), "replica")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(MenuItem), "default")
+            self.assertEqual(router.db_for_write(MenuItem), "default")
+            # Read-your-writes: the rest of the request stays on the primary
+            self.assertEqual(router.db_for_read(MenuItem), "default")
+        finally:
+            _routing_state.reset(token)
+
+    def test_safe_reads_use_replica(self):
+        # Authentication and permissions (roles) read from the primary, the view from the replica
+        self.assertEqual(self.get(reverse("LittleLemonAPI:orders-list")), (1, 1))
+        # Menu cache misses are read from the primary, the responses are cached under the current menu version
+        self.assertEqual(self.get(reverse("LittleLemonAPI:menu-items-list")), (1, 0))
+        self.assertEqual(self.get(reverse("LittleLemonAPI:category-list")), (1, 0))
+        self.assertEqual(self.get(reverse("LittleLemonAPI:menu-items-list")), (0, 0))
+        # The token is looked up on the primary
+        cache.clear()
+        local_token_cache.clear()
+        self.assertEqual(self.get(reverse("LittleLemonAPI:async-orders-list")), (2, 1))
+
+    def test_replica_reads_are_opt_in(self):
+        # Until sync_replica ran, the replica doesn't even have the schema
+        with mock.patch.object(routers, "REPLICA_READS", False):
+            self.assertEqual(self.get(reverse("LittleLemonAPI:orders-list")), (2, 0))
+
+    def test_replica_reads_need_a_shared_cache(self):
+        self.assertEqual(
+            [warning.id for warning in checks.check_shared_cache_for_replica_reads(None)], ["LittleLemonAPI.W001"]
+        )
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://"}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(checks.check_shared_cache_for_replica_reads(None), [])
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.client.post(
+            reverse("LittleLemonAPI:cart"), {"menu_item": self.menu_item.id, "quantity": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post(reverse("LittleLemonAPI:orders-list")).status_code, 201)
+        primary, replica = self.get(reverse("LittleLemonAPI:orders-list"))
+        self.assertEqual(replica, 0)
+        cache.clear()
+        primary, replica = self.get(reverse("LittleLemonAPI:orders-list"))
+        self.assertGreater(replica, 0)
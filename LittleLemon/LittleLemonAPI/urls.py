@@ -16,4 +16,18 @@ router.register(r"orders", OrderView, basename="orders")
 urlpatterns = [
     path("", include("djoser.urls")),
     path("cart/menu-items/", CartView.as_view(), name="cart"),
+    path("reports/", ReportView.as_view(), name="reports"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    # Native async versions of the read endpoints, for ASGI deployments
+    path("async/menu-items/", AsyncMenuItemsView.as_view(), name="async-menu-items-list"),
+    path(
+        "async/menu-items/<str:menuItem>/",
+        AsyncMenuItemsView.as_view(),
+        name="async-menu-items-detail",
+    ),
+    path("async/cart/menu-items/", AsyncCartView.as_view(), name="async-cart"),
+    path("async/orders/", AsyncOrdersView.as_view(), name="async-orders-list"),
+    # Server-Sent Events for order status and delivery crew changes (views/events.py)
+    path("async/orders/events/", OrderEventsView.as_view(), name="async-order-events"),
+    path("async/orders/<str:orderId>/", AsyncOrdersView.as_view(), name="async-orders-detail"),
 ] + router.urls
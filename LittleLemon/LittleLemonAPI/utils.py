@@ -1,5 +1,13 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from enum import StrEnum
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
 from rest_framework.request import Request, HttpRequest
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status, exceptions, pagination
 
 type DrfRequest = Request | HttpRequest
@@ -18,4 +26,175 @@ class ConflictFound(exceptions.APIException):
 
 class CustomPageNumberPagination(pagination.PageNumberPagination):
     page_size_query_param = "limit"
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request: DrfRequest, view=None):
+        """Async counterpart of paginate_queryset: the count and the page rows are queried with the async ORM"""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached property: set, it is not queried again (synchronously)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise exceptions.NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        # The page slices the queryset lazily
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination that seeks with a WHERE clause on the ordering columns instead of OFFSET,
+    and never runs COUNT(*), so the cost of a page does not depend on how deep it is.
+
+    The ordering comes from the queryset (OrderingFilter / Meta.ordering), falling back to the view's
+    cursor_ordering; the primary key is appended as a tie-breaker when it is missing.
+    The cursor encodes the ordering values of the last row of the previous page.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = 10
+    page_size_query_param = "limit"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+    unsupported_ordering_message = "Cursor pagination needs an explicit ?ordering= for ranked search results"
+
+    def get_ordering(self, queryset, view) -> list[str]:
+        if queryset.query.extra_order_by:
+            # e.g. the search rank (search.py), a computed column that a cursor cannot seek on
+            raise exceptions.ValidationError({"paginate": self.unsupported_ordering_message})
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            ordering = list(getattr(view, "cursor_ordering", []))
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            descending = bool(ordering) and ordering[-1].startswith("-")
+            ordering.append("-id" if descending else "id")
+        return ordering
+
+    def get_page_size(self, request: DrfRequest) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        return urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, request: DrfRequest, model) -> list | None:
+        """The cursor's values converted by the model fields of the ordering, so bad values are a 404, not a 500"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        converted = []
+        for field_name, value in zip(self.fields, values):
+            field = model._meta.pk if field_name == "pk" else model._meta.get_field(field_name)
+            try:
+                value = field.to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise exceptions.NotFound(self.invalid_cursor_message)
+            # The ordering columns are not nullable, and None cannot be compared with
+            if value is None:
+                raise exceptions.NotFound(self.invalid_cursor_message)
+            converted.append(value)
+        return converted
+
+    def get_page_queryset(self, queryset, request: DrfRequest, view=None):
+        """Ordered and seeked queryset sliced to one row more than the page, so set_page can tell if there is a next one"""
+        self.request = request
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        queryset = queryset.order_by(*self.ordering)
+
+        values = self.decode_cursor(request, queryset.model)
+        if values is not None:
+            fields = self.fields
+            # (a, b) after (x, y)  ->  a > x OR (a = x AND b > y), with < for descending fields
+            seek = Q()
+            for i, field in enumerate(self.ordering):
+                lookup = "lt" if field.startswith("-") else "gt"
+                condition = Q(**{f"{fields[i]}__{lookup}": values[i]})
+                for j in range(i):
+                    condition &= Q(**{fields[j]: values[j]})
+                seek |= condition
+            # The redundant bound on the leading column lets the database seek with an index range
+            leading = "lte" if self.ordering[0].startswith("-") else "gte"
+            queryset = queryset.filter(Q(**{f"{fields[0]}__{leading}": values[0]}), seek)
+
+        self.page_size = self.get_page_size(request)
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, rows: list) -> list:
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if self.has_next:
+            last = self.page[-1]
+            # Rows are model instances, or dicts from QuerySet.values() (see fast_serializers.py)
+            if isinstance(last, dict):
+                values = [last[field] for field in self.fields]
+            else:
+                values = [getattr(last, "pk" if field == "pk" else field) for field in self.fields]
+            self.next_cursor = self.encode_cursor(values)
+        return self.page
+
+    def paginate_queryset(self, queryset, request: DrfRequest, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request: DrfRequest, view=None):
+        """Async counterpart of paginate_queryset, for the native async views"""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request, view)])
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class PaginationModeMixin:
+    """
+    Lets the client pick the pagination style with ?paginate=cursor.
+    Page-number pagination (pagination_class) stays the default.
+    """
+
+    cursor_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("paginate") == "cursor":
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
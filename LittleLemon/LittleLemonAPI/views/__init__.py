@@ -1,4 +1,8 @@
 from .menu_items import CategoryView, MenuItemView
 from .groups import ManagerGroupView, DeliveryCrewGroupView
 from .cart import CartView
-from .orders import OrderView
\ No newline at end of file
+from .orders import OrderView
+from .reports import ReportView
+from .metrics import MetricsView
+from .async_reads import AsyncMenuItemsView, AsyncCartView, AsyncOrdersView
+from .events import OrderEventsView
@@ -0,0 +1,198 @@
+"""
+Native async handlers for the read-heavy endpoints, mounted under /api/async/ next to the DRF views.
+
+DRF views are synchronous, so under an ASGI server every request to them is run in a worker thread
+(sync_to_async). These views stay on the event loop: the token is checked with
+CachedTokenAuthentication.aauthenticate, the user's roles are loaded with roles.aget_group_names before the
+permission classes run, and the queries of the response (count, page, object) go through Django's async ORM,
+paginated by the paginators' apaginate_queryset. Everything else is the DRF view's own code, called as it is:
+its permission and throttle classes, get_queryset(), filter backends, serializer classes and object
+permissions. They therefore return the same JSON, and the same errors, as their synchronous counterparts;
+lists go through the same ValuesSerializer fast path, ?fields= included. Content negotiation is not run,
+the response is always JSON.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.viewsets import ViewSetMixin
+from ..fast_serializers import ValuesListMixin
+from ..caching import aget_menu_version, menu_cache_key, menu_etag, etag_matches, menu_cache_stats, MENU_CACHE_TIMEOUT
+from ..roles import aget_group_names
+from ..routers import ReplicaReadMixin, ais_pinned, replica_enabled, use_primary, use_replica
+from .cart import CartView
+from .menu_items import MenuItemView
+from .orders import OrderView
+
+
+async def aget_object_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except (queryset.model.DoesNotExist, TypeError, ValueError):
+        raise exceptions.NotFound("No %s matches the given query." % queryset.model._meta.object_name)
+
+
+class Authenticated(BaseAuthentication):
+    """Hands DRF's Request the outcome of authenticators that already ran, so request.user does not run them again"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def authenticate(self, request):
+        return self.result
+
+
+class AsyncReadView(View):
+    http_method_names = ["get"]
+    renderer = JSONRenderer()
+    # View whose permissions, throttles, queryset, filter backends, serializers and paginator are reused
+    drf_view_class = None
+    replica_reads = True
+
+    def get_drf_view(self, request: HttpRequest, *args, **kwargs):
+        """The DRF view set up as its dispatch() would, for the list or retrieve action"""
+        drf_view = self.drf_view_class()
+        if issubclass(self.drf_view_class, ViewSetMixin):
+            drf_view.action_map = {"get": "retrieve" if kwargs else "list"}
+        drf_view.setup(request, *args, **kwargs)
+        drf_view.format_kwarg = None
+        drf_view.request = drf_view.initialize_request(request, *args, **kwargs)
+        drf_view.headers = drf_view.default_response_headers
+        return drf_view
+
+    async def dispatch(self, request: HttpRequest, *args, **kwargs):
+        self.drf_view = self.get_drf_view(request, *args, **kwargs)
+        try:
+            await self.initial(self.drf_view.request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            # DRF's status code and headers (WWW-Authenticate, Retry-After) for the exception
+            error = self.drf_view.handle_exception(exc)
+            response = self.render(error.data, error.status_code)
+            for header, value in error.items():
+                if header != "Content-Type":
+                    response[header] = value
+        return response
+
+    async def authenticate(self, request: Request):
+        """Request.user and Request.auth, set by the first authenticator that accepts the request"""
+        result = None
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, "aauthenticate"):
+                result = await authenticator.aauthenticate(request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                break
+        if request.authenticators:
+            request.authenticators = (Authenticated(result),)
+
+    async def initial(self, request: Request):
+        """The DRF view's initial() for the GET actions, without leaving the event loop"""
+        drf_view = self.drf_view
+        await self.authenticate(request)
+        # Memoized on the user, so the permission classes' role checks do not query
+        await aget_group_names(request.user)
+        drf_view.check_permissions(request)
+        # The GET throttles of these views only meter anonymous requests, which are refused above: no cache access
+        drf_view.check_throttles(request)
+        if (
+            self.replica_reads
+            and isinstance(drf_view, ReplicaReadMixin)
+            and drf_view.action in drf_view.replica_actions
+            and replica_enabled()
+            and not await ais_pinned(request.user)
+        ):
+            use_replica()
+
+    def render(self, data, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+        return HttpResponse(
+            self.renderer.render(data), status=status_code, content_type="application/json"
+        )
+
+    def get_queryset(self):
+        return self.drf_view.filter_queryset(self.drf_view.get_queryset())
+
+    async def get_object(self, queryset, pk):
+        obj = await aget_object_or_404(queryset, pk)
+        self.drf_view.check_object_permissions(self.drf_view.request, obj)
+        return obj
+
+    async def list(self):
+        """The data of the DRF view's list(): paginated by its paginator, through its ValuesSerializer if it has one"""
+        drf_view = self.drf_view
+        queryset = self.get_queryset()
+        if isinstance(drf_view, ValuesListMixin) and drf_view.use_values_serializer():
+            serializer, fields, queryset = drf_view.get_values(queryset)
+
+            def serialize(rows):
+                return serializer.serialize(rows, fields)
+        else:
+            serializer_class = drf_view.get_serializer_class()
+
+            def serialize(rows):
+                return serializer_class(rows, many=True).data
+
+        page = None
+        if drf_view.paginator is not None:
+            page = await drf_view.paginator.apaginate_queryset(queryset, drf_view.request, view=drf_view)
+        if page is None:
+            return serialize([row async for row in queryset])
+        return drf_view.get_paginated_response(serialize(page)).data
+
+
+class AsyncMenuItemsView(AsyncReadView):
+    """GET /api/async/menu-items/ and /api/async/menu-items/{menuItem}/ (shares MenuItemView's response cache)"""
+
+    drf_view_class = MenuItemView
+
+    async def get(self, request: HttpRequest, menuItem=None):
+        version = await aget_menu_version()
+        key = menu_cache_key(version, request.get_host(), "menu-items", self.drf_view.action, menuItem, request.GET)
+        etag = menu_etag(key)
+        if etag_matches(request, etag):
+            menu_cache_stats.record(hit=True)
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+
+        data = await cache.aget(key)
+        menu_cache_stats.record(hit=data is not None)
+        if data is None:
+            # Cached under the current version, so not read from a replica that may lag behind it
+            use_primary()
+            if menuItem is None:
+                data = await self.list()
+            else:
+                serializer_class = self.drf_view.get_serializer_class()
+                data = serializer_class(await self.get_object(self.get_queryset(), menuItem)).data
+            await cache.aset(key, data, MENU_CACHE_TIMEOUT)
+        response = self.render(data)
+        response["ETag"] = etag
+        return response
+
+
+class AsyncCartView(AsyncReadView):
+    """GET /api/async/cart/menu-items/"""
+
+    drf_view_class = CartView
+
+    async def get(self, request: HttpRequest):
+        return self.render(await self.list())
+
+
+class AsyncOrdersView(AsyncReadView):
+    """GET /api/async/orders/ and /api/async/orders/{orderId}/ (also ?expand=items and ?include_archived=true)"""
+
+    drf_view_class = OrderView
+
+    async def get(self, request: HttpRequest, orderId=None):
+        if orderId is None:
+            return self.render(await self.list())
+        serializer_class = self.drf_view.get_serializer_class()
+        return self.render(serializer_class(await self.get_object(self.get_queryset(), orderId)).data)
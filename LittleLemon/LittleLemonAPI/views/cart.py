@@ -4,15 +4,16 @@ from ..utils import DrfRequest
 from ..permissions import IsCustomer
 from ..models import Cart
 from ..serializers import CartInputSerializer, CartRemoveSerializer, CartViewSerializer
+from ..fast_serializers import ValuesListMixin
 from django.shortcuts import get_object_or_404
 from rest_framework.throttling import ScopedRateThrottle
-from django.db import transaction
 
 
-class CartView(mixins.ListModelMixin, generics.GenericAPIView):
+class CartView(ValuesListMixin, mixins.ListModelMixin, generics.GenericAPIView):
     serializer_class = CartViewSerializer
     permission_classes = [permissions.IsAuthenticated, IsCustomer]
     throttle_scope = "cart"
+    max_batch_size = 100
 
     def get_throttles(self):
         if self.request.method == "POST":
@@ -25,35 +26,38 @@ class CartView(mixins.ListModelMixin, generics.GenericAPIView):
     def get(self, request):
         return self.list(request)
 
-    @transaction.atomic
     def post(self, request: DrfRequest):
+        """
+        Adds one {menu_item, quantity} or a list of them to the cart.
+        Existing lines get the new quantity; everything is written with a single INSERT ... ON CONFLICT DO UPDATE.
+        A single item answers 201 when added and 200 when its quantity was updated; a list always answers 201.
+        """
+        many = isinstance(request.data, list)
+        list_kwargs = {"many": True, "max_length": self.max_batch_size, "allow_empty": False} if many else {}
         serializer = CartInputSerializer(
-            data=request.data, context={"user": request.user.id}
+            data=request.data, context={"user": request.user}, **list_kwargs
         )
         serializer.is_valid(raise_exception=True)
-        menu_item = serializer.validated_data["menu_item"]
-        quantity = serializer.validated_data["quantity"]
-        unit_price = menu_item.price
-        cart, created = Cart.objects.update_or_create(
-            user=request.user,
-            menu_item=menu_item,
-            defaults={
-                "quantity": quantity,
-                "unit_price": unit_price,
-                "price": Cart.compute_price(unit_price, quantity),
-            },
+        rows = serializer.validated_data if many else [serializer.validated_data]
+        # The upsert cannot tell an insert from an update. Two concurrent requests may both see a new line here
+        updated = not many and Cart.objects.filter(
+            user=request.user, menu_item_id=rows[0]["menu_item_id"]
+        ).exists()
+        carts = Cart.objects.bulk_create(
+            [Cart(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=["user", "menu_item"],
+            update_fields=["quantity", "unit_price", "price"],
         )
-
-        if created:
-            message = "Item successfully added to cart"
-            status_code = status.HTTP_201_CREATED
-        else:
-            message = "Cart item quantity updated"
-            status_code = status.HTTP_200_OK
-
+        result = CartViewSerializer(carts, many=True).data
+        if many:
+            return Response(
+                {"message": "Items successfully added to cart", "result": result}, status=status.HTTP_201_CREATED
+            )
+        if updated:
+            return Response({"message": "Cart item quantity updated", "result": result[0]})
         return Response(
-            {"message": message, "result": CartViewSerializer(cart).data},
-            status=status_code,
+            {"message": "Item successfully added to cart", "result": result[0]}, status=status.HTTP_201_CREATED
         )
 
     def delete(self, request: DrfRequest):
@@ -0,0 +1,109 @@
+import asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, StreamingHttpResponse
+from rest_framework import exceptions, status
+from ..authentication import aauthenticate_credentials
+from ..events import Subscription, order_event_broker, serialize_event, visible_events
+from ..models import OrderEvent
+from ..roles import aget_group_names
+from .async_reads import AsyncOrdersView
+
+ORDER_EVENTS_HEARTBEAT = getattr(settings, "ORDER_EVENTS_HEARTBEAT", 15)
+
+
+class OrderEventsView(AsyncOrdersView):
+    """
+    GET /api/async/orders/events/: Server-Sent Events for the status and delivery crew changes of the orders the
+    caller may see, as "event: order" messages whose data is {"id", "status", "delivery_crew"} (customers don't
+    get delivery_crew). A Last-Event-ID header (or ?last_event_id=) replays the changes logged after that event.
+    A comment is sent every ORDER_EVENTS_HEARTBEAT seconds so that dropped connections are noticed. With each
+    one the caller's token and roles are resolved again: the stream ends once the token is gone, the user is
+    deactivated or their roles changed, and the client reconnects with what it may see now.
+
+    Only served under ASGI (501 otherwise): under WSGI the endless stream would hold a worker thread per
+    connection, and the async generator would never return.
+    """
+
+    # Clients resume from the log, which must include their own changes
+    replica_reads = False
+    log_batch_size = 1000
+    # Milliseconds EventSource waits before reconnecting
+    retry = 3000
+
+    async def get(self, request: HttpRequest):
+        if not isinstance(request, ASGIRequest):
+            return self.render(
+                {"detail": "Order events are only served under ASGI."}, status.HTTP_501_NOT_IMPLEMENTED
+            )
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                raise exceptions.ValidationError({"last_event_id": "A valid integer is required."})
+        group_names = await aget_group_names(request.user)
+        response = StreamingHttpResponse(
+            self.stream(request.user.id, request.auth.key, group_names, last_event_id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Tells nginx not to buffer the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def format(self, event: OrderEvent, group_names: frozenset[str]) -> str:
+        data = self.renderer.render(serialize_event(event, group_names)).decode()
+        return f"id: {event.id}\nevent: order\ndata: {data}\n\n"
+
+    async def authorization_changed(self, token_key: str, group_names: frozenset[str]) -> bool:
+        try:
+            user, _ = await aauthenticate_credentials(token_key)
+        except exceptions.AuthenticationFailed:
+            return True
+        return await aget_group_names(user) != group_names
+
+    async def read_log(self, subscription: Subscription, after: int) -> list[OrderEvent]:
+        queryset = OrderEvent.objects.filter(
+            visible_events(subscription.user_id, subscription.group_names), id__gt=after
+        ).order_by("id")
+        return [event async for event in queryset[: self.log_batch_size]]
+
+    async def stream(
+        self, user_id: int, token_key: str, group_names: frozenset[str], last_event_id: int | None
+    ):
+        # Subscribed before the log is read, so that nothing committed in between is missed
+        subscription = order_event_broker.subscribe(user_id, group_names)
+        try:
+            yield f"retry: {self.retry}\n\n"
+            # Events read from the log that may also still be queued
+            from_log: set[int] = set()
+            from_log_max = 0
+            catch_up = last_event_id is not None
+            last_id = resumed_after = last_event_id or 0
+            while True:
+                if catch_up or subscription.lagging:
+                    subscription.lagging = False
+                    events = await self.read_log(subscription, last_id)
+                    for event in events:
+                        from_log.add(event.id)
+                        from_log_max = last_id = event.id
+                        yield self.format(event, group_names)
+                    # A full batch means more of the log is left
+                    catch_up = len(events) == self.log_batch_size
+                    continue
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), ORDER_EVENTS_HEARTBEAT)
+                except TimeoutError:
+                    if await self.authorization_changed(token_key, group_names):
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.id in from_log or event.id <= resumed_after:
+                    continue
+                if event.id > from_log_max:
+                    from_log.clear()
+                last_id = max(last_id, event.id)
+                yield self.format(event, group_names)
+        finally:
+            order_event_broker.unsubscribe(subscription)
@@ -1,73 +1,94 @@
 from rest_framework.response import Response
 from rest_framework import status, mixins, viewsets, exceptions
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.models import User, Group
 from ..utils import GroupEnum, DrfRequest, ConflictFound
 from ..permissions import IsManager
+from ..roles import get_group_names
+from ..serializers import GroupMembershipBulkSerializer
+from ..services import bulk_update_membership
 from djoser.serializers import UserSerializer
 from django.shortcuts import get_object_or_404
 
 
-class ManagerGroupView(mixins.ListModelMixin, viewsets.GenericViewSet):
+class GroupMembershipView(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Lists, adds and removes the members of `group`, one at a time or in bulk"""
+
     serializer_class = UserSerializer
-    permission_classes = [
-        IsAuthenticated,
-        IsManager | IsAdminUser,
-    ]
-    queryset = User.objects.filter(groups__name=GroupEnum.MANAGER.value)
     lookup_url_kwarg = "userId"
+    group: GroupEnum
+    # Used in the response messages, e.g. "the manager group"
+    group_label: str
+    max_bulk_size = 1000
+
+    def get_queryset(self):
+        return User.objects.filter(groups__name=self.group.value)
+
+    def get_group(self) -> Group:
+        return get_object_or_404(Group, name=self.group.value)
+
+    def is_member(self, user: User) -> bool:
+        return self.group.value in get_group_names(user)
 
     def create(self, request: DrfRequest):
         username = request.data.get("username")
         if not username:
             raise exceptions.ValidationError(detail="Username is required")
         user = get_object_or_404(User, username=username)
-        if user.groups.filter(name=GroupEnum.MANAGER.value).exists():
-            raise ConflictFound(detail="User is already in the manager group")
-        group = get_object_or_404(Group, name=GroupEnum.MANAGER.value)
-        group.user_set.add(user)
+        if self.is_member(user):
+            raise ConflictFound(detail=f"User is already in the {self.group_label} group")
+        self.get_group().user_set.add(user)
         return Response(
-            {"message": "User successfully added to the manager group"},
+            {"message": f"User successfully added to the {self.group_label} group"},
             status.HTTP_201_CREATED,
         )
 
     def destroy(self, request: DrfRequest, userId):
         user = get_object_or_404(User, id=userId)
-        if not user.groups.filter(name=GroupEnum.MANAGER.value).exists():
-            raise ConflictFound(detail="User is already not in the manager group")
-        group = get_object_or_404(Group, name=GroupEnum.MANAGER.value)
-        group.user_set.remove(user)
+        if not self.is_member(user):
+            raise ConflictFound(detail=f"User is already not in the {self.group_label} group")
+        self.get_group().user_set.remove(user)
         return Response(
-            {"message": "User successfully removed from the manager group"},
+            {"message": f"User successfully removed from the {self.group_label} group"},
         )
 
-
-class DeliveryCrewGroupView(mixins.ListModelMixin, viewsets.GenericViewSet):
-    serializer_class = UserSerializer
-    permission_classes = [IsAuthenticated, IsManager]
-    queryset = User.objects.filter(groups__name=GroupEnum.DELIVERY_CREW.value)
-    lookup_url_kwarg = "userId"
-
-    def create(self, request: DrfRequest):
-        username = request.data.get("username")
-        if not username:
-            raise exceptions.ValidationError(detail="Username is required")
-        user = get_object_or_404(User, username=username)
-        if user.groups.filter(name=GroupEnum.DELIVERY_CREW.value).exists():
-            raise ConflictFound(detail="User is already in the delivery crew group")
-        group = get_object_or_404(Group, name=GroupEnum.DELIVERY_CREW.value)
-        group.user_set.add(user)
+    @action(detail=False, methods=["post"])
+    def bulk(self, request: DrfRequest):
+        """
+        Adds and removes many users with a fixed number of queries.
+        Body: {"add": [...], "remove": [...]}, each user given by id or username.
+        """
+        serializer = GroupMembershipBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        add = serializer.validated_data.get("add", [])
+        remove = serializer.validated_data.get("remove", [])
+        if len(add) + len(remove) > self.max_bulk_size:
+            raise exceptions.ValidationError(f"Ensure there are no more than {self.max_bulk_size} users.")
+        results = bulk_update_membership(self.get_group(), add, remove)
+        added = sum(result["result"] == "added" for result in results)
+        removed = sum(result["result"] == "removed" for result in results)
         return Response(
-            {"message": "User successfully added to the delivery crew group"},
-            status.HTTP_201_CREATED,
+            {
+                "message": f"{added} user(s) added to and {removed} removed from the {self.group_label} group",
+                "added": added,
+                "removed": removed,
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
         )
 
-    def destroy(self, request: DrfRequest, userId):
-        user = get_object_or_404(User, id=userId)
-        if not user.groups.filter(name=GroupEnum.DELIVERY_CREW.value).exists():
-            raise ConflictFound(detail="User is already not in the delivery crew group")
-        group = get_object_or_404(Group, name=GroupEnum.DELIVERY_CREW.value)
-        group.user_set.remove(user)
-        return Response(
-            {"message": "User successfully removed from the delivery crew group"},
-        )
+
+class ManagerGroupView(GroupMembershipView):
+    permission_classes = [
+        IsAuthenticated,
+        IsManager | IsAdminUser,
+    ]
+    group = GroupEnum.MANAGER
+    group_label = "manager"
+
+
+class DeliveryCrewGroupView(GroupMembershipView):
+    permission_classes = [IsAuthenticated, IsManager]
+    group = GroupEnum.DELIVERY_CREW
+    group_label = "delivery crew"
@@ -1,11 +1,43 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, exceptions
+from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from ..models import Category, MenuItem
 from ..permissions import IsManager
 from ..serializers import CategorySerializer, MenuItemSerializer
-from ..utils import CustomPageNumberPagination
+from ..utils import CustomPageNumberPagination, PaginationModeMixin, DrfRequest
+from ..caching import MenuCacheMixin
+from ..search import MenuItemSearchFilter
+from ..routers import ReplicaReadMixin
+from ..fast_serializers import ValuesListMixin
+from ..exports import iter_menu_csv, iter_menu_json, streaming_content
+from ..imports import import_menu_items, parse_menu_file
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
 
-class CategoryView(viewsets.ModelViewSet):
+
+def filter_menu_items(query_params) -> QuerySet:
+    if not query_params:
+        return MenuItem.objects.select_related("category").all()
+    filter_dict = dict()
+    if "category" in query_params:
+        # IN (subquery) lets the planner use the category_id index instead of scanning menu items
+        filter_dict["category__in"] = Category.objects.filter(
+            title__iexact=query_params["category"]
+        )
+    if "title" in query_params:
+        filter_dict["title__icontains"] = query_params["title"]
+    if "featured" in query_params:
+        if query_params["featured"].lower() == "true":
+            filter_dict["featured"] = True
+        elif query_params["featured"].lower() == "false":
+            filter_dict["featured"] = False
+    return MenuItem.objects.select_related("category").filter(**filter_dict)
+
+
+class CategoryView(ReplicaReadMixin, MenuCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
@@ -20,12 +52,17 @@ class CategoryView(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class MenuItemView(viewsets.ModelViewSet):
+class MenuItemView(
+    ReplicaReadMixin, MenuCacheMixin, ValuesListMixin, PaginationModeMixin, viewsets.ModelViewSet
+):
     serializer_class = MenuItemSerializer
     lookup_url_kwarg = "menuItem"
     pagination_class = CustomPageNumberPagination
+    filter_backends = [OrderingFilter, MenuItemSearchFilter]
+    # Only used by the LIKE fallback outside SQLite
     search_fields = ["title", "=category__title"]
     ordering_fields = ["price"]
+    cursor_ordering = ["price", "id"]
 
     def get_permissions(self):
         if self.action in (
@@ -38,17 +75,45 @@ class MenuItemView(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        query_params = self.request.query_params
-        if not query_params:
-            return MenuItem.objects.select_related("category").all()
-        filter_dict = dict()
-        if "category" in query_params:
-            filter_dict["category__title__iexact"] = query_params["category"]
-        if "title" in query_params:
-            filter_dict["title__icontains"] = query_params["title"]
-        if "featured" in query_params:
-            if query_params["featured"].lower() == "true":
-                filter_dict["featured"] = True
-            elif query_params["featured"].lower() == "false":
-                filter_dict["featured"] = False
-        return MenuItem.objects.select_related("category").filter(**filter_dict)
+        return filter_menu_items(self.request.query_params)
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[JSONParser, MultiPartParser])
+    def import_items(self, request: DrfRequest):
+        """
+        Creates or updates (by title) menu items in bulk, from a JSON array in the request body or from an
+        uploaded "file" in the export's CSV or JSON format. Invalid rows are reported and skipped.
+        """
+        if isinstance(request.data, list):
+            rows = request.data
+        elif "file" in request.FILES:
+            uploaded_file = request.FILES["file"]
+            input_format = "json" if uploaded_file.name.lower().endswith(".json") else "csv"
+            rows = parse_menu_file(uploaded_file, input_format)
+        else:
+            raise exceptions.ValidationError(
+                {"file": "Send a JSON array of menu items or upload a CSV/JSON file"}
+            )
+        result = import_menu_items(rows)
+        return Response(
+            {"created": result.created, "updated": result.updated, "errors": result.errors}
+        )
+
+    @action(detail=False, methods=["get"])
+    def export(self, request: DrfRequest):
+        """Streams the menu items matching the list filters; ?output=csv (default) or ?output=json"""
+        output = request.query_params.get("output", "csv").lower()
+        if output not in ("csv", "json"):
+            raise exceptions.ValidationError({"output": "Must be either csv or json"})
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by("id")
+        if output == "csv":
+            response = StreamingHttpResponse(
+                streaming_content(request, iter_menu_csv(queryset)), content_type="text/csv"
+            )
+        else:
+            response = StreamingHttpResponse(
+                streaming_content(request, iter_menu_json(queryset)), content_type="application/json"
+            )
+        response["Content-Disposition"] = f'attachment; filename="menu-items.{output}"'
+        return response
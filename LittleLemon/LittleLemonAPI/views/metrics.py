@@ -0,0 +1,18 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from ..instrumentation import request_metrics
+from ..outbox import export_outbox_metrics
+from ..utils import DrfRequest
+
+
+class MetricsView(APIView):
+    """Per-view request histograms and the outbox gauges in the Prometheus text format"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: DrfRequest):
+        return HttpResponse(
+            request_metrics.export() + export_outbox_metrics(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -1,21 +1,93 @@
 from rest_framework.response import Response
 from rest_framework import viewsets, exceptions, status, mixins
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from ..models import Order, OrderItem, Cart
+from ..models import CombinedOrder, Order
 from ..serializers import (
     CustomerOrderViewSerializer,
     OrderSerializer,
+    ExpandedCustomerOrderViewSerializer,
+    ExpandedOrderSerializer,
     ManagerOrderUpdateSerializer,
     DeliveryCrewOrderUpdateSerializer,
+    OrderBulkUpdateSerializer,
 )
 from ..permissions import IsManager, IsCustomer, IsDeliveryCrew
-from ..utils import CustomPageNumberPagination, GroupEnum, DrfRequest
+from ..utils import CustomPageNumberPagination, PaginationModeMixin, GroupEnum, DrfRequest
+from ..roles import get_group_names, is_delivery_crew, is_customer
+from ..services import place_order, bulk_update_orders
+from ..reports import record_status_change, record_order_deleted
+from ..events import order_event, record_order_events
+from ..exports import iter_orders_csv, iter_orders_ndjson, streaming_content
+from ..routers import ReplicaReadMixin
+from ..fast_serializers import ValuesListMixin
 from rest_framework.throttling import ScopedRateThrottle
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.contrib.auth.models import User
+from django.db.models import QuerySet, Prefetch
 from datetime import datetime
 
+def include_archived(query_params) -> bool:
+    return query_params.get("include_archived", "").lower() in ("true", "1")
+
+
+def filter_orders(
+    user: User, group_names: frozenset[str], query_params, model: type[Order | CombinedOrder] = Order
+) -> QuerySet:
+    """
+    Orders visible to the user; managers see all of them and can filter by status and date.
+    model is CombinedOrder to include the archived orders.
+    """
+    if GroupEnum.MANAGER.value in group_names:
+        filter_dict = dict()
+        if "status" in query_params:
+            if query_params["status"].lower() == "delivered":
+                filter_dict["status"] = True
+            elif query_params["status"].lower() == "pending":
+                filter_dict["status"] = False
+        if "date" in query_params:
+            try:
+                filter_dict["date"] = datetime.strptime(query_params["date"], "%Y-%m-%d").date()
+            except ValueError:
+                pass
+        if filter_dict:
+            return model.objects.filter(**filter_dict)
+        return model.objects.all()
+    elif GroupEnum.DELIVERY_CREW.value in group_names:
+        return model.objects.filter(delivery_crew=user)
+    else:
+        return model.objects.filter(user=user)
+
+
+EXPANDABLE_FIELDS = ("items",)
+
+
+def get_expanded_fields(query_params) -> set[str]:
+    """Parses ?expand=items (comma separated)"""
+    expand = {value.strip() for value in query_params.get("expand", "").split(",") if value.strip()}
+    unknown = expand.difference(EXPANDABLE_FIELDS)
+    if unknown:
+        raise exceptions.ValidationError(
+            {"expand": f"Unknown field(s): {', '.join(sorted(unknown))}. Expandable: {', '.join(EXPANDABLE_FIELDS)}"}
+        )
+    return expand
+
+
+def prefetch_order_items(queryset: QuerySet) -> QuerySet:
+    """One query for the items (with their menu items) of all the orders, however many there are"""
+    # OrderItem, or CombinedOrderItem for CombinedOrder
+    item_model = queryset.model.orderitem_set.rel.related_model
+    return queryset.prefetch_related(
+        Prefetch("orderitem_set", queryset=item_model.objects.select_related("menu_item"))
+    )
+
+
 class OrderView(
+    ReplicaReadMixin,
+    ValuesListMixin,
+    PaginationModeMixin,
     mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
 ):
     lookup_url_kwarg = "orderId"
@@ -23,6 +95,7 @@ class OrderView(
     throttle_scope = "orders"
     permission_classes = [IsAuthenticated, IsManager | IsDeliveryCrew | IsCustomer]
     ordering_fields = ["total", "date"]
+    max_bulk_size = 1000
 
     def get_throttles(self):
         if self.action not in ("list", "retrieve"):
@@ -33,64 +106,99 @@ class OrderView(
         match self.action:
             case "create":
                 self.permission_classes = [IsAuthenticated, IsCustomer]
-            case "update" | "destroy":
+            case "update" | "destroy" | "export" | "bulk":
                 self.permission_classes = [IsAuthenticated, IsManager]
             case "partial_update":
                 self.permission_classes = [IsAuthenticated, IsManager | IsDeliveryCrew]
         return super().get_permissions()
 
     def get_queryset(self):
-        query_params:dict = self.request.query_params
-        if self.request.user.groups.filter(name=GroupEnum.MANAGER.value).exists():
-            filter_dict = dict()
-            if "status" in query_params:
-                if query_params["status"].lower() == "delivered":
-                    filter_dict["status"] = True
-                elif query_params["status"].lower() == "pending":
-                    filter_dict["status"] = False
-            if "date" in query_params:
-                try:
-                    filter_dict["date"] = datetime.strptime(query_params["date"], "%Y-%m-%d").date()
-                except ValueError:
-                    pass
-            if filter_dict:
-                return Order.objects.filter(**filter_dict)
-            return Order.objects.all()
-        elif self.request.user.groups.filter(
-            name=GroupEnum.DELIVERY_CREW.value
-        ).exists():
-            return Order.objects.filter(delivery_crew=self.request.user)
+        # Archived orders are read-only: only list and retrieve can include them
+        model = Order
+        if self.action in ("list", "retrieve") and include_archived(self.request.query_params):
+            model = CombinedOrder
+        queryset = filter_orders(
+            self.request.user, get_group_names(self.request.user), self.request.query_params, model
+        )
+        if self.action in ("list", "retrieve") and "items" in self.expanded_fields:
+            queryset = prefetch_order_items(queryset)
+        return queryset
+
+    @property
+    def expanded_fields(self) -> set[str]:
+        return get_expanded_fields(self.request.query_params)
+
+    def use_values_serializer(self) -> bool:
+        # The nested items need the prefetched instances
+        return "items" not in self.expanded_fields
+
+    @action(detail=False, methods=["get"])
+    def export(self, request: DrfRequest):
+        """
+        Streams every order matching the list filters (status, date, ordering) with its items.
+        ?output=csv (default, one row per order item) or ?output=ndjson (one order per line)
+        """
+        output = request.query_params.get("output", "csv").lower()
+        if output not in ("csv", "ndjson"):
+            raise exceptions.ValidationError({"output": "Must be either csv or ndjson"})
+        queryset = self.filter_queryset(self.get_queryset())
+        if output == "csv":
+            response = StreamingHttpResponse(
+                streaming_content(request, iter_orders_csv(queryset)), content_type="text/csv"
+            )
         else:
-            return Order.objects.filter(user=self.request.user)
+            response = StreamingHttpResponse(
+                streaming_content(request, iter_orders_ndjson(queryset)), content_type="application/x-ndjson"
+            )
+        response["Content-Disposition"] = f'attachment; filename="orders.{output}"'
+        return response
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request: DrfRequest):
+        """
+        Sets status and/or delivery_crew on many orders with one UPDATE.
+        Body: {"ids": [...]} or {"filter": {"status": "pending|delivered", "date": "YYYY-MM-DD"}},
+        plus "status" and/or "delivery_crew" (a delivery crew member's id, or null to unassign).
+        """
+        serializer = OrderBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        changes = {field: data[field] for field in ("status", "delivery_crew") if field in data}
+        if "ids" in data:
+            if len(data["ids"]) > self.max_bulk_size:
+                raise exceptions.ValidationError(
+                    {"ids": f"Ensure this field has no more than {self.max_bulk_size} elements."}
+                )
+            queryset = Order.objects.filter(id__in=data["ids"])
+        else:
+            filter_params = {key: str(value) for key, value in data["filter"].items()}
+            queryset = filter_orders(request.user, get_group_names(request.user), filter_params)
+        updated = bulk_update_orders(queryset, changes, self.max_bulk_size)
+
+        results = [{"id": order_id, "result": "updated"} for order_id in updated]
+        if "ids" in data:
+            found = set(updated)
+            results = [
+                {"id": order_id, "result": "updated" if order_id in found else "not_found"}
+                for order_id in dict.fromkeys(data["ids"])
+            ]
+        return Response(
+            {"message": f"{len(updated)} order(s) updated.", "updated": len(updated), "results": results},
+            status=status.HTTP_200_OK,
+        )
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
-            if not self.request.user.groups.exists():
-                return CustomerOrderViewSerializer
-            return OrderSerializer
+            expand_items = "items" in self.expanded_fields
+            if is_customer(self.request.user):
+                return (
+                    ExpandedCustomerOrderViewSerializer if expand_items else CustomerOrderViewSerializer
+                )
+            return ExpandedOrderSerializer if expand_items else OrderSerializer
         return super().get_serializer_class()
 
-    @transaction.atomic
     def create(self, request: DrfRequest):
-        carts = Cart.objects.select_related("menu_item").filter(user=request.user)
-        if not carts.exists():
-            raise exceptions.ValidationError(
-                "Your cart is empty. Please add items to your cart before placing an order."
-            )
-        total = sum(item.price for item in carts)
-        order = Order.objects.create(
-            user=request.user,
-            total=total,
-        )
-        for item in carts:
-            OrderItem.objects.create(
-                order=order,
-                menu_item=item.menu_item,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                price=item.price,
-            )
-        carts.delete()
+        order = place_order(request.user)
         return Response(
             {
                 "message": "Your order has been placed.",
@@ -99,19 +207,25 @@ class OrderView(
             status=status.HTTP_201_CREATED,
         )
 
+    @transaction.atomic
     def destroy(self, request: DrfRequest, orderId):
         order = get_object_or_404(Order, id=orderId)
+        record_order_deleted(order)
         order.delete()
         return Response(
             {"message": "Order has been deleted."},
             status=status.HTTP_200_OK,
         )
 
+    @transaction.atomic
     def update(self, request: DrfRequest, orderId):
         order = get_object_or_404(Order, id=orderId)
+        previous_status, previous_delivery_crew_id = order.status, order.delivery_crew_id
         serializer = ManagerOrderUpdateSerializer(order, data=request.data)
         serializer.is_valid(raise_exception=True)
         updated_order = serializer.save()
+        record_status_change(updated_order, previous_status)
+        record_order_events([order_event(updated_order, previous_status, previous_delivery_crew_id)])
         return Response(
             {
                 "message": "Order has been updated.",
@@ -120,9 +234,11 @@ class OrderView(
             status=status.HTTP_200_OK,
         )
 
+    @transaction.atomic
     def partial_update(self, request: DrfRequest, orderId):
         order = get_object_or_404(Order, id=orderId)
-        if request.user.groups.filter(name=GroupEnum.DELIVERY_CREW.value).exists():
+        previous_status, previous_delivery_crew_id = order.status, order.delivery_crew_id
+        if is_delivery_crew(request.user):
             serializer = DeliveryCrewOrderUpdateSerializer(
                 order, data=request.data, partial=True
             )
@@ -132,6 +248,8 @@ class OrderView(
             )
         serializer.is_valid(raise_exception=True)
         updated_order = serializer.save()
+        record_status_change(updated_order, previous_status)
+        record_order_events([order_event(updated_order, previous_status, previous_delivery_crew_id)])
         return Response(
             {
                 "message": "Order has been partially updated.",
@@ -0,0 +1,62 @@
+from datetime import datetime
+from rest_framework.response import Response
+from rest_framework import generics, exceptions
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.db.models import Sum
+from ..models import DailySales, MenuItemSales
+from ..permissions import IsManager
+from ..serializers import DailySalesSerializer, TopMenuItemSerializer
+from ..utils import DrfRequest
+
+
+class ReportView(generics.GenericAPIView):
+    """
+    Sales figures served from the pre-aggregated reporting tables.
+    Query params: from / to (YYYY-MM-DD, inclusive) and top (number of top-selling menu items, max 100).
+    """
+
+    permission_classes = [IsAuthenticated, IsManager | IsAdminUser]
+    serializer_class = DailySalesSerializer
+    max_top_items = 100
+
+    def get_date_filter(self, prefix: str = "") -> dict:
+        filter_dict = dict()
+        for param, lookup in (("from", "gte"), ("to", "lte")):
+            if param in self.request.query_params:
+                try:
+                    filter_dict[f"{prefix}date__{lookup}"] = datetime.strptime(
+                        self.request.query_params[param], "%Y-%m-%d"
+                    ).date()
+                except ValueError:
+                    raise exceptions.ValidationError({param: "Date must be in YYYY-MM-DD format"})
+        return filter_dict
+
+    def get_top_count(self) -> int:
+        try:
+            return max(0, min(int(self.request.query_params.get("top", 10)), self.max_top_items))
+        except ValueError:
+            raise exceptions.ValidationError({"top": "A valid integer is required"})
+
+    def get(self, request: DrfRequest):
+        date_filter = self.get_date_filter()
+        daily = DailySales.objects.filter(**date_filter)
+        totals = daily.aggregate(
+            pending_count=Sum("pending_count", default=0),
+            delivered_count=Sum("delivered_count", default=0),
+            revenue=Sum("revenue", default=0),
+        )
+        totals["order_count"] = totals["pending_count"] + totals["delivered_count"]
+        top_items = (
+            MenuItemSales.objects.filter(**date_filter)
+            .values("menu_item", "menu_item__title")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .filter(quantity__gt=0)
+            .order_by("-quantity", "-revenue", "menu_item")[: self.get_top_count()]
+        )
+        return Response(
+            {
+                "totals": totals,
+                "daily": DailySalesSerializer(daily, many=True).data,
+                "top_items": TopMenuItemSerializer(top_items, many=True).data,
+            }
+        )